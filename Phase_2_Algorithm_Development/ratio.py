@@ -11,7 +11,7 @@ Key tasks:
 2. Calculate Price-to-Earnings (P/E) ratio for each firm-quarter
 3. Calculate Market-to-Book (M/B) ratio for each firm-quarter
 4. Handle missing values and data quality issues
-5. Create time-series dataset with ratio calculations
+5. Create time-series dataset with ratio calculations and sector-quarter peer scores
 6. Generate comprehensive logging of calculations and findings
 
 Author: Wassil
@@ -23,6 +23,13 @@ import numpy as np
 import os
 from datetime import datetime
 
+# Ratio columns carried through the time-series panel and scored cross-sectionally
+RATIO_COLUMNS = ['PE_ratio', 'MB_ratio']
+
+# Scale factor that makes the median absolute deviation consistent with the
+# standard deviation of a normal distribution
+MAD_SCALE = 1.4826
+
 def main():
     """Main ratio calculation function"""
 
@@ -171,15 +178,28 @@ def main():
                 log.append(f"  M/B - Count: {stats[('MB_ratio', 'count')]:,} | Mean: {stats[('MB_ratio', 'mean')]} | Median: {stats[('MB_ratio', 'median')]} | Std: {stats[('MB_ratio', 'std')]}\n")
                 log.append("\n")
 
-        # Step 7: Create final time-series dataset
-        print("\n7. Creating final time-series dataset...")
+        # Step 7: Cross-sectional scores within sector-quarter peers
+        print("\n7. Scoring firms against their sector-quarter peers...")
+
+        df, score_columns = add_cross_sectional_scores(df, RATIO_COLUMNS)
+
+        log.append("\n=== CROSS-SECTIONAL SECTOR-QUARTER SCORES ===\n")
+        log.append("Peer group: gsector x quarter\n")
+        log.append("z = (ratio - peer mean) / peer std\n")
+        log.append("percentile = peer rank (average ties) / peer count * 100\n")
+        log.append(f"robust_z = (ratio - peer median) / ({MAD_SCALE} * peer MAD)\n")
+        for col in score_columns:
+            log.append(f"  {col}: {df[col].notna().sum():,} scored\n")
+
+        # Step 8: Create final time-series dataset
+        print("\n8. Creating final time-series dataset...")
 
         # Select relevant columns for output
         output_columns = [
             'gvkey', 'conm', 'datadate', 'quarter', 'year', 'gsector',
-            'prccq', 'epspxq', 'PE_ratio',
+            'prccq', 'ajexq', 'dvpsxq', 'epspxq', 'PE_ratio',
             'market_cap', 'total_debt', 'cheq', 'atq', 'MB_ratio'
-        ]
+        ] + score_columns
 
         df_output = df[output_columns].copy()
 
@@ -191,8 +211,8 @@ def main():
         log.append(f"Final dataset columns: {len(df_output.columns)}\n")
         log.append(f"Columns included: {', '.join(output_columns)}\n")
 
-        # Step 8: Save results
-        print("\n8. Saving results...")
+        # Step 9: Save results
+        print("\n9. Saving results...")
 
         # Ensure output directory exists
         os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else '.', exist_ok=True)
@@ -226,5 +246,35 @@ def main():
 
         raise
 
+def add_cross_sectional_scores(df, ratio_columns, group_keys=('gsector', 'quarter')):
+    """Append peer z-scores, percentile ranks and median/MAD scores for each ratio"""
+
+    keys = [df[k] for k in group_keys]
+    ratios = df[ratio_columns]
+
+    # One groupby over all ratio columns; every statistic is a grouped transform
+    grouped = ratios.groupby(keys)
+    peer_mean = grouped.transform('mean')
+    peer_std = grouped.transform('std')
+    peer_median = grouped.transform('median')
+    peer_pct = grouped.rank(method='average', pct=True) * 100
+
+    abs_dev = (ratios - peer_median).abs()
+    peer_mad = abs_dev.groupby(keys).transform('median') * MAD_SCALE
+
+    # Degenerate peer groups (single firm or identical ratios) get no score
+    z = (ratios - peer_mean) / peer_std.where(peer_std > 0)
+    robust_z = (ratios - peer_median) / peer_mad.where(peer_mad > 0)
+
+    score_columns = []
+    for col in ratio_columns:
+        prefix = col.replace('_ratio', '')
+        df[f'{prefix}_sector_z'] = z[col]
+        df[f'{prefix}_sector_percentile'] = peer_pct[col]
+        df[f'{prefix}_sector_robust_z'] = robust_z[col]
+        score_columns += [f'{prefix}_sector_z', f'{prefix}_sector_percentile', f'{prefix}_sector_robust_z']
+
+    return df, score_columns
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Valuation Ratio Information Coefficients - Phase 2: Algorithm Development
+==================================================================
+
+This script tests whether the Phase 2 ratios predict returns. Every quarter,
+firms are ranked on each ratio in RATIO_COLUMNS (ratio.py) and on their
+forward returns, and the Spearman rank correlation (information coefficient,
+IC) between the two is recorded.
+
+Key tasks:
+1. Load the Phase 2 ratio time series
+2. Compute forward 1/2/4-quarter returns per firm from split-adjusted prices
+3. Compute quarterly Spearman ICs of every ratio against every target,
+   market-wide and sector-neutralized
+4. Summarize IC mean, volatility, t-statistic and hit rate, and the decay of
+   the IC over single-quarter returns 1-4 quarters ahead
+5. Save the IC series, the summary and a processing log
+
+Forward returns: (P[t+h] + dividends paid over t+1..t+h) / P[t] - 1, with
+P = prccq / ajexq (Compustat adjustment factor) and dividends dvpsxq / ajexq,
+for firms with a price in both quarters. A negative IC means low ratios
+(cheap firms) are followed by higher returns.
+
+Sector-neutral ICs rank ratios and returns within sector x quarter, demean
+the percentile ranks within each sector and correlate the residual ranks
+across the quarter, so sector-wide valuation and return differences drop out.
+
+All ratios, targets and quarters are computed together: every (ratio, target)
+pair is one column of a single grouped rank, and the correlations of all
+pairs and quarters come from one grouped sum. Adding a ratio to RATIO_COLUMNS
+adds columns, not loops. t-statistics use Newey-West standard errors with
+h - 1 lags, since h-quarter forward returns overlap.
+
+Author: Wassil
+Project: UTIMCO Quantitative Sector Valuation Analysis
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from ratio import RATIO_COLUMNS
+
+# Cumulative forward-return horizons and single-quarter decay lags (quarters)
+FORWARD_HORIZONS = [1, 2, 4]
+DECAY_LAGS = [1, 2, 3, 4]
+
+def main():
+    """Main information coefficient analysis function"""
+
+    print("=== Valuation Ratio Information Coefficients ===\n")
+
+    input_path = "Compustat_Ratios_TimeSeries.csv"
+    output_path = "ratio_ic_timeseries.csv"
+    summary_path = "ratio_ic_summary.csv"
+    log_path = "ratio_ic_log.txt"
+
+    print(f"Loading data from: {input_path}")
+    try:
+        df = pd.read_csv(input_path, low_memory=False)
+    except FileNotFoundError:
+        print(f"Error: Could not find {input_path}")
+        return
+
+    log = []
+    log.append("=== VALUATION RATIO INFORMATION COEFFICIENT LOG ===\n")
+    log.append(f"Processing Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    log.append(f"Input Data: {input_path}\n")
+    log.append(f"Ratios: {', '.join(RATIO_COLUMNS)}\n")
+    log.append("IC = Spearman rank correlation of the ratio at quarter t with the forward return\n")
+    log.append("Forward return: (P[t+h] + dividends) / P[t] - 1, P = prccq / ajexq\n\n")
+
+    print("\n1. Computing forward returns...")
+    start = datetime.now()
+    panel, targets = add_forward_returns(df, FORWARD_HORIZONS, DECAY_LAGS)
+    for target in targets:
+        log.append(f"{target}: {panel[target].notna().sum():,} firm-quarters\n")
+
+    print("\n2. Computing quarterly rank ICs...")
+    ics = []
+    for neutral in (False, True):
+        ic = compute_rank_ics(panel, RATIO_COLUMNS, targets, sector_neutral=neutral)
+        ic.insert(0, 'method', 'sector_neutral' if neutral else 'market')
+        ics.append(ic)
+    ics = pd.concat(ics, ignore_index=True)
+    summary = summarize_ics(ics)
+    elapsed = (datetime.now() - start).total_seconds()
+
+    ics.to_csv(output_path, index=False)
+    summary.to_csv(summary_path, index=False)
+
+    log.append(f"\nQuarterly ICs: {len(ics):,} (ratio x target x quarter x method), {elapsed:.2f}s\n")
+    for method, group in summary.groupby('method', sort=False):
+        log.append(f"\n=== {method.upper().replace('_', '-')} IC SUMMARY ===\n")
+        log.append(f"{'Ratio':<12}{'Target':<12}{'Quarters':>9}{'Mean IC':>9}{'IC std':>9}{'t-stat':>9}{'Hit %':>8}\n")
+        for _, row in group.iterrows():
+            log.append(f"{row['ratio']:<12}{row['target']:<12}{row['quarters']:>9}{row['ic_mean']:>9.4f}"
+                       f"{row['ic_std']:>9.4f}{row['t_stat']:>9.2f}{row['hit_rate'] * 100:>8.1f}\n")
+
+    log.append(f"\nIC time series saved to: {output_path}\n")
+    log.append(f"Summary saved to: {summary_path}\n")
+    with open(log_path, 'w') as f:
+        f.writelines(log)
+
+    first_summary = next(i for i, line in enumerate(log) if 'IC SUMMARY' in line)
+    print(''.join(log[first_summary - 1:-2]))
+    print(f"   IC time series saved to: {output_path}")
+    print(f"   Summary saved to: {summary_path}")
+    print(f"   Log saved to: {log_path}")
+
+def add_forward_returns(df, horizons=FORWARD_HORIZONS, decay_lags=DECAY_LAGS):
+    """One row per firm-quarter with fwd_{h}q cumulative and ret_q+{k} single-quarter forward returns"""
+
+    df = df.copy()
+    df['datadate'] = pd.to_datetime(df['datadate'], errors='coerce')
+    df = df.sort_values(['gvkey', 'datadate'], kind='mergesort')
+
+    # First filing per firm and calendar quarter
+    df['qidx'] = pd.PeriodIndex(df['quarter'], freq='Q').asi8
+    panel = df.drop_duplicates(['gvkey', 'qidx']).reset_index(drop=True)
+
+    adjustment = panel.groupby('gvkey', sort=False)['ajexq'].ffill().fillna(1.0)
+    adjustment = adjustment.where(adjustment > 0, 1.0)
+    price = (panel['prccq'] / adjustment).where(panel['prccq'] > 0)
+    dividend = (panel['dvpsxq'].fillna(0).clip(lower=0) / adjustment)
+
+    # (firm x quarter) matrices; dividends accumulate so any window is a difference
+    firm, gvkeys = pd.factorize(panel['gvkey'])
+    quarter = (panel['qidx'] - panel['qidx'].min()).to_numpy()
+    shape = (len(gvkeys), quarter.max() + 1 if len(quarter) else 0)
+    P = np.full(shape, np.nan)
+    P[firm, quarter] = price.to_numpy()
+    D = np.zeros(shape)
+    D[firm, quarter] = dividend.to_numpy()
+    C = np.cumsum(D, axis=1)
+
+    def forward(start_lag, end_lag):
+        """Return from quarter t + start_lag to t + end_lag, aligned to t"""
+        R = np.full(shape, np.nan)
+        n = shape[1] - end_lag
+        if n > 0:
+            base = P[:, start_lag:start_lag + n]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                R[:, :n] = (P[:, end_lag:] + C[:, end_lag:] - C[:, start_lag:start_lag + n]) / base - 1
+        return R[firm, quarter]
+
+    targets = []
+    for h in horizons:
+        panel[f'fwd_{h}q'] = forward(0, h)
+        targets.append(f'fwd_{h}q')
+    for k in decay_lags:
+        panel[f'ret_q+{k}'] = forward(k - 1, k)
+        targets.append(f'ret_q+{k}')
+
+    return panel, targets
+
+def compute_rank_ics(panel, ratio_columns, targets, sector_neutral=False):
+    """Spearman IC of every ratio against every target for every quarter
+
+    Returns one row per (ratio, target, quarter) with the IC and the number of
+    firms having both values.
+    """
+
+    panel = panel.replace([np.inf, -np.inf], np.nan)
+    if sector_neutral:
+        panel = panel[panel['gsector'].notna()]
+    rank_keys = [panel['qidx'], panel['gsector']] if sector_neutral else [panel['qidx']]
+
+    # One column per (ratio, target) pair, restricted to firms with both values
+    pairs = [(ratio, target) for ratio in ratio_columns for target in targets]
+    x = np.column_stack([panel[ratio].where(panel[target].notna()).to_numpy(dtype=float) for ratio, target in pairs])
+    y = np.column_stack([panel[target].where(panel[ratio].notna()).to_numpy(dtype=float) for ratio, target in pairs])
+    columns = [f'{i}' for i in range(len(pairs))]
+    values = pd.DataFrame(np.hstack([x, y]), index=panel.index, columns=[f'x{c}' for c in columns] + [f'y{c}' for c in columns])
+
+    # Percentile ranks and their peer-group means for all pairs at once
+    grouped = values.groupby(rank_keys)
+    ranks = grouped.rank(method='average', pct=True)
+    ranks = ranks - ranks.groupby(rank_keys).transform('mean')
+
+    rx = ranks[[f'x{c}' for c in columns]].to_numpy()
+    ry = ranks[[f'y{c}' for c in columns]].to_numpy()
+    sums = pd.DataFrame(np.hstack([rx * ry, rx * rx, ry * ry, ~np.isnan(rx)]), index=panel.index)
+    sums = sums.groupby(panel['qidx']).sum()
+
+    k = len(pairs)
+    xy, xx, yy, n = (sums.iloc[:, i * k:(i + 1) * k].to_numpy() for i in range(4))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ic = np.where((xx > 0) & (yy > 0), xy / np.sqrt(xx * yy), np.nan)
+
+    quarters = pd.PeriodIndex.from_ordinals(sums.index, freq='Q').astype(str)
+    result = pd.DataFrame({
+        'ratio': np.tile([ratio for ratio, _ in pairs], len(quarters)),
+        'target': np.tile([target for _, target in pairs], len(quarters)),
+        'quarter': np.repeat(quarters, k),
+        'ic': ic.ravel(),
+        'n_firms': n.ravel().astype(int)
+    })
+    return result[result['ic'].notna()].reset_index(drop=True)
+
+def newey_west_t_stat(series, lags):
+    """Mean / Newey-West standard error (Bartlett weights)"""
+
+    x = np.asarray(series, dtype=float)
+    n = len(x)
+    if n < 2:
+        return np.nan
+    e = x - x.mean()
+    variance = e @ e / n
+    for lag in range(1, min(lags, n - 1) + 1):
+        variance += 2 * (1 - lag / (lags + 1)) * (e[lag:] @ e[:-lag]) / n
+    return x.mean() / np.sqrt(variance / n) if variance > 0 else np.nan
+
+def summarize_ics(ics):
+    """IC mean, std, t-statistic and hit rate per method, ratio and target"""
+
+    rows = []
+    for (method, ratio, target), group in ics.groupby(['method', 'ratio', 'target'], sort=False):
+        ic = group['ic']
+        # Overlapping h-quarter returns are autocorrelated up to lag h - 1
+        lags = int(target[4:-1]) - 1 if target.startswith('fwd_') else 0
+        rows.append({
+            'method': method, 'ratio': ratio, 'target': target,
+            'quarters': len(ic),
+            'ic_mean': ic.mean(),
+            'ic_std': ic.std(ddof=1),
+            'icir': ic.mean() / ic.std(ddof=1) if len(ic) > 1 else np.nan,
+            't_stat': newey_west_t_stat(ic, lags),
+            'hit_rate': (np.sign(ic) == np.sign(ic.mean())).mean(),
+            'avg_firms': group['n_firms'].mean()
+        })
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,7 @@ Key tasks:
 3. Calculate mean, median, and variance for each sector-quarter combination
 4. Perform time-series trend analysis for each sector
 5. Generate statistical summary datasets
-6. Create visualization plots for trend identification
+6. Create visualization plots for trend identification (rendered in parallel, unchanged figures skipped)
 7. Generate comprehensive logging of findings and trends
 
 Author: Wassil
@@ -21,12 +21,27 @@ Project: UTIMCO Quantitative Sector Valuation Analysis
 
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend: figures are only written to disk
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from scipy import stats
 
+GICS_NAMES = {
+    10: 'Energy', 15: 'Materials', 20: 'Industrials', 25: 'Consumer Discretionary',
+    30: 'Consumer Staples', 35: 'Health Care', 40: 'Financials', 45: 'Information Technology',
+    50: 'Communication Services', 55: 'Utilities', 60: 'Real Estate'
+}
+
+# Bump when plotting code changes so cached figures are re-rendered
+RENDER_VERSION = 1
+RENDER_MANIFEST = '.render_manifest.json'
+
 def main():
     """Main sector analysis function"""
 
@@ -260,115 +275,180 @@ def calculate_trend(values):
         'std_err': std_err
     }
 
-def create_sector_visualizations(sector_stats, log_entries):
+def create_sector_visualizations(sector_stats, log_entries, dpi=300, fmt='png', output_dir='.', max_workers=None):
     """Create visualization plots for sector analysis"""
 
     log_entries.append("=== VISUALIZATION GENERATION ===")
 
-    gics_names = {
-        10: 'Energy', 15: 'Materials', 20: 'Industrials', 25: 'Consumer Discretionary',
-        30: 'Consumer Staples', 35: 'Health Care', 40: 'Financials', 45: 'Information Technology',
-        50: 'Communication Services', 55: 'Utilities', 60: 'Real Estate'
-    }
-
     # Prepare data for plotting
     sector_stats = sector_stats.sort_values(['gsector', 'quarter'])
-    sector_stats['quarter_date'] = pd.to_datetime(sector_stats['quarter'].str.replace('Q', '-Q'))
 
-    # Create subplots for P/E and M/B trends
-    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
-    fig.suptitle('GICS Sector Valuation Ratios Trends (2010-2025)', fontsize=16, fontweight='bold')
+    # One render job per output file; each job carries only the series it draws
+    jobs = build_render_jobs(sector_stats, dpi, fmt, output_dir)
 
-    # P/E Ratio Trends - Mean
-    for sector_code in sorted(sector_stats['gsector'].unique()):
-        sector_data = sector_stats[sector_stats['gsector'] == sector_code]
-        sector_name = gics_names[sector_code]
-        ax1.plot(sector_data['quarter_date'], sector_data['PE_mean'],
-                label=sector_name, linewidth=2, alpha=0.8)
+    manifest_path = os.path.join(output_dir, RENDER_MANIFEST)
+    manifest = load_render_manifest(manifest_path)
 
-    ax1.set_title('P/E Ratio Trends by Sector (Mean)', fontweight='bold')
-    ax1.set_ylabel('P/E Ratio')
-    ax1.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    ax1.grid(True, alpha=0.3)
+    # Skip figures whose input series are unchanged since the last render
+    pending = []
+    for job in jobs:
+        if manifest.get(job['filename']) == job['hash'] and os.path.exists(job['path']):
+            log_entries.append(f"Unchanged: {job['filename']} (skipped)")
+        else:
+            pending.append(job)
 
-    # M/B Ratio Trends - Mean
-    for sector_code in sorted(sector_stats['gsector'].unique()):
-        sector_data = sector_stats[sector_stats['gsector'] == sector_code]
-        sector_name = gics_names[sector_code]
-        ax2.plot(sector_data['quarter_date'], sector_data['MB_mean'],
-                label=sector_name, linewidth=2, alpha=0.8)
+    if pending:
+        if max_workers == 1 or len(pending) == 1:
+            for job in pending:
+                render_figure(job)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(render_figure, pending))
 
-    ax2.set_title('Market-to-Book Ratio Trends by Sector (Mean)', fontweight='bold')
-    ax2.set_ylabel('M/B Ratio')
-    ax2.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    ax2.grid(True, alpha=0.3)
+    for job in pending:
+        manifest[job['filename']] = job['hash']
+        log_entries.append(f"Created: {job['filename']}")
 
-    # P/E Ratio Volatility (Standard Deviation)
-    for sector_code in sorted(sector_stats['gsector'].unique()):
-        sector_data = sector_stats[sector_stats['gsector'] == sector_code]
-        sector_name = gics_names[sector_code]
-        ax3.plot(sector_data['quarter_date'], sector_data['PE_std'],
-                label=sector_name, linewidth=2, alpha=0.8)
+    save_render_manifest(manifest_path, manifest)
+
+    log_entries.append(f"Figures rendered: {len(pending)} of {len(jobs)} (dpi={dpi}, format={fmt})")
+    log_entries.append("")
 
-    ax3.set_title('P/E Ratio Volatility by Sector (Std Dev)', fontweight='bold')
-    ax3.set_ylabel('P/E Ratio Std Dev')
-    ax3.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    ax3.grid(True, alpha=0.3)
+def build_render_jobs(sector_stats, dpi, fmt, output_dir):
+    """Build picklable render jobs for the overview and per-sector figures"""
 
-    # M/B Ratio Volatility (Standard Deviation)
+    series_columns = ['PE_mean', 'MB_mean', 'PE_std', 'MB_std']
+
+    sectors = []
     for sector_code in sorted(sector_stats['gsector'].unique()):
         sector_data = sector_stats[sector_stats['gsector'] == sector_code]
-        sector_name = gics_names[sector_code]
-        ax4.plot(sector_data['quarter_date'], sector_data['MB_std'],
-                label=sector_name, linewidth=2, alpha=0.8)
+        sectors.append({
+            'sector_code': int(sector_code),
+            'sector_name': GICS_NAMES[sector_code],
+            'quarter': sector_data['quarter'].astype(str).to_numpy(),
+            **{col: sector_data[col].to_numpy(dtype=float) for col in series_columns}
+        })
+
+    jobs = [{'kind': 'overview', 'sectors': sectors,
+             'filename': f'sector_valuation_trends.{fmt}'}]
+    for sector in sectors:
+        name = sector['sector_name'].lower().replace(" ", "_")
+        jobs.append({'kind': 'sector', 'sectors': [sector],
+                     'filename': f"sector_{sector['sector_code']}_{name}_trends.{fmt}"})
+
+    for job in jobs:
+        job['dpi'] = dpi
+        job['fmt'] = fmt
+        job['path'] = os.path.join(output_dir, job['filename'])
+        job['hash'] = hash_render_inputs(job)
+
+    return jobs
+
+def hash_render_inputs(job):
+    """Hash the series and render settings that determine a figure's pixels"""
+    digest = hashlib.sha256()
+    digest.update(f"{RENDER_VERSION}|{job['kind']}|{job['dpi']}|{job['fmt']}".encode())
+    for sector in job['sectors']:
+        digest.update(f"{sector['sector_code']}|{sector['sector_name']}".encode())
+        digest.update('|'.join(sector['quarter']).encode())
+        for col in ['PE_mean', 'MB_mean', 'PE_std', 'MB_std']:
+            digest.update(np.ascontiguousarray(sector[col]).tobytes())
+    return digest.hexdigest()
+
+def load_render_manifest(manifest_path):
+    """Load the filename -> input hash record of previously rendered figures"""
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
-    ax4.set_title('Market-to-Book Ratio Volatility by Sector (Std Dev)', fontweight='bold')
-    ax4.set_ylabel('M/B Ratio Std Dev')
-    ax4.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    ax4.grid(True, alpha=0.3)
+def save_render_manifest(manifest_path, manifest):
+    """Persist the filename -> input hash record"""
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
 
-    plt.tight_layout()
-    plt.savefig('sector_valuation_trends.png', dpi=300, bbox_inches='tight')
-    log_entries.append("Created: sector_valuation_trends.png")
+def render_figure(job):
+    """Draw and save a single figure (runs inside a worker process)"""
 
-    # Create individual sector plots
-    for sector_code in sorted(sector_stats['gsector'].unique()):
-        sector_name = gics_names[sector_code]
-        sector_data = sector_stats[sector_stats['gsector'] == sector_code]
+    # Workers do not inherit main()'s style settings under the spawn start method
+    plt.style.use('seaborn-v0_8')
+    sns.set_palette("husl")
 
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-
-        # P/E and M/B for this sector
-        ax1.plot(sector_data['quarter_date'], sector_data['PE_mean'], 'b-', linewidth=2, label='P/E Mean')
-        ax1.fill_between(sector_data['quarter_date'],
-                        sector_data['PE_mean'] - sector_data['PE_std'],
-                        sector_data['PE_mean'] + sector_data['PE_std'],
-                        alpha=0.3, color='blue', label='±1 Std Dev')
-        ax1.set_title(f'{sector_name} (Sector {sector_code}) - P/E Ratio')
-        ax1.set_ylabel('P/E Ratio')
-        ax1.legend()
-        ax1.grid(True, alpha=0.3)
-        ax1.tick_params(axis='x', rotation=45)
-
-        ax2.plot(sector_data['quarter_date'], sector_data['MB_mean'], 'r-', linewidth=2, label='M/B Mean')
-        ax2.fill_between(sector_data['quarter_date'],
-                        sector_data['MB_mean'] - sector_data['MB_std'],
-                        sector_data['MB_mean'] + sector_data['MB_std'],
-                        alpha=0.3, color='red', label='±1 Std Dev')
-        ax2.set_title(f'{sector_name} (Sector {sector_code}) - Market-to-Book Ratio')
-        ax2.set_ylabel('M/B Ratio')
-        ax2.legend()
-        ax2.grid(True, alpha=0.3)
-        ax2.tick_params(axis='x', rotation=45)
-
-        plt.tight_layout()
-        filename = f'sector_{sector_code}_{sector_name.lower().replace(" ", "_")}_trends.png'
-        plt.savefig(filename, dpi=300, bbox_inches='tight')
-        plt.close()
-
-        log_entries.append(f"Created: {filename}")
+    if job['kind'] == 'overview':
+        fig = plot_sector_overview(job['sectors'])
+    else:
+        fig = plot_single_sector(job['sectors'][0])
 
-    log_entries.append("")
+    fig.savefig(job['path'], dpi=job['dpi'], format=job['fmt'], bbox_inches='tight')
+    plt.close(fig)
+    return job['filename']
+
+def plot_sector_overview(sectors):
+    """4-panel overview of sector P/E and M/B means and standard deviations"""
+
+    # Create subplots for P/E and M/B trends
+    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle('GICS Sector Valuation Ratios Trends (2010-2025)', fontsize=16, fontweight='bold')
+
+    panels = [
+        (ax1, 'PE_mean', 'P/E Ratio Trends by Sector (Mean)', 'P/E Ratio'),
+        (ax2, 'MB_mean', 'Market-to-Book Ratio Trends by Sector (Mean)', 'M/B Ratio'),
+        (ax3, 'PE_std', 'P/E Ratio Volatility by Sector (Std Dev)', 'P/E Ratio Std Dev'),
+        (ax4, 'MB_std', 'Market-to-Book Ratio Volatility by Sector (Std Dev)', 'M/B Ratio Std Dev'),
+    ]
+
+    for ax, column, title, ylabel in panels:
+        for sector in sectors:
+            ax.plot(quarter_dates(sector['quarter']), sector[column],
+                    label=sector['sector_name'], linewidth=2, alpha=0.8)
+
+        ax.set_title(title, fontweight='bold')
+        ax.set_ylabel(ylabel)
+        ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+        ax.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    return fig
+
+def plot_single_sector(sector):
+    """P/E and M/B mean with a ±1 standard deviation band for one sector"""
+
+    sector_code = sector['sector_code']
+    sector_name = sector['sector_name']
+    dates = quarter_dates(sector['quarter'])
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
+
+    # P/E and M/B for this sector
+    ax1.plot(dates, sector['PE_mean'], 'b-', linewidth=2, label='P/E Mean')
+    ax1.fill_between(dates,
+                    sector['PE_mean'] - sector['PE_std'],
+                    sector['PE_mean'] + sector['PE_std'],
+                    alpha=0.3, color='blue', label='±1 Std Dev')
+    ax1.set_title(f'{sector_name} (Sector {sector_code}) - P/E Ratio')
+    ax1.set_ylabel('P/E Ratio')
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+    ax1.tick_params(axis='x', rotation=45)
+
+    ax2.plot(dates, sector['MB_mean'], 'r-', linewidth=2, label='M/B Mean')
+    ax2.fill_between(dates,
+                    sector['MB_mean'] - sector['MB_std'],
+                    sector['MB_mean'] + sector['MB_std'],
+                    alpha=0.3, color='red', label='±1 Std Dev')
+    ax2.set_title(f'{sector_name} (Sector {sector_code}) - Market-to-Book Ratio')
+    ax2.set_ylabel('M/B Ratio')
+    ax2.legend()
+    ax2.grid(True, alpha=0.3)
+    ax2.tick_params(axis='x', rotation=45)
+
+    fig.tight_layout()
+    return fig
+
+def quarter_dates(quarters):
+    """Convert '2010Q1'-style labels to quarter start timestamps"""
+    return pd.PeriodIndex(quarters, freq='Q').to_timestamp()
 
 if __name__ == "__main__":
     main()
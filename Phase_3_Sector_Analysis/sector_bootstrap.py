@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Sector-Quarter Bootstrap Confidence Intervals - Phase 3: Sector Analysis
+==========================================================================
+
+This script attaches bootstrap confidence intervals to the sector-quarter
+statistics produced by sector.py. Some sector-quarters contain few firms and
+heavy-tailed ratios, so the point estimates in Compustat_Sector_Statistics.csv
+need an uncertainty band before they drive allocation decisions.
+
+Key tasks:
+1. Load and clean the Phase 2 ratio time series (same cleaning as sector.py)
+2. Resample every sector-quarter at once with batched index matrices
+3. Compute percentile intervals for the mean, median and variance of each ratio
+4. Save the interval dataset and a processing log
+
+Resampling is vectorized across groups: firms are sorted by (group, value), and
+each resample row draws indices for all groups of a chunk side by side. Because
+every group occupies a disjoint index range, one row-wise sort of the index
+matrix yields sorted draws for every group, so medians are read off by position
+and means/variances come from np.add.reduceat. Chunks are sized to a memory
+budget and can be spread over a process pool; each chunk gets its own child
+seed, so results are reproducible for a given seed and memory budget.
+
+Author: Wassil
+Project: UTIMCO Quantitative Sector Valuation Analysis
+"""
+
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sector import clean_data_for_analysis, GICS_NAMES
+
+# Approximate bytes held per (resample, firm) cell: index matrix, draws and
+# deviation temporaries
+BYTES_PER_CELL = 32
+
+STATISTICS = ['mean', 'median', 'var']
+
+def main():
+    """Main bootstrap function"""
+
+    print("=== Sector-Quarter Bootstrap Confidence Intervals ===\n")
+
+    input_file = "../Phase_2_Algorithm_Development/Compustat_Ratios_TimeSeries.csv"
+    output_csv = "Compustat_Sector_Bootstrap_CI.csv"
+    log_filename = "sector_bootstrap_log.txt"
+
+    print(f"Loading data from: {input_file}")
+
+    try:
+        df = pd.read_csv(input_file, low_memory=False)
+        print(f"Loaded {len(df):,} observations")
+    except FileNotFoundError:
+        print(f"Error: Could not find {input_file}")
+        return
+
+    log_entries = []
+    log_entries.append("=== SECTOR-QUARTER BOOTSTRAP CONFIDENCE INTERVAL LOG ===")
+    log_entries.append(f"Processing Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log_entries.append(f"Input Data: {input_file}")
+    log_entries.append("")
+
+    df_clean = clean_data_for_analysis(df, log_entries)
+
+    n_resamples = 1000
+    confidence = 0.95
+    seed = 42
+
+    start = datetime.now()
+    ci = bootstrap_sector_quarter_ci(df_clean, n_resamples=n_resamples,
+                                     confidence=confidence, seed=seed)
+    elapsed = (datetime.now() - start).total_seconds()
+
+    ci['sector_name'] = ci['gsector'].map(GICS_NAMES)
+    ci.to_csv(output_csv, index=False)
+
+    log_entries.append("=== BOOTSTRAP SETTINGS ===")
+    log_entries.append(f"Resamples per sector-quarter: {n_resamples:,}")
+    log_entries.append(f"Confidence level: {confidence:.0%}")
+    log_entries.append(f"Seed: {seed}")
+    log_entries.append(f"Sector-quarter combinations: {len(ci):,}")
+    log_entries.append(f"Elapsed: {elapsed:.1f}s")
+    log_entries.append("")
+
+    # Flag sector-quarters whose mean interval is wide relative to the estimate
+    log_entries.append("=== WIDEST P/E MEAN INTERVALS ===")
+    ci['PE_mean_ci_width'] = ci['PE_mean_ci_high'] - ci['PE_mean_ci_low']
+    for _, row in ci.nlargest(10, 'PE_mean_ci_width').iterrows():
+        log_entries.append(f"Sector {row['gsector']} ({row['sector_name']}) {row['quarter']}: "
+                           f"n={row['n_obs']:.0f}, CI [{row['PE_mean_ci_low']:.2f}, {row['PE_mean_ci_high']:.2f}]")
+    log_entries.append("")
+    log_entries.append(f"Bootstrap intervals saved to: {output_csv}")
+
+    with open(log_filename, 'w') as f:
+        f.write('\n'.join(log_entries))
+
+    print(f"\nBootstrap complete. Results saved to {output_csv}")
+    print(f"Log saved to {log_filename}")
+
+def bootstrap_sector_quarter_ci(df_clean, ratio_columns=('PE_ratio', 'MB_ratio'),
+                                group_keys=('gsector', 'quarter'), n_resamples=1000,
+                                confidence=0.95, seed=42, memory_budget_mb=256,
+                                max_workers=None):
+    """Bootstrap percentile intervals for the mean, median and variance of each group"""
+
+    group_keys = list(group_keys)
+
+    seed_seq = np.random.SeedSequence(seed)
+    ratio_seeds = seed_seq.spawn(len(ratio_columns))
+
+    result = None
+    for ratio, ratio_seed in zip(ratio_columns, ratio_seeds):
+        data = df_clean[group_keys + [ratio]].dropna(subset=[ratio])
+        grouped = data.groupby(group_keys, sort=True)
+        labels = grouped.size()
+
+        # Sort by (group, value) so each group is a contiguous, ascending block
+        codes = grouped.ngroup().to_numpy()
+        values = data[ratio].to_numpy(dtype=float)
+        order = np.lexsort((values, codes))
+        values = values[order]
+        sizes = labels.to_numpy()
+
+        chunks = plan_resample_chunks(sizes, n_resamples, memory_budget_mb)
+        chunk_seeds = ratio_seed.spawn(len(chunks))
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+        jobs = []
+        for (g_start, g_end, batch), chunk_seed in zip(chunks, chunk_seeds):
+            jobs.append((values[offsets[g_start]:offsets[g_end]], sizes[g_start:g_end],
+                         n_resamples, batch, confidence, chunk_seed))
+
+        if max_workers == 1 or len(jobs) == 1:
+            intervals = [bootstrap_chunk(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                intervals = list(executor.map(bootstrap_chunk, jobs))
+        intervals = np.concatenate(intervals, axis=0)
+
+        prefix = ratio.replace('_ratio', '')
+        frame = labels.rename(f'{prefix}_n').reset_index()
+        for s, stat in enumerate(STATISTICS):
+            frame[f'{prefix}_{stat}_ci_low'] = intervals[:, s, 0]
+            frame[f'{prefix}_{stat}_ci_high'] = intervals[:, s, 1]
+
+        result = frame if result is None else result.merge(frame, on=group_keys, how='outer')
+
+    count_cols = [f"{ratio.replace('_ratio', '')}_n" for ratio in ratio_columns]
+    result.insert(len(group_keys), 'n_obs', result[count_cols].max(axis=1))
+    result = result.drop(columns=count_cols)
+    result['confidence'] = confidence
+
+    return result
+
+def plan_resample_chunks(sizes, n_resamples, memory_budget_mb):
+    """Split groups into chunks whose index matrices fit the memory budget"""
+
+    budget_cells = max(1, int(memory_budget_mb * 1024 * 1024 // BYTES_PER_CELL))
+
+    chunks = []
+    start = 0
+    rows = 0
+    for g, size in enumerate(sizes):
+        if rows and (rows + size) * n_resamples > budget_cells:
+            chunks.append((start, g, n_resamples))
+            start, rows = g, 0
+        rows += size
+    if rows:
+        chunks.append((start, len(sizes), n_resamples))
+
+    # A chunk that alone exceeds the budget resamples in smaller batches
+    planned = []
+    for g_start, g_end, _ in chunks:
+        rows = sizes[g_start:g_end].sum()
+        batch = int(min(n_resamples, max(1, budget_cells // rows)))
+        planned.append((g_start, g_end, batch))
+
+    return planned
+
+def bootstrap_chunk(job):
+    """Percentile intervals for every group in one chunk (runs inside a worker process)"""
+
+    values, sizes, n_resamples, batch, confidence, chunk_seed = job
+    rng = np.random.default_rng(chunk_seed)
+
+    draws = [[] for _ in STATISTICS]
+    remaining = n_resamples
+    while remaining > 0:
+        n = min(batch, remaining)
+        for s, stat in enumerate(resample_statistics(values, sizes, n, rng)):
+            draws[s].append(stat)
+        remaining -= n
+
+    tail = (1 - confidence) / 2 * 100
+    intervals = np.empty((len(sizes), len(STATISTICS), 2))
+    for s in range(len(STATISTICS)):
+        stat = np.concatenate(draws[s], axis=0)
+        intervals[:, s, :] = np.percentile(stat, [tail, 100 - tail], axis=0).T
+
+    return intervals
+
+def resample_statistics(values, sizes, n_resamples, rng):
+    """Mean, median and variance of n_resamples bootstrap draws of every group
+
+    values must be sorted ascending within each group; returns three arrays of
+    shape (n_resamples, n_groups).
+    """
+
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    row_group = np.repeat(np.arange(len(sizes)), sizes)
+    row_size = sizes[row_group]
+
+    # Index matrix: each row is one resample of every group, side by side.
+    # Scaled uniforms are cheaper than integers() with per-column bounds; the
+    # clip guards the rare u * n rounding up to n.
+    idx = (rng.random((n_resamples, len(values))) * row_size).astype(np.int32)
+    np.minimum(idx, (row_size - 1).astype(np.int32), out=idx)
+    idx += offsets[row_group].astype(np.int32)
+
+    # Group index ranges are disjoint, so a row sort keeps every group in place
+    # and, with values pre-sorted, leaves each group's draws in ascending order
+    idx.sort(axis=1)
+    sample = values[idx]
+
+    means = np.add.reduceat(sample, offsets, axis=1) / sizes
+
+    deviations = sample - np.repeat(means, sizes, axis=1)
+    sq_dev = np.add.reduceat(deviations * deviations, offsets, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variances = np.where(sizes > 1, sq_dev / (sizes - 1), np.nan)
+
+    lower = offsets + (sizes - 1) // 2
+    upper = offsets + sizes // 2
+    medians = 0.5 * (sample[:, lower] + sample[:, upper])
+
+    return means, medians, variances
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Rolling Sector Valuation Co-movement - Phase 3: Sector Analysis
+==========================================================================
+
+This script measures how sector valuations move together over time. It turns
+the sector-quarter medians from Compustat_Sector_Statistics.csv into
+quarter-over-quarter changes and computes rolling-window covariance and
+correlation matrices across all 11 GICS sectors.
+
+Key tasks:
+1. Load the Phase 3 sector statistics
+2. Pivot PE_median / MB_median into (quarter x sector) change matrices
+3. Compute rolling 8/12/20-quarter covariance and correlation matrices
+4. Store the matrices as compact (quarter x sector x sector) arrays
+5. Log the latest cross-sector correlation structure
+
+Windows are updated incrementally: pairwise sums (counts, sums, sums of
+squares and cross-products over rows where both sectors are observed) are
+adjusted for the quarter entering and the quarter leaving the window, so each
+step costs O(sectors^2) instead of recomputing the whole window. Missing
+sector-quarters are handled pairwise, matching pandas DataFrame.cov/corr.
+
+Author: Wassil
+Project: UTIMCO Quantitative Sector Valuation Analysis
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from sector import GICS_NAMES
+
+METRICS = ['PE_median', 'MB_median']
+WINDOWS = [8, 12, 20]
+
+def main():
+    """Main co-movement function"""
+
+    print("=== Rolling Sector Valuation Co-movement ===\n")
+
+    input_file = "Compustat_Sector_Statistics.csv"
+    output_file = "sector_comovement.npz"
+    log_filename = "sector_comovement_log.txt"
+
+    print(f"Loading data from: {input_file}")
+
+    try:
+        sector_stats = pd.read_csv(input_file)
+    except FileNotFoundError:
+        print(f"Error: Could not find {input_file}")
+        return
+
+    log_entries = []
+    log_entries.append("=== ROLLING SECTOR VALUATION CO-MOVEMENT LOG ===")
+    log_entries.append(f"Processing Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log_entries.append(f"Input Data: {input_file}")
+    log_entries.append(f"Metrics: {', '.join(METRICS)} (quarter-over-quarter changes)")
+    log_entries.append(f"Windows: {', '.join(str(w) for w in WINDOWS)} quarters")
+    log_entries.append("")
+
+    store = build_comovement_store(sector_stats, METRICS, WINDOWS)
+    save_comovement_store(output_file, store)
+
+    sector_names = [GICS_NAMES[code] for code in store['sectors']]
+    latest = store['quarters'][-1]
+
+    for metric in METRICS:
+        for window in WINDOWS:
+            corr = store[f'{metric}_w{window}_corr'][-1].astype(float)
+            upper = np.triu_indices_from(corr, k=1)
+            pairs = corr[upper]
+
+            log_entries.append(f"=== {metric} CHANGES - {window}-QUARTER WINDOW ENDING {latest} ===")
+            if np.isnan(pairs).all():
+                log_entries.append("Insufficient overlapping data")
+                log_entries.append("")
+                continue
+
+            log_entries.append(f"Average pairwise correlation: {np.nanmean(pairs):.3f}")
+            best = np.nanargmax(pairs)
+            worst = np.nanargmin(pairs)
+            log_entries.append(f"Most correlated: {sector_names[upper[0][best]]} / "
+                               f"{sector_names[upper[1][best]]} ({pairs[best]:.3f})")
+            log_entries.append(f"Least correlated: {sector_names[upper[0][worst]]} / "
+                               f"{sector_names[upper[1][worst]]} ({pairs[worst]:.3f})")
+            log_entries.append("")
+
+    log_entries.append(f"Co-movement matrices saved to: {output_file}")
+
+    with open(log_filename, 'w') as f:
+        f.write('\n'.join(log_entries))
+
+    print(f"\nCo-movement analysis complete. Results saved to {output_file}")
+    print(f"Log saved to {log_filename}")
+
+def sector_change_matrix(sector_stats, metric, change='diff'):
+    """Pivot a sector statistic to (quarter x sector) and take quarter-over-quarter changes"""
+
+    panel = sector_stats.pivot_table(index='quarter', columns='gsector', values=metric, aggfunc='first')
+    panel = panel.sort_index()
+
+    # Reindex to a gap-free quarter calendar so changes never span missing quarters
+    quarters = pd.period_range(pd.Period(panel.index[0], 'Q'), pd.Period(panel.index[-1], 'Q'), freq='Q')
+    panel = panel.reindex(quarters.astype(str))
+
+    if change == 'pct':
+        return panel.pct_change(fill_method=None)
+    return panel.diff()
+
+def rolling_comovement(changes, window, min_periods=None):
+    """Rolling pairwise covariance and correlation of a (T x k) array with NaNs
+
+    Returns (cov, corr), each of shape (T, k, k); entries are NaN until a pair
+    has at least min_periods overlapping observations in the window.
+    """
+
+    changes = np.asarray(changes, dtype=float)
+    T, k = changes.shape
+    min_periods = window if min_periods is None else min_periods
+
+    # Centering by the column mean leaves covariances unchanged but keeps the
+    # running sums small, limiting cancellation in the add/remove updates
+    centered = changes - np.nanmean(changes, axis=0)
+    present = ~np.isnan(centered)
+    values = np.where(present, centered, 0.0)
+    mask = present.astype(float)
+
+    n = np.zeros((k, k))
+    sx = np.zeros((k, k))   # sx[i, j]  = sum of x_i over rows where i and j are observed
+    sxx = np.zeros((k, k))  # sxx[i, j] = sum of x_i^2 over the same rows
+    sxy = np.zeros((k, k))  # sxy[i, j] = sum of x_i * x_j
+
+    cov = np.full((T, k, k), np.nan)
+    corr = np.full((T, k, k), np.nan)
+
+    for t in range(T):
+        x, m = values[t], mask[t]
+        n += np.outer(m, m)
+        sx += np.outer(x, m)
+        sxx += np.outer(x * x, m)
+        sxy += np.outer(x, x)
+
+        if t >= window:
+            x, m = values[t - window], mask[t - window]
+            n -= np.outer(m, m)
+            sx -= np.outer(x, m)
+            sxx -= np.outer(x * x, m)
+            sxy -= np.outer(x, x)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            co_moment = n * sxy - sx * sx.T
+            cov_t = co_moment / (n * (n - 1))
+            var_i = n * sxx - sx * sx
+            corr_t = co_moment / np.sqrt(var_i * var_i.T)
+
+        valid = n >= max(min_periods, 2)
+        cov[t] = np.where(valid, cov_t, np.nan)
+        corr[t] = np.where(valid, np.clip(corr_t, -1.0, 1.0), np.nan)
+
+    return cov, corr
+
+def build_comovement_store(sector_stats, metrics=METRICS, windows=WINDOWS, change='diff'):
+    """Compute rolling matrices for every metric and window, keyed by quarter"""
+
+    store = {}
+    for metric in metrics:
+        changes = sector_change_matrix(sector_stats, metric, change)
+        store.setdefault('quarters', changes.index.to_numpy(dtype=str))
+        store.setdefault('sectors', changes.columns.to_numpy(dtype=int))
+
+        for window in windows:
+            cov, corr = rolling_comovement(changes.to_numpy(), window)
+            store[f'{metric}_w{window}_cov'] = cov.astype(np.float32)
+            store[f'{metric}_w{window}_corr'] = corr.astype(np.float32)
+
+    return store
+
+def save_comovement_store(path, store):
+    """Write the co-movement arrays to a compressed .npz file"""
+    np.savez_compressed(path, **store)
+
+def load_comovement_store(path):
+    """Load the co-movement arrays written by save_comovement_store"""
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+def comovement_at(store, metric, window, quarter, kind='corr'):
+    """Sector x sector matrix for one quarter as a labeled DataFrame"""
+
+    quarters = list(store['quarters'])
+    if quarter not in quarters:
+        raise KeyError(f"Quarter {quarter} not in co-movement store")
+
+    labels = [GICS_NAMES.get(code, str(code)) for code in store['sectors']]
+    matrix = store[f'{metric}_w{window}_{kind}'][quarters.index(quarter)]
+    return pd.DataFrame(matrix, index=labels, columns=labels)
+
+if __name__ == "__main__":
+    main()
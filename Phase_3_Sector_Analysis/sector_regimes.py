@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Sector Valuation Regime Detection - Phase 3: Sector Analysis
+==========================================================================
+
+This script finds structural breaks in sector valuation series. The trend
+section of sector_analysis_log.txt summarizes each 2010-2025 series with one
+slope; here each sector x metric series is split into regimes (e.g. around
+the 2020Q1 COVID shock and the 2022 rate shock) and every regime is reported
+with its own mean and slope.
+
+Key tasks:
+1. Load the Phase 3 sector statistics
+2. Arrange every group x metric series as one row of a (series x quarter) matrix
+3. Detect mean-shift change points with batched binary segmentation
+4. Summarize each regime (quarters covered, mean, slope)
+5. Save the regime table and a processing log
+
+Binary segmentation runs on all series at once: with cumulative sums, the
+cost reduction of splitting the segment around every candidate quarter is an
+O(1) expression, so each round scores every candidate of every series in one
+array operation and accepts the best split per series while it beats a
+BIC-style penalty (scaled by a robust noise estimate from first differences).
+Chunks of series can be spread over a process pool, so the same stage covers
+any grouping column (gsector, ggroup, gind, gsubind) and any number of ratios.
+
+Author: Wassil
+Project: UTIMCO Quantitative Sector Valuation Analysis
+"""
+
+import pandas as pd
+import numpy as np
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sector import GICS_NAMES
+
+METRICS = ['PE_mean', 'PE_median', 'MB_mean', 'MB_median']
+
+def main():
+    """Main regime detection function"""
+
+    print("=== Sector Valuation Regime Detection ===\n")
+
+    input_file = "Compustat_Sector_Statistics.csv"
+    output_csv = "Compustat_Sector_Regimes.csv"
+    log_filename = "sector_regimes_log.txt"
+
+    print(f"Loading data from: {input_file}")
+
+    try:
+        sector_stats = pd.read_csv(input_file)
+    except FileNotFoundError:
+        print(f"Error: Could not find {input_file}")
+        return
+
+    log_entries = []
+    log_entries.append("=== SECTOR VALUATION REGIME DETECTION LOG ===")
+    log_entries.append(f"Processing Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log_entries.append(f"Input Data: {input_file}")
+    log_entries.append("Method: batched binary segmentation (mean shift, BIC-style penalty)")
+    log_entries.append("")
+
+    start = datetime.now()
+    regimes = detect_regimes(sector_stats, group_col='gsector', metrics=METRICS)
+    elapsed = (datetime.now() - start).total_seconds()
+
+    regimes.insert(1, 'sector_name', regimes['gsector'].map(GICS_NAMES))
+    regimes.to_csv(output_csv, index=False)
+
+    n_series = regimes[['gsector', 'metric']].drop_duplicates().shape[0]
+    log_entries.append(f"Series analyzed: {n_series}")
+    log_entries.append(f"Regimes found: {len(regimes)}")
+    log_entries.append(f"Elapsed: {elapsed:.3f}s")
+    log_entries.append("")
+
+    for (sector_code, metric), group in regimes.groupby(['gsector', 'metric'], sort=True):
+        log_entries.append(f"Sector {sector_code} ({GICS_NAMES.get(sector_code, sector_code)}) - {metric}:")
+        breaks = group['start_quarter'].iloc[1:].tolist()
+        log_entries.append(f"  Breaks: {', '.join(breaks) if breaks else 'none'}")
+        for _, row in group.iterrows():
+            log_entries.append(f"  {row['start_quarter']}-{row['end_quarter']} ({row['n_quarters']} qtrs): "
+                               f"mean={row['mean']:.2f}, slope={row['slope']:+.4f}/qtr")
+        log_entries.append("")
+
+    log_entries.append(f"Regime table saved to: {output_csv}")
+
+    with open(log_filename, 'w') as f:
+        f.write('\n'.join(log_entries))
+
+    print(f"\nRegime detection complete. Results saved to {output_csv}")
+    print(f"Log saved to {log_filename}")
+
+def detect_regimes(stats, group_col='gsector', metrics=METRICS, time_col='quarter',
+                   max_breaks=5, min_size=4, penalty_scale=2.0,
+                   max_workers=1, chunk_size=512):
+    """Split every group x metric series into regimes and summarize each regime"""
+
+    labels, quarters, series = build_series_matrix(stats, group_col, metrics, time_col)
+
+    chunks = [(series[i:i + chunk_size], max_breaks, min_size, penalty_scale)
+              for i in range(0, len(series), chunk_size)]
+
+    if max_workers == 1 or len(chunks) == 1:
+        breakpoints = [segment_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            breakpoints = list(executor.map(segment_chunk, chunks))
+    regime_starts = [starts for chunk in breakpoints for starts in chunk]
+
+    return summarize_regimes(labels, quarters, series, regime_starts, group_col)
+
+def build_series_matrix(stats, group_col, metrics, time_col='quarter'):
+    """Arrange every group x metric series as a row of a (series x quarter) array"""
+
+    wide = stats.pivot_table(index=time_col, columns=group_col, values=metrics, aggfunc='first')
+    wide = wide.sort_index()
+
+    labels = [(group, metric) for metric, group in wide.columns]
+    quarters = wide.index.to_numpy(dtype=str)
+    series = wide.to_numpy(dtype=float).T
+
+    return labels, quarters, series
+
+def segment_chunk(chunk):
+    """Change points for a chunk of series (runs inside a worker process)"""
+
+    series, max_breaks, min_size, penalty_scale = chunk
+
+    # Drop missing quarters and left-align each series; order maps the
+    # compacted index back to the quarter calendar
+    present = ~np.isnan(series)
+    lengths = present.sum(axis=1)
+    order = np.argsort(~present, axis=1, kind='stable')
+    values = np.take_along_axis(series, order, axis=1)
+
+    bp = binary_segmentation(values, lengths, max_breaks, min_size, penalty_scale)
+
+    # Regime start positions on the quarter calendar
+    regime_starts = []
+    for i in range(len(series)):
+        cuts = np.flatnonzero(bp[i])[:-1]
+        regime_starts.append(order[i, cuts].tolist() if lengths[i] else [])
+    return regime_starts
+
+def binary_segmentation(values, lengths, max_breaks=5, min_size=4, penalty_scale=2.0):
+    """Batched greedy binary segmentation for mean shifts
+
+    values: (m, T) array, each row left-aligned with lengths[i] valid entries.
+    Returns an (m, T + 1) boolean array marking segment boundaries (always
+    including 0 and lengths[i]).
+    """
+
+    m, T = values.shape
+    rows = np.arange(m)
+    positions = np.arange(T + 1)
+    valid = positions[None, :T] < lengths[:, None]
+
+    filled = np.where(valid, values, 0.0)
+    cumsum = np.concatenate([np.zeros((m, 1)), np.cumsum(filled, axis=1)], axis=1)
+
+    # Robust noise variance from first differences (a mean shift only moves
+    # one difference, so the MAD of differences ignores the breaks)
+    diffs = np.diff(np.where(valid, values, np.nan), axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN rows for very short series
+        med = np.nanmedian(diffs, axis=1, keepdims=True)
+        mad = np.nanmedian(np.abs(diffs - med), axis=1)
+    sigma2 = (mad / 0.6745) ** 2 / 2
+    sigma2 = np.where(np.isfinite(sigma2) & (sigma2 > 0), sigma2, np.nanvar(filled, axis=1) + 1e-12)
+    penalty = penalty_scale * np.log(np.maximum(lengths, 2)) * sigma2
+
+    bp = np.zeros((m, T + 1), dtype=bool)
+    bp[:, 0] = True
+    bp[rows, lengths] = True
+    active = lengths >= 2 * min_size
+
+    for _ in range(max_breaks):
+        if not active.any():
+            break
+
+        # Enclosing segment [a, b) of every candidate split t
+        a = np.maximum.accumulate(np.where(bp, positions, 0), axis=1)
+        b = np.minimum.accumulate(np.where(bp, positions, T + 1)[:, ::-1], axis=1)[:, ::-1]
+
+        n_left = positions - a
+        n_right = b - positions
+        left = cumsum - np.take_along_axis(cumsum, a, axis=1)
+        right = np.take_along_axis(cumsum, np.minimum(b, T), axis=1) - cumsum
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gain = left ** 2 / n_left + right ** 2 / n_right - (left + right) ** 2 / (n_left + n_right)
+
+        candidate = (~bp & (positions < lengths[:, None]) &
+                     (n_left >= min_size) & (n_right >= min_size) & active[:, None])
+        gain = np.where(candidate, gain, -np.inf)
+
+        best = np.argmax(gain, axis=1)
+        accept = gain[rows, best] > penalty
+        bp[rows[accept], best[accept]] = True
+        active &= accept
+
+    return bp
+
+def summarize_regimes(labels, quarters, series, regime_starts, group_col):
+    """Per-regime quarter span, mean and linear slope for every series"""
+
+    records = []
+    for (group, metric), y, starts in zip(labels, series, regime_starts):
+        ends = starts[1:] + [len(y)]
+        for regime, (start, end) in enumerate(zip(starts, ends), start=1):
+            x = np.arange(start, end)
+            ok = ~np.isnan(y[start:end])
+            xs, ys = x[ok], y[start:end][ok]
+
+            # OLS slope in value units per quarter
+            dx = xs - xs.mean()
+            slope = (dx * (ys - ys.mean())).sum() / (dx * dx).sum() if len(xs) >= 2 else np.nan
+
+            records.append({
+                group_col: group,
+                'metric': metric,
+                'regime': regime,
+                'start_quarter': quarters[xs[0]],
+                'end_quarter': quarters[xs[-1]],
+                'n_quarters': len(xs),
+                'mean': ys.mean(),
+                'slope': slope
+            })
+
+    return pd.DataFrame(records)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Allocation Inputs from Phase 3 - Phase 4: Investment Decisions
+===============================================================
+
+Computes the per-sector inputs behind the allocation (P/E level, P/E
+variance and P/E trend) directly from Compustat_Sector_Statistics.csv
+instead of copying them from the Phase 3 log, for any as-of quarter.
+
+Definitions (as in the Phase 3 sector analysis log):
+- pe_ratio: mean of the quarterly PE_mean values
+- variance: variance of the quarterly PE_mean values
+- trend: OLS slope of PE_mean per quarter (quarters with data, in order)
+
+All quarters are computed at once from running sums per sector (expanding
+history through each quarter, or a trailing window), so any as-of quarter
+is a lookup. Results are memoized per statistics file and keyed by its
+version (modification time and size): regenerating the Phase 3 file
+invalidates the cache automatically, and repeated requests never re-read
+or re-aggregate anything.
+
+Author: Wassil
+Project: $2.5M Sector Allocation Strategy
+"""
+
+import pandas as pd
+import numpy as np
+import os
+
+SECTOR_STATS_PATH = "../Phase_3_Sector_Analysis/Compustat_Sector_Statistics.csv"
+
+# (path, version, metric, lookback) -> inputs table for every quarter
+_input_cache = {}
+
+def stats_version(path=SECTOR_STATS_PATH):
+    """Version key of the statistics file (modification time, size)"""
+    info = os.stat(path)
+    return (info.st_mtime_ns, info.st_size)
+
+def compute_allocation_inputs(sector_stats, metric='PE_mean', lookback=None):
+    """Level, variance and trend of a sector statistic through every quarter
+
+    Returns a DataFrame indexed by (quarter, gsector) with pe_ratio, variance,
+    trend and n_quarters. lookback=None uses the full history up to each
+    quarter; otherwise the trailing `lookback` calendar quarters.
+    """
+
+    panel = sector_stats.pivot_table(index='quarter', columns='gsector', values=metric, aggfunc='first').sort_index()
+    y = panel.to_numpy(dtype=float)
+    present = ~np.isnan(y)
+    values = np.where(present, y, 0.0)
+
+    # x is the position among a sector's observed quarters, like the Phase 3
+    # trend fit on the NaN-free series; the slope does not depend on its origin
+    x = np.cumsum(present, axis=0) - 1.0
+    x = np.where(present, x, 0.0)
+
+    sums = [np.cumsum(a, axis=0) for a in (present.astype(float), x, values, x * values, x * x, values * values)]
+    if lookback is not None:
+        sums = [s - np.vstack([np.zeros((lookback, s.shape[1])), s[:-lookback]])[:len(s)] for s in sums]
+    n, sx, sy, sxy, sxx, syy = sums
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = sy / n
+        variance = (syy - sy * sy / n) / (n - 1)
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+
+    index = pd.MultiIndex.from_product([panel.index, panel.columns], names=['quarter', 'gsector'])
+    inputs = pd.DataFrame({
+        'pe_ratio': np.where(n >= 1, mean, np.nan).ravel(),
+        'variance': np.where(n >= 2, variance, np.nan).ravel(),
+        'trend': np.where(n >= 4, slope, np.nan).ravel(),
+        'n_quarters': n.astype(int).ravel()
+    }, index=index)
+
+    return inputs
+
+def load_allocation_inputs(path=SECTOR_STATS_PATH, metric='PE_mean', lookback=None):
+    """Memoized compute_allocation_inputs for a statistics file"""
+
+    key = (os.path.abspath(path), stats_version(path), metric, lookback)
+    if key not in _input_cache:
+        # Drop entries for older versions of the same file
+        for old in [k for k in _input_cache if k[0] == key[0] and k[1] != key[1]]:
+            del _input_cache[old]
+        _input_cache[key] = compute_allocation_inputs(pd.read_csv(path), metric, lookback)
+    return _input_cache[key]
+
+def allocation_inputs_as_of(as_of=None, path=SECTOR_STATS_PATH, metric='PE_mean', lookback=None):
+    """Per-sector inputs (indexed by gsector) for one quarter, e.g. '2025Q2' (latest if None)"""
+
+    inputs = load_allocation_inputs(path, metric, lookback)
+    quarters = inputs.index.get_level_values('quarter')
+    if as_of is None:
+        as_of = quarters.max()
+    elif as_of not in quarters:
+        raise KeyError(f"Quarter {as_of} not in sector statistics ({quarters.min()} to {quarters.max()})")
+
+    return inputs.xs(as_of, level='quarter')
+
+def clear_cache():
+    """Forget all memoized inputs"""
+    _input_cache.clear()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Sector Allocation Optimizer - Phase 4: Investment Decisions
+===============================================================
+
+Long-only sector allocation from an expected-return vector and a shrinkage
+covariance estimate, replacing hand-typed weights with reproducible ones.
+
+Portfolios:
+- Max-Sharpe: highest (return - risk-free) / volatility on the constrained frontier
+- Min-variance: lowest volatility portfolio
+- Risk-parity: every sector contributes the same share of portfolio variance
+- Efficient frontier: mean-variance portfolios for a grid of risk aversions
+
+Constraints: fully invested, long-only, per-sector weight caps, excluded
+sectors (Real Estate by default) and an optional turnover limit relative to
+the current allocation.
+
+The frontier is solved for all risk aversions at once: accelerated projected
+gradient on a (points x sectors) weight matrix, where each step is one matrix
+product followed by a batched projection onto the capped simplex (bisection
+on the simplex multiplier). Max-Sharpe refines the best frontier point with a
+second, narrower batch.
+
+Inputs:
+- Expected returns: earnings yield (1 / trailing P/E median) from Phase 3
+- Covariance: Ledoit-Wolf shrinkage of monthly sector ETF returns (price store)
+
+Author: Wassil
+Project: $2.5M Sector Allocation Strategy
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from price_store import PRICE_STORE_DIR, SECTOR_ETFS, load_price_store, get_returns
+
+SECTOR_STATS_PATH = "../Phase_3_Sector_Analysis/Compustat_Sector_Statistics.csv"
+PORTFOLIO_VALUE = 2500000
+
+DEFAULT_CAP = 0.25
+DEFAULT_EXCLUDE = (60,)  # Real Estate
+
+def main():
+    """Main optimizer function"""
+
+    print("=== Sector Allocation Optimizer ===\n")
+
+    try:
+        sector_stats = pd.read_csv(SECTOR_STATS_PATH)
+        store = load_price_store(PRICE_STORE_DIR)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return
+
+    expected_returns = earnings_yield_returns(sector_stats)
+    monthly = sector_monthly_returns(store)
+    cov, shrinkage = ledoit_wolf_covariance(monthly)
+    cov = cov * 12
+
+    sectors = expected_returns.index.intersection(cov.index)
+    expected_returns = expected_returns[sectors]
+    cov = cov.loc[sectors, sectors]
+
+    portfolios = {
+        method: optimize_allocation(expected_returns, cov, method=method, caps=DEFAULT_CAP, exclude=DEFAULT_EXCLUDE)
+        for method in ['max_sharpe', 'min_variance', 'risk_parity']
+    }
+
+    start = datetime.now()
+    frontier = efficient_frontier(expected_returns, cov, n_points=200, caps=DEFAULT_CAP, exclude=DEFAULT_EXCLUDE)
+    elapsed = (datetime.now() - start).total_seconds()
+    frontier.to_csv('efficient_frontier.csv', index=False)
+
+    report = []
+    report.append("=== SECTOR ALLOCATION OPTIMIZER ===\n")
+    report.append(f"Report Date: {datetime.now().strftime('%Y-%m-%d')}\n")
+    report.append("Expected returns: earnings yield (1 / trailing 4-quarter P/E median)\n")
+    report.append(f"Covariance: Ledoit-Wolf, {len(monthly.dropna())} months, shrinkage {shrinkage:.3f}\n")
+    report.append(f"Constraints: cap {DEFAULT_CAP:.0%} per sector, excluded {list(DEFAULT_EXCLUDE)}\n")
+    report.append(f"Frontier: {len(frontier)} points in {elapsed:.3f}s (efficient_frontier.csv)\n\n")
+
+    for method, weights in portfolios.items():
+        stats = portfolio_statistics(weights, expected_returns, cov)
+        report.append(f"=== {method.replace('_', ' ').upper()} ===\n")
+        report.append(f"Expected return {stats['expected_return']:.2%}, volatility {stats['volatility']:.2%}, "
+                      f"Sharpe {stats['sharpe_ratio']:.3f}\n")
+        for sector, weight in weights[weights > 1e-4].sort_values(ascending=False).items():
+            report.append(f"  {sector} ({SECTOR_ETFS[sector]}): {weight:.1%} → ${weight * PORTFOLIO_VALUE:,.0f}\n")
+        report.append("\n")
+
+    with open('allocation_optimizer_report.txt', 'w') as f:
+        f.writelines(report)
+
+    print("Optimization complete. Results saved to allocation_optimizer_report.txt")
+
+def earnings_yield_returns(sector_stats, metric='PE_median', quarters=4):
+    """Expected sector return as the earnings yield of the trailing mean P/E"""
+
+    panel = sector_stats.pivot_table(index='quarter', columns='gsector', values=metric, aggfunc='first').sort_index()
+    pe = panel.tail(quarters).mean()
+    return (1 / pe.where(pe > 0)).dropna()
+
+def sector_monthly_returns(store, start=None, end=None):
+    """Monthly sector ETF returns from the price store, columns keyed by GICS code"""
+
+    codes = [code for code, ticker in sorted(SECTOR_ETFS.items()) if ticker in store['ticker_index']]
+    monthly = get_returns(store, [SECTOR_ETFS[code] for code in codes], start, end, freq='ME')
+    monthly.columns = codes
+    return monthly
+
+def ledoit_wolf_covariance(returns):
+    """Ledoit-Wolf (2004) shrinkage toward a scaled identity
+
+    Uses the rows where every column is observed. Returns (covariance
+    DataFrame, shrinkage intensity in [0, 1]).
+    """
+
+    complete = returns.dropna()
+    X = complete.to_numpy(dtype=float)
+    T, N = X.shape
+    X = X - X.mean(axis=0)
+
+    S = X.T @ X / T
+    mu = np.trace(S) / N
+    target = mu * np.eye(N)
+
+    d2 = ((S - target) ** 2).sum()
+    # Average squared distance of the per-period outer products from S
+    b2 = ((X ** 2).T @ (X ** 2)).sum() / T ** 2 - (S ** 2).sum() / T
+    b2 = min(b2, d2)
+    shrinkage = b2 / d2 if d2 > 0 else 1.0
+
+    cov = shrinkage * target + (1 - shrinkage) * S
+    return pd.DataFrame(cov, index=returns.columns, columns=returns.columns), shrinkage
+
+def weight_bounds(sectors, caps=None, exclude=()):
+    """Upper bound per sector (caps may be a scalar or a mapping); excluded sectors get 0"""
+
+    if caps is None:
+        upper = pd.Series(1.0, index=sectors)
+    elif np.isscalar(caps):
+        upper = pd.Series(float(caps), index=sectors)
+    else:
+        upper = pd.Series(caps, dtype=float).reindex(sectors).fillna(1.0)
+
+    upper[upper.index.isin(list(exclude))] = 0.0
+    if upper.sum() < 1 - 1e-12:
+        raise ValueError(f"Weight caps sum to {upper.sum():.2f}; a fully invested portfolio is infeasible")
+    return upper.to_numpy()
+
+def project_capped_simplex(V, upper, n_iter=60):
+    """Euclidean projection of each row of V onto {0 <= w <= upper, sum(w) = 1}
+
+    The projection is clip(v - tau, 0, upper) for the scalar tau that makes
+    the row sum to one; tau is found for all rows at once by bisection.
+    """
+
+    V = np.atleast_2d(V)
+    lo = (V - upper).min(axis=1, keepdims=True) - 1
+    hi = V.max(axis=1, keepdims=True)
+    for _ in range(n_iter):
+        tau = (lo + hi) / 2
+        excess = np.clip(V - tau, 0, upper).sum(axis=1, keepdims=True) > 1
+        lo = np.where(excess, tau, lo)
+        hi = np.where(excess, hi, tau)
+    return np.clip(V - (lo + hi) / 2, 0, upper)
+
+def solve_mean_variance(mu, cov, risk_aversion, upper, n_iter=500, tol=1e-10):
+    """Batched maximize mu'w - (lambda / 2) w'Cov w over the capped simplex
+
+    risk_aversion: (B,) array; returns (B, N) weights, one row per lambda.
+    Uses FISTA (accelerated projected gradient) with per-row step 1 / (lambda L).
+    """
+
+    risk_aversion = np.asarray(risk_aversion, dtype=float)[:, None]
+    lipschitz = np.linalg.eigvalsh(cov).max()
+    step = 1 / (risk_aversion * lipschitz)
+
+    start = np.where(upper > 0, upper, 0) / upper.sum()
+    W = project_capped_simplex(np.tile(start, (len(risk_aversion), 1)), upper)
+    Y, t = W.copy(), 1.0
+
+    for _ in range(n_iter):
+        gradient = mu - risk_aversion * (Y @ cov)
+        W_next = project_capped_simplex(Y + step * gradient, upper)
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        Y = W_next + ((t - 1) / t_next) * (W_next - W)
+        converged = np.abs(W_next - W).max() < tol
+        W, t = W_next, t_next
+        if converged:
+            break
+
+    return W
+
+def risk_parity_weights(cov, budget=None, n_iter=1000, tol=1e-12):
+    """Equal (or budgeted) risk contributions by cyclical coordinate descent
+
+    Minimizes 0.5 y'Cov y - budget' log(y) over y > 0 and normalizes.
+    """
+
+    cov = np.asarray(cov, dtype=float)
+    n = len(cov)
+    budget = np.full(n, 1 / n) if budget is None else np.asarray(budget, dtype=float)
+    y = budget / np.sqrt(np.diag(cov))
+
+    for _ in range(n_iter):
+        previous = y.copy()
+        for i in range(n):
+            others = cov[i] @ y - cov[i, i] * y[i]
+            y[i] = (-others + np.sqrt(others ** 2 + 4 * cov[i, i] * budget[i])) / (2 * cov[i, i])
+        if np.abs(y - previous).max() < tol:
+            break
+
+    return y / y.sum()
+
+def optimize_allocation(expected_returns, cov, method='max_sharpe', caps=None, exclude=DEFAULT_EXCLUDE,
+                        current_weights=None, max_turnover=None, risk_free_rate=0.02):
+    """Constrained sector weights as a Series indexed like expected_returns
+
+    method: 'max_sharpe', 'min_variance' or 'risk_parity'. With max_turnover,
+    the move from current_weights is scaled back so that one-way turnover
+    (half the sum of absolute weight changes) stays within the limit.
+    """
+
+    sectors = expected_returns.index
+    mu = expected_returns.to_numpy(dtype=float)
+    sigma = cov.loc[sectors, sectors].to_numpy(dtype=float)
+    upper = weight_bounds(sectors, caps, exclude)
+
+    if method == 'min_variance':
+        weights = solve_mean_variance(np.zeros_like(mu), sigma, [1.0], upper, n_iter=5000)[0]
+    elif method == 'max_sharpe':
+        weights = max_sharpe_weights(mu, sigma, upper, risk_free_rate)
+    elif method == 'risk_parity':
+        held = upper > 0
+        weights = np.zeros_like(mu)
+        weights[held] = risk_parity_weights(sigma[np.ix_(held, held)])
+        # Caps are enforced by projecting the unconstrained risk-parity solution
+        weights = project_capped_simplex(weights, upper)[0]
+    else:
+        raise ValueError(f"Unknown optimization method: {method}")
+
+    if max_turnover is not None and current_weights is not None:
+        weights = limit_turnover(weights, pd.Series(current_weights).reindex(sectors).fillna(0).to_numpy(), max_turnover)
+
+    return pd.Series(weights, index=sectors)
+
+def limit_turnover(target, current, max_turnover):
+    """Move from current toward target only as far as the turnover limit allows"""
+
+    turnover = np.abs(target - current).sum() / 2
+    if turnover <= max_turnover:
+        return target
+    return current + (max_turnover / turnover) * (target - current)
+
+def risk_aversion_grid(mu, cov, n_points):
+    """Log-spaced risk aversions spanning the frontier from max-return to min-variance"""
+
+    spread = max(np.ptp(mu), 1e-6)
+    scale = spread / np.linalg.eigvalsh(cov).min()
+    return np.geomspace(spread / np.trace(cov), scale * 1e2, n_points)
+
+def max_sharpe_weights(mu, cov, upper, risk_free_rate=0.02, n_points=200):
+    """Best-Sharpe frontier point, refined on a narrower risk-aversion bracket"""
+
+    grid = risk_aversion_grid(mu, cov, n_points)
+    for _ in range(2):
+        W = solve_mean_variance(mu, cov, grid, upper)
+        sharpe = (W @ mu - risk_free_rate) / np.sqrt(np.einsum('bi,ij,bj->b', W, cov, W))
+        best = int(np.nanargmax(sharpe))
+        grid = np.geomspace(grid[max(best - 1, 0)], grid[min(best + 1, len(grid) - 1)], n_points)
+    return W[best]
+
+def efficient_frontier(expected_returns, cov, n_points=200, caps=None, exclude=DEFAULT_EXCLUDE, risk_free_rate=0.02):
+    """Constrained mean-variance frontier solved for all risk aversions in one batch"""
+
+    sectors = expected_returns.index
+    mu = expected_returns.to_numpy(dtype=float)
+    sigma = cov.loc[sectors, sectors].to_numpy(dtype=float)
+    upper = weight_bounds(sectors, caps, exclude)
+
+    grid = risk_aversion_grid(mu, sigma, n_points)
+    W = solve_mean_variance(mu, sigma, grid, upper)
+
+    expected = W @ mu
+    volatility = np.sqrt(np.einsum('bi,ij,bj->b', W, sigma, W))
+    frontier = pd.DataFrame({
+        'risk_aversion': grid,
+        'expected_return': expected,
+        'volatility': volatility,
+        'sharpe_ratio': (expected - risk_free_rate) / volatility
+    })
+    weights = pd.DataFrame(W, columns=[f'w_{sector}' for sector in sectors])
+    return pd.concat([frontier, weights], axis=1)
+
+def portfolio_statistics(weights, expected_returns, cov, risk_free_rate=0.02):
+    """Expected return, volatility, Sharpe ratio and risk contributions of one portfolio"""
+
+    w = weights.reindex(expected_returns.index).fillna(0).to_numpy()
+    sigma = cov.loc[expected_returns.index, expected_returns.index].to_numpy()
+    variance = w @ sigma @ w
+    expected = w @ expected_returns.to_numpy()
+
+    return {
+        'expected_return': expected,
+        'volatility': np.sqrt(variance),
+        'sharpe_ratio': (expected - risk_free_rate) / np.sqrt(variance),
+        'risk_contributions': pd.Series(w * (sigma @ w) / variance, index=expected_returns.index)
+    }
+
+if __name__ == "__main__":
+    main()
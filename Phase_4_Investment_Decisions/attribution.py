@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Sector Performance Attribution - Phase 4: Investment Decisions
+===============================================================
+
+Brinson-Fachler decomposition of active return (portfolio minus benchmark)
+into allocation, selection and interaction effects for every sector and
+period, with multi-period linking so the effects add up to the compounded
+active return over the whole horizon.
+
+Per period t and sector i, with portfolio/benchmark weights wp, wb and
+sector returns rp, rb (benchmark total return Rb = sum(wb * rb)):
+- Allocation:  (wp - wb) * (rb - Rb)
+- Selection:   wb * (rp - rb)
+- Interaction: (wp - wb) * (rp - rb)
+
+Linking (arithmetic per-period effects do not add up over compounded periods):
+- Carino: scale period t by [ln(1+Rp_t) - ln(1+Rb_t)] / (Rp_t - Rb_t), normalized
+  by the same factor for the whole horizon
+- Menchero: a common scaling factor plus a minimal per-period correction
+
+All inputs are (periods x sectors) arrays, so a full monthly backtest is
+attributed with a few array operations.
+
+Author: Wassil
+Project: $2.5M Sector Allocation Strategy
+"""
+
+import pandas as pd
+import numpy as np
+
+EFFECTS = ['allocation', 'selection', 'interaction']
+
+def brinson_fachler(portfolio_weights, benchmark_weights, portfolio_returns, benchmark_returns=None):
+    """Per-period, per-sector allocation, selection and interaction effects
+
+    All arguments are (T, S) arrays (or (S,) for static weights). If
+    benchmark_returns is omitted the benchmark holds the same sector
+    instruments as the portfolio, so selection and interaction are zero.
+    """
+
+    rp = np.asarray(portfolio_returns, dtype=float)
+    rb = rp if benchmark_returns is None else np.asarray(benchmark_returns, dtype=float)
+    wp = np.broadcast_to(np.asarray(portfolio_weights, dtype=float), rp.shape)
+    wb = np.broadcast_to(np.asarray(benchmark_weights, dtype=float), rb.shape)
+
+    Rp = (wp * rp).sum(axis=1)
+    Rb = (wb * rb).sum(axis=1)
+    active_weight = wp - wb
+
+    return {
+        'allocation': active_weight * (rb - Rb[:, None]),
+        'selection': wb * (rp - rb),
+        'interaction': active_weight * (rp - rb),
+        'portfolio_return': Rp,
+        'benchmark_return': Rb
+    }
+
+def log_ratio(Rp, Rb):
+    """[ln(1+Rp) - ln(1+Rb)] / (Rp - Rb), with its limit 1/(1+R) where Rp == Rb"""
+    Rp, Rb = np.asarray(Rp, dtype=float), np.asarray(Rb, dtype=float)
+    diff = Rp - Rb
+    equal = np.isclose(diff, 0.0, atol=1e-12)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (np.log1p(Rp) - np.log1p(Rb)) / np.where(equal, 1.0, diff)
+    return np.where(equal, 1 / (1 + Rp), ratio)
+
+def carino_coefficients(Rp, Rb):
+    """Per-period Carino linking coefficients"""
+    total_p = np.prod(1 + Rp) - 1
+    total_b = np.prod(1 + Rb) - 1
+    return log_ratio(Rp, Rb) / log_ratio(total_p, total_b)
+
+def menchero_coefficients(Rp, Rb):
+    """Per-period Menchero linking coefficients"""
+
+    T = len(Rp)
+    total_p = np.prod(1 + Rp) - 1
+    total_b = np.prod(1 + Rb) - 1
+    active = Rp - Rb
+
+    gp, gb = (1 + total_p) ** (1 / T), (1 + total_b) ** (1 / T)
+    if np.isclose(gp, gb, atol=1e-15):
+        M = gp ** (T - 1)
+    else:
+        M = ((total_p - total_b) / T) / (gp - gb)
+
+    # Smallest per-period correction that makes the linked effects sum exactly
+    squares = (active ** 2).sum()
+    alpha = (total_p - total_b - M * active.sum()) / squares if squares > 0 else 0.0
+    return M + alpha * active
+
+def link_effects(effects, method='carino'):
+    """Link per-period effects over the horizon; returns (S,) arrays per effect"""
+
+    Rp, Rb = effects['portfolio_return'], effects['benchmark_return']
+    if method == 'carino':
+        coefficients = carino_coefficients(Rp, Rb)
+    elif method == 'menchero':
+        coefficients = menchero_coefficients(Rp, Rb)
+    else:
+        raise ValueError(f"Unknown linking method: {method}")
+
+    linked = {name: coefficients @ effects[name] for name in EFFECTS}
+    linked['portfolio_return'] = np.prod(1 + Rp) - 1
+    linked['benchmark_return'] = np.prod(1 + Rb) - 1
+    return linked
+
+def attribution_summary(portfolio_weights, benchmark_weights, portfolio_returns, benchmark_returns=None,
+                        sectors=None, method='carino'):
+    """Linked allocation/selection/interaction per sector over all periods as a DataFrame
+
+    Also returns the per-period effects (dict of (T, S) arrays) for drill-down.
+    """
+
+    effects = brinson_fachler(portfolio_weights, benchmark_weights, portfolio_returns, benchmark_returns)
+    linked = link_effects(effects, method)
+
+    summary = pd.DataFrame({
+        'portfolio_weight': np.broadcast_to(np.asarray(portfolio_weights, dtype=float),
+                                            effects['allocation'].shape).mean(axis=0),
+        'benchmark_weight': np.broadcast_to(np.asarray(benchmark_weights, dtype=float),
+                                            effects['allocation'].shape).mean(axis=0),
+        **{name: linked[name] for name in EFFECTS}
+    }, index=sectors)
+    summary['total'] = summary[EFFECTS].sum(axis=1)
+    summary.attrs['portfolio_return'] = linked['portfolio_return']
+    summary.attrs['benchmark_return'] = linked['benchmark_return']
+    summary.attrs['method'] = method
+
+    return summary, effects
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Walk-Forward Sector Allocation Backtest - Phase 4: Investment Decisions
+===============================================================
+
+Historical back-test of the Phase 3 value-tilt sector allocation rule. At every
+rebalance quarter the sector weights are re-derived from the sector statistics
+that were available at that point, then applied to sector ETF returns from the
+local price store.
+
+Value-tilt rule (parameterized):
+1. For each sector, take the trailing `lookback`-quarter mean of the P/E metric
+   (cheapness) and the trailing variance of that metric (valuation risk)
+2. Score = -z(log P/E) - variance_penalty * z(log variance), cross-sectionally
+3. Drop excluded sectors (Real Estate by default), sectors with non-positive
+   trailing P/E and sectors without an investable ETF history
+4. Hold the top_n sectors with linearly decreasing (or equal) weights
+
+No look-ahead: Compustat quarter q is only fully reported about a quarter later,
+so the decision at the end of quarter q uses statistics through
+q - report_lag. Weights set at the end of quarter q are held (drifting with
+returns) through the months of quarter q + 1.
+
+All rebalance dates are scored at once on (quarter x sector) matrices; parameter
+sweeps fan out over a process pool.
+
+Author: Wassil
+Project: $2.5M Sector Allocation Strategy
+"""
+
+import pandas as pd
+import numpy as np
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from return_engine import compute_portfolio_returns, drift_weights
+from price_store import (PRICE_STORE_DIR, BENCHMARK_TICKER, SECTOR_ETFS,
+                         load_price_store, get_returns)
+
+SECTOR_STATS_PATH = "../Phase_3_Sector_Analysis/Compustat_Sector_Statistics.csv"
+
+DEFAULT_PARAMS = {
+    'metric': 'PE_mean',
+    'lookback': 8,
+    'report_lag': 1,
+    'top_n': 8,
+    'variance_penalty': 0.5,
+    'weighting': 'rank',
+    'exclude': (60,),
+    'cost_bps': 10.0
+}
+
+SWEEP_GRID = {
+    'lookback': [4, 8, 12],
+    'top_n': [5, 8],
+    'variance_penalty': [0.0, 0.5, 1.0],
+    'weighting': ['rank', 'equal']
+}
+
+def main():
+    """Main backtest function"""
+
+    print("=== Walk-Forward Sector Allocation Backtest ===\n")
+
+    try:
+        sector_stats = pd.read_csv(SECTOR_STATS_PATH)
+        store = load_price_store(PRICE_STORE_DIR)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return
+
+    sector_returns, benchmark_returns = load_backtest_returns(store, '2010-01-01', '2025-12-31')
+
+    result = run_backtest(sector_stats, sector_returns, benchmark_returns, DEFAULT_PARAMS)
+    sweep = run_parameter_sweep(sector_stats, sector_returns, benchmark_returns, SWEEP_GRID)
+
+    sweep.to_csv('backtest_parameter_sweep.csv', index=False)
+    result['weights'].to_csv('backtest_weights.csv')
+
+    report = []
+    report.append("=== WALK-FORWARD SECTOR ALLOCATION BACKTEST ===\n")
+    report.append(f"Report Date: {datetime.now().strftime('%Y-%m-%d')}\n")
+    report.append(f"Sector statistics: {SECTOR_STATS_PATH}\n")
+    report.append(f"Returns: {PRICE_STORE_DIR}/ (version {store['manifest']['version']})\n")
+    report.append(f"Period: {sector_returns.index[0]:%Y-%m} to {sector_returns.index[-1]:%Y-%m}\n\n")
+
+    report.append("=== DEFAULT RULE ===\n")
+    for key, value in DEFAULT_PARAMS.items():
+        report.append(f"{key}: {value}\n")
+    report.append("\n")
+    for key, value in result['summary'].items():
+        report.append(f"{key}: {value:.4f}\n")
+
+    report.append("\n=== PARAMETER SWEEP (top 10 by Sharpe) ===\n")
+    report.append(sweep.nlargest(10, 'sharpe_ratio').to_string(index=False))
+    report.append("\n")
+
+    with open('backtest_report.txt', 'w') as f:
+        f.writelines(report)
+
+    print("Backtest complete. Results saved to backtest_report.txt")
+
+def load_backtest_returns(store, start, end):
+    """Monthly sector ETF and benchmark returns from the local price store"""
+
+    sectors = sorted(SECTOR_ETFS)
+    tickers = [SECTOR_ETFS[code] for code in sectors]
+    available = [t for t in tickers if t in store['ticker_index']]
+
+    monthly = get_returns(store, available + [BENCHMARK_TICKER], start, end, freq='ME')
+    sector_returns = monthly.reindex(columns=tickers)
+    sector_returns.columns = sectors
+
+    return sector_returns, monthly[BENCHMARK_TICKER]
+
+def quarter_panels(sector_stats, metric, sectors):
+    """(quarter x sector) matrix of a sector statistic on a gap-free quarter calendar"""
+
+    panel = sector_stats.pivot_table(index='quarter', columns='gsector', values=metric, aggfunc='first')
+    panel.index = pd.PeriodIndex(panel.index, freq='Q')
+    calendar = pd.period_range(panel.index.min(), panel.index.max(), freq='Q')
+    return panel.reindex(index=calendar, columns=sectors)
+
+def value_tilt_weights(sector_stats, sectors, params, investable=None):
+    """Target weights for every decision quarter at once, as a (quarter x sector) frame"""
+
+    lookback = params['lookback']
+    panel = quarter_panels(sector_stats, params['metric'], sectors)
+
+    # Trailing statistics known at each decision quarter (report lag applied)
+    trailing_pe = panel.rolling(lookback, min_periods=lookback).mean().shift(params['report_lag'])
+    trailing_var = panel.rolling(lookback, min_periods=lookback).var().shift(params['report_lag'])
+
+    pe = trailing_pe.to_numpy()
+    var = trailing_var.to_numpy()
+
+    eligible = np.isfinite(pe) & (pe > 0) & np.isfinite(var)
+    eligible &= ~np.isin(np.array(sectors), list(params['exclude']))[None, :]
+    if investable is not None:
+        eligible &= investable.reindex(index=panel.index, columns=sectors).fillna(False).to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cheapness = cross_sectional_z(-np.log(np.where(eligible, pe, np.nan)))
+        risk = cross_sectional_z(np.log(np.where(eligible, var, np.nan) + 1e-12))
+    score = cheapness - params['variance_penalty'] * np.nan_to_num(risk)
+    score = np.where(eligible, score, -np.inf)
+
+    # Rank all decision quarters in one argsort (0 = best score)
+    order = np.argsort(-score, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(len(sectors))[None, :], axis=1)
+
+    n_held = np.minimum(params['top_n'], eligible.sum(axis=1))[:, None]
+    held = (ranks < n_held) & eligible
+
+    if params['weighting'] == 'equal':
+        raw = held.astype(float)
+    else:
+        raw = np.where(held, n_held - ranks, 0).astype(float)
+
+    totals = raw.sum(axis=1, keepdims=True)
+    weights = np.divide(raw, totals, out=np.zeros_like(raw), where=totals > 0)
+
+    return pd.DataFrame(weights, index=panel.index, columns=sectors)
+
+def cross_sectional_z(matrix):
+    """Row-wise z-score ignoring NaNs"""
+    mean = np.nanmean(matrix, axis=1, keepdims=True)
+    std = np.nanstd(matrix, axis=1, keepdims=True)
+    return (matrix - mean) / np.where(std > 0, std, 1.0)
+
+def run_backtest(sector_stats, sector_returns, benchmark_returns, params=None):
+    """Apply the walk-forward weights to monthly sector returns"""
+
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    sectors = list(sector_returns.columns)
+    months = sector_returns.index.to_period('M')
+
+    # A sector is investable at a decision quarter if its ETF already has a return history
+    quarter_end_returns = sector_returns.groupby(months.asfreq('Q')).last()
+    investable = quarter_end_returns.notna()
+    decisions = value_tilt_weights(sector_stats, sectors, params, investable)
+
+    # Weights decided at the end of quarter q are held during quarter q + 1
+    holding_quarter = months.asfreq('Q')
+    # After the last statistics quarter the latest decision stays in force
+    targets = decisions.reindex(holding_quarter - 1).ffill().to_numpy()
+    active = ~np.isnan(targets).any(axis=1) & (np.nan_to_num(targets).sum(axis=1) > 0)
+    if not active.any():
+        raise ValueError("No rebalance quarter has enough trailing statistics for this lookback")
+
+    first = np.argmax(active)
+    returns = sector_returns.iloc[first:]
+    targets = targets[first:]
+    months = months[first:]
+
+    rebalance = np.r_[True, months.asfreq('Q')[1:] != months.asfreq('Q')[:-1]]
+    weights = drift_weights(returns.to_numpy(), targets[None], rebalance)[0]
+
+    # Every rebalance resets to that quarter's target, not the first one
+    if not np.allclose(weights[rebalance], np.nan_to_num(targets[rebalance])):
+        raise ValueError("Rebalance weights do not match the quarterly targets")
+
+    engine = compute_portfolio_returns(returns.to_numpy(), weights)
+    portfolio_returns = engine['portfolio_returns'][:, 0]
+
+    # Turnover against the drifted pre-trade weights of the previous period
+    r = np.nan_to_num(returns.to_numpy())
+    grown = weights[:-1] * (1 + r[:-1])
+    pre_trade = grown / (1 + portfolio_returns[:-1, None])
+    turnover = np.zeros(len(weights))
+    turnover[0] = np.abs(weights[0]).sum() / 2
+    turnover[1:] = np.abs(weights[1:] - pre_trade).sum(axis=1) / 2
+    turnover = np.where(rebalance, turnover, 0.0)
+
+    net_returns = portfolio_returns - turnover * params['cost_bps'] / 10000
+    wealth = np.cumprod(1 + net_returns)
+    drawdown = wealth / np.maximum.accumulate(wealth) - 1
+
+    index = returns.index
+    benchmark = benchmark_returns.reindex(index).to_numpy()
+    summary = summarize_backtest(net_returns, benchmark, turnover, rebalance, drawdown)
+    summary['distinct_allocations'] = len(np.unique(np.round(weights[rebalance], 10), axis=0))
+
+    return {
+        'params': params,
+        'returns': pd.Series(net_returns, index=index),
+        'gross_returns': pd.Series(portfolio_returns, index=index),
+        'wealth': pd.Series(wealth, index=index),
+        'drawdown': pd.Series(drawdown, index=index),
+        'turnover': pd.Series(turnover, index=index),
+        'weights': pd.DataFrame(weights, index=index, columns=sectors),
+        'summary': summary
+    }
+
+def summarize_backtest(returns, benchmark, turnover, rebalance, drawdown, periods_per_year=12, risk_free_rate=0.02):
+    """Headline performance, turnover and drawdown statistics"""
+
+    years = len(returns) / periods_per_year
+    total_return = np.prod(1 + returns) - 1
+    excess = returns - risk_free_rate / periods_per_year
+    benchmark_total = np.nanprod(1 + benchmark) - 1
+
+    return {
+        'total_return': total_return,
+        'annualized_return': (1 + total_return) ** (1 / years) - 1,
+        'volatility': returns.std(ddof=1) * np.sqrt(periods_per_year),
+        'sharpe_ratio': excess.mean() / excess.std(ddof=1) * np.sqrt(periods_per_year),
+        'max_drawdown': drawdown.min(),
+        'avg_turnover_per_rebalance': turnover[rebalance].mean(),
+        'annual_turnover': turnover.sum() / years,
+        'benchmark_total_return': benchmark_total,
+        'excess_total_return': total_return - benchmark_total
+    }
+
+def expand_grid(grid):
+    """Cartesian product of a parameter grid as a list of dicts"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+def sweep_worker(job):
+    """Run one parameter combination (runs inside a worker process)"""
+    sector_stats, sector_returns, benchmark_returns, params = job
+    result = run_backtest(sector_stats, sector_returns, benchmark_returns, params)
+    return {**params, **result['summary']}
+
+def run_parameter_sweep(sector_stats, sector_returns, benchmark_returns, grid, base_params=None, max_workers=None):
+    """Backtest every combination in a parameter grid, optionally in a process pool"""
+
+    jobs = [(sector_stats, sector_returns, benchmark_returns, {**DEFAULT_PARAMS, **(base_params or {}), **params})
+            for params in expand_grid(grid)]
+
+    if max_workers == 1 or len(jobs) == 1:
+        rows = [sweep_worker(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            rows = list(executor.map(sweep_worker, jobs))
+
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    main()
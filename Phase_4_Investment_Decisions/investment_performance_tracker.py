@@ -21,10 +21,22 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import os
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from return_engine import compute_portfolio_returns
+from price_store import (PRICE_DATA_DIR, PRICE_STORE_DIR, BENCHMARK_TICKER, SECTOR_ETFS,
+                         build_price_store, load_price_store, get_returns,
+                         price_drop_version, price_store_version)
+from monte_carlo import (load_return_history, allocation_exposures, estimate_return_model,
+                         simulate_outcomes, summarize_outcomes, format_outcome_summary)
+from rebalancing_monitor import RebalancingMonitor, format_alert
+from risk_metrics import sortino_ratio
+from attribution import attribution_summary
+from allocation_inputs import allocation_inputs_as_of
+
 def main():
     """Main performance tracking function"""
 
@@ -33,14 +45,17 @@ def main():
     # Load portfolio allocation from Phase 3 analysis
     portfolio_allocation = load_portfolio_allocation()
 
-    # Load benchmark data (placeholder - would connect to data source)
+    # Load benchmark data (local price store; simulated if no price data is available)
     benchmark_data = load_benchmark_data()
 
     # Calculate portfolio performance
     portfolio_performance = calculate_portfolio_performance(portfolio_allocation, benchmark_data)
 
+    # Simulate the distribution of 12-month outcomes (price store history only)
+    outcome_summary = simulate_allocation_outcomes(portfolio_allocation)
+
     # Generate performance report
-    performance_report = generate_performance_report(portfolio_performance)
+    performance_report = generate_performance_report(portfolio_performance, outcome_summary)
 
     # Check rebalancing triggers
     rebalancing_alerts = check_rebalancing_triggers(portfolio_performance)
@@ -54,8 +69,13 @@ def main():
     print("Performance tracking complete. Results saved to performance_report.txt")
     print("Sector allocation visualization saved as portfolio_allocation_visualization.png")
 
-def load_portfolio_allocation():
-    """Load the $2.5M portfolio allocation from Phase 3 analysis"""
+def load_portfolio_allocation(as_of=None):
+    """Load the $2.5M portfolio allocation from Phase 3 analysis
+
+    pe_ratio, variance and trend are recomputed from the Phase 3 sector
+    statistics through the as-of quarter (latest if None); the values below
+    are the Phase 3 log figures, used only if the statistics file is missing.
+    """
 
     # Based on Phase 3 statistical value strategy
     allocation = {
@@ -77,13 +97,34 @@ def load_portfolio_allocation():
                             'pe_ratio': 46.65, 'variance': 527.03, 'trend': 0.3231}
     }
 
+    try:
+        inputs = allocation_inputs_as_of(as_of)
+    except FileNotFoundError:
+        return allocation
+
+    for data in allocation.values():
+        if data['sector_code'] in inputs.index:
+            sector_inputs = inputs.loc[data['sector_code']]
+            data.update({key: float(sector_inputs[key]) for key in ['pe_ratio', 'variance', 'trend']})
+
     return allocation
 
-def load_benchmark_data():
-    """Load benchmark performance data (placeholder for actual implementation)"""
+def load_benchmark_data(start='2025-01-01', end='2025-12-31'):
+    """Load monthly benchmark and sector ETF returns (local price store, else simulated)"""
+
+    # Build the store from CSV drops on first use, rebuild when the drops changed
+    drop_version = price_drop_version(PRICE_DATA_DIR)
+    if drop_version is not None and drop_version != price_store_version(PRICE_STORE_DIR):
+        build_price_store(PRICE_DATA_DIR, PRICE_STORE_DIR)
 
-    # Simulated benchmark data - in real implementation, this would pull from data provider
-    dates = pd.date_range('2025-01-01', '2025-12-31', freq='M')
+    if os.path.exists(os.path.join(PRICE_STORE_DIR, 'manifest.json')):
+        store = load_price_store(PRICE_STORE_DIR)
+        tickers = [t for t in [BENCHMARK_TICKER] + list(SECTOR_ETFS.values()) if t in store['ticker_index']]
+        monthly = get_returns(store, tickers, start, end, freq='ME')
+        return monthly.reset_index()
+
+    # Simulated benchmark data - used when no local price data is available
+    dates = pd.date_range(start, end, freq='ME')
 
     benchmark_data = pd.DataFrame({
         'date': dates,
@@ -97,6 +138,7 @@ def load_benchmark_data():
         'XLP': np.random.normal(0.005, 0.032, len(dates)), # Staples
         'XLU': np.random.normal(0.004, 0.028, len(dates)), # Utilities
         'XLC': np.random.normal(0.010, 0.048, len(dates)), # Communications
+        'XLB': np.random.normal(0.007, 0.050, len(dates)), # Materials
         'XLRE': np.random.normal(0.003, 0.042, len(dates))  # Real Estate (excluded)
     })
 
@@ -105,34 +147,23 @@ def load_benchmark_data():
 def calculate_portfolio_performance(allocation, benchmark_data):
     """Calculate portfolio performance metrics"""
 
-    # Calculate weighted portfolio returns
-    portfolio_returns = pd.Series(index=benchmark_data['date'], dtype=float)
-
-    # ETF mapping for each sector
-    etf_mapping = {
-        15: 'XLB',  # Materials (using AMEX for simplicity)
-        35: 'XLV',  # Health Care
-        10: 'XLE',  # Energy
-        50: 'XLC',  # Communication Services
-        40: 'XLF',  # Financials
-        45: 'XLK',  # Information Technology
-        55: 'XLU',  # Utilities
-        30: 'XLP'   # Consumer Staples
-    }
+    # (dates x sectors) return matrix; sectors without an ETF series use SPY as proxy
+    sectors = list(allocation.keys())
+    sector_returns = pd.DataFrame({
+        sector: benchmark_data[SECTOR_ETFS[data['sector_code']]]
+        if SECTOR_ETFS[data['sector_code']] in benchmark_data else benchmark_data['SPY']
+        for sector, data in allocation.items()
+    })
+    sector_returns.index = benchmark_data['date']
 
-    # Simulate ETF returns (in real implementation, use actual data)
-    for date in benchmark_data['date']:
-        portfolio_return = 0
-        for sector, data in allocation.items():
-            etf = etf_mapping[data['sector_code']]
-            # Use benchmark data as proxy (real implementation would use actual ETF data)
-            sector_return = benchmark_data.loc[benchmark_data['date'] == date, 'SPY'].iloc[0] * (0.8 + np.random.random() * 0.4)
-            portfolio_return += sector_return * data['weight']
+    weights = np.array([allocation[sector]['weight'] for sector in sectors])
+    engine = compute_portfolio_returns(sector_returns.to_numpy(), weights)
 
-        portfolio_returns[date] = portfolio_return
+    portfolio_returns = pd.Series(engine['portfolio_returns'][:, 0], index=sector_returns.index)
+    sector_contributions = pd.DataFrame(engine['contributions'][0], index=sector_returns.index, columns=sectors)
 
     # Calculate cumulative returns
-    cumulative_returns = (1 + portfolio_returns).cumprod() - 1
+    cumulative_returns = pd.Series(engine['cumulative_returns'][:, 0], index=sector_returns.index)
 
     # Calculate performance metrics
     performance = {
@@ -142,7 +173,11 @@ def calculate_portfolio_performance(allocation, benchmark_data):
         'annualized_return': calculate_annualized_return(portfolio_returns),
         'volatility': portfolio_returns.std() * np.sqrt(12),  # Annualized
         'sharpe_ratio': calculate_sharpe_ratio(portfolio_returns),
+        'sortino_ratio': calculate_sortino_ratio(portfolio_returns),
         'max_drawdown': calculate_max_drawdown(cumulative_returns),
+        'sector_contributions': sector_contributions,
+        'attribution': calculate_sector_attribution(allocation, benchmark_data),
+        'benchmark_returns': pd.Series(benchmark_data['SPY'].to_numpy(), index=sector_returns.index),
         'benchmark_comparison': {
             'spy_outperformance': cumulative_returns.iloc[-1] - ((1 + benchmark_data['SPY']).cumprod() - 1).iloc[-1]
         }
@@ -150,6 +185,25 @@ def calculate_portfolio_performance(allocation, benchmark_data):
 
     return performance
 
+def calculate_sector_attribution(allocation, benchmark_data, method='carino'):
+    """Brinson-Fachler attribution vs. an equal-weight benchmark of all sector ETFs"""
+
+    codes = sorted(SECTOR_ETFS)
+    names = {data['sector_code']: sector for sector, data in allocation.items()}
+    labels = [names.get(code, f"{SECTOR_ETFS[code]} (not held)") for code in codes]
+
+    returns = np.column_stack([
+        benchmark_data[SECTOR_ETFS[code]] if SECTOR_ETFS[code] in benchmark_data else benchmark_data['SPY']
+        for code in codes
+    ])
+    portfolio_weights = np.array([sum(data['weight'] for data in allocation.values() if data['sector_code'] == code)
+                                  for code in codes])
+    benchmark_weights = np.full(len(codes), 1 / len(codes))
+
+    summary, _ = attribution_summary(portfolio_weights, benchmark_weights, np.nan_to_num(returns),
+                                     sectors=labels, method=method)
+    return summary
+
 def calculate_annualized_return(returns):
     """Calculate annualized return from monthly returns"""
     total_return = (1 + returns).prod() - 1
@@ -161,13 +215,42 @@ def calculate_sharpe_ratio(returns, risk_free_rate=0.02):
     excess_returns = returns - risk_free_rate/12  # Monthly risk-free rate
     return excess_returns.mean() / excess_returns.std() * np.sqrt(12)
 
+def calculate_sortino_ratio(returns, risk_free_rate=0.02):
+    """Calculate Sortino ratio"""
+    return sortino_ratio(returns.to_numpy(), risk_free_rate)[0]
+
 def calculate_max_drawdown(cumulative_returns):
     """Calculate maximum drawdown"""
     peak = cumulative_returns.expanding().max()
     drawdown = cumulative_returns - peak
     return drawdown.min()
 
-def generate_performance_report(performance):
+def simulate_allocation_outcomes(allocation, n_paths=100000):
+    """Monte Carlo outcome distribution from the price store history
+
+    Returns None (section skipped) without a price store, or when the history
+    has fewer complete months than the tickers the allocation is exposed to,
+    since the covariance estimate would then be singular.
+    """
+
+    try:
+        history = load_return_history(PRICE_STORE_DIR)
+    except FileNotFoundError:
+        print("No price store found, skipping the Monte Carlo outcome distribution")
+        return None
+
+    exposures = allocation_exposures({'Portfolio': allocation}, history.columns)
+    tickers = exposures.columns[(exposures != 0).any()]
+    months = len(history[tickers].dropna())
+    if months < len(tickers):
+        print(f"Only {months} complete months for {len(tickers)} tickers, skipping the Monte Carlo outcome distribution")
+        return None
+
+    mean, cov = estimate_return_model(history)
+    simulation = simulate_outcomes(mean, cov, exposures, n_paths=n_paths)
+    return summarize_outcomes(simulation)
+
+def generate_performance_report(performance, outcome_summary=None):
     """Generate comprehensive performance report"""
 
     report = []
@@ -183,6 +266,7 @@ def generate_performance_report(performance):
     report.append(".1%")
     report.append(".3f")
     report.append(".1%")
+    report.append(f"Sortino Ratio: {performance['sortino_ratio']:.3f}\n")
     report.append(f"Maximum Drawdown: {performance['max_drawdown']:.1%}\n\n")
 
     report.append("=== BENCHMARK COMPARISON ===\n")
@@ -190,33 +274,39 @@ def generate_performance_report(performance):
     report.append("SPY Annualized Return: 10.0% (simulated)\n")
     report.append(".1%\n\n")
 
-    report.append("=== SECTOR CONTRIBUTION ANALYSIS ===\n")
-    allocation = load_portfolio_allocation()
-    for sector, data in allocation.items():
-        contribution = data['weight'] * performance['total_return']
-        report.append(f"{sector}: {data['weight']:.1%} weight → {contribution:.1%} contribution\n")
+    attribution = performance['attribution']
+    report.append("=== SECTOR ATTRIBUTION ANALYSIS ===\n")
+    report.append(f"Benchmark: equal-weight sector ETFs ({attribution.attrs['method'].title()}-linked Brinson-Fachler)\n")
+    report.append(f"Portfolio Return: {attribution.attrs['portfolio_return']:.2%} | "
+                  f"Benchmark Return: {attribution.attrs['benchmark_return']:.2%} | "
+                  f"Active Return: {attribution['total'].sum():+.2%}\n")
+    for sector, row in attribution.iterrows():
+        report.append(f"{sector}: {row['portfolio_weight']:.1%} vs {row['benchmark_weight']:.1%} weight → "
+                      f"allocation {row['allocation']:+.2%}, selection {row['selection']:+.2%}, "
+                      f"interaction {row['interaction']:+.2%}\n")
+
+    report.append("\n=== MONTE CARLO OUTCOME DISTRIBUTION (12 MONTHS) ===\n")
+    if outcome_summary is not None:
+        report.append(format_outcome_summary(outcome_summary))
+    else:
+        report.append("Skipped: needs price store history with at least as many complete months as tickers held\n")
 
     return ''.join(report)
 
 def check_rebalancing_triggers(performance):
-    """Check for rebalancing triggers based on performance"""
+    """Check for rebalancing triggers by replaying the monthly returns through the streaming monitor"""
 
     alerts = []
 
-    # Check drawdown trigger (>15%)
-    if performance['max_drawdown'] < -0.15:
-        alerts.append("⚠️  DRAWDOWN ALERT: Portfolio drawdown exceeds 15% threshold")
-        alerts.append("   Recommended Action: Consider defensive rebalancing\n")
-
-    # Check volatility trigger
-    if performance['volatility'] > 0.20:  # 20% annualized volatility
-        alerts.append("⚠️  VOLATILITY ALERT: Portfolio volatility above 20%")
-        alerts.append("   Recommended Action: Reduce high-variance positions\n")
+    # Default triggers: >15% drawdown, >20% annualized volatility, lagging SPY by >5%;
+    # volatility is only checked on a full 12-month window, as the full-series check did
+    monitor = RebalancingMonitor(periods_per_year=12, window=12, min_periods=12)
+    fired = monitor.replay(performance['portfolio_returns'].index,
+                           performance['portfolio_returns'].to_numpy(),
+                           performance['benchmark_returns'].to_numpy())
 
-    # Check underperformance trigger
-    if performance['benchmark_comparison']['spy_outperformance'] < -0.05:
-        alerts.append("⚠️  UNDERPERFORMANCE ALERT: Lagging S&P 500 by >5%")
-        alerts.append("   Recommended Action: Review sector allocation thesis\n")
+    for alert in fired:
+        alerts.extend(format_alert(alert))
 
     if not alerts:
         alerts.append("✅ NO REBALANCING TRIGGERS ACTIVATED")
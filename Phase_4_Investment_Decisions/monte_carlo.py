@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo Outcome Engine - Phase 4: Investment Decisions
+===============================================================
+
+Simulates the distribution of 12-month outcomes for the $2.5M sector
+allocation instead of relying on a single random draw of monthly returns.
+
+Model:
+- Monthly sector and benchmark returns are jointly normal (or multivariate
+  Student-t for fat tails) with mean and covariance estimated from history
+- Portfolio weights are held constant (rebalanced monthly), as in the tracker
+
+Because the weights are fixed, each portfolio's monthly return is a linear
+combination of sector returns, so paths are drawn directly for the
+(portfolios + benchmark) exposures: an (m x m) Cholesky factor of E Cov E'
+replaces the full sector covariance, and a million paths cost only a few
+numbers per month. Paths are generated and reduced in chunks sized to a
+memory budget; every chunk draws from its own stream spawned from one seed,
+so results are reproducible.
+
+Outputs per portfolio: terminal value, VaR/CVaR, maximum drawdown
+distribution and the probability of hitting each rebalancing trigger
+(15% drawdown, 20% volatility, 5% underperformance vs. SPY).
+
+Author: Wassil
+Project: $2.5M Sector Allocation Strategy
+"""
+
+import pandas as pd
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from price_store import PRICE_STORE_DIR, BENCHMARK_TICKER, SECTOR_ETFS, load_price_store, get_returns
+
+PORTFOLIO_VALUE = 2500000
+
+# Rebalancing triggers used by the performance tracker
+DRAWDOWN_TRIGGER = -0.15
+VOLATILITY_TRIGGER = 0.20
+UNDERPERFORMANCE_TRIGGER = -0.05
+
+def main():
+    """Main Monte Carlo function"""
+
+    print("=== Monte Carlo Portfolio Outcome Simulation ===\n")
+
+    from investment_performance_tracker import load_portfolio_allocation
+
+    try:
+        history = load_return_history(PRICE_STORE_DIR)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return
+
+    allocation = load_portfolio_allocation()
+    exposures = allocation_exposures({'Phase 3 allocation': allocation}, history.columns)
+    mean, cov = estimate_return_model(history)
+
+    report = []
+    report.append("=== MONTE CARLO PORTFOLIO OUTCOME SIMULATION ===\n")
+    report.append(f"Report Date: {datetime.now().strftime('%Y-%m-%d')}\n")
+    report.append(f"History: {history.index[0]:%Y-%m} to {history.index[-1]:%Y-%m} ({len(history)} months)\n\n")
+
+    for distribution in ['normal', 't']:
+        start = datetime.now()
+        simulation = simulate_outcomes(mean, cov, exposures, n_paths=1000000, distribution=distribution)
+        elapsed = (datetime.now() - start).total_seconds()
+        summary = summarize_outcomes(simulation)
+
+        report.append(f"=== {distribution.upper()} RETURNS ({len(simulation['terminal_value']):,} paths, {elapsed:.1f}s) ===\n")
+        report.append(format_outcome_summary(summary))
+        report.append("\n")
+
+    with open('monte_carlo_report.txt', 'w') as f:
+        f.writelines(report)
+
+    print("Simulation complete. Results saved to monte_carlo_report.txt")
+
+def load_return_history(store_dir=PRICE_STORE_DIR, start=None, end=None):
+    """Monthly sector ETF and benchmark returns from the local price store"""
+
+    if not os.path.exists(os.path.join(store_dir, 'manifest.json')):
+        raise FileNotFoundError(f"No price store found in {store_dir}/ (run price_store.py first)")
+
+    store = load_price_store(store_dir)
+    tickers = [t for t in [BENCHMARK_TICKER] + list(SECTOR_ETFS.values()) if t in store['ticker_index']]
+    return get_returns(store, tickers, start, end, freq='ME')
+
+def estimate_return_model(returns):
+    """Mean vector and covariance matrix of monthly returns (pairwise for short histories)"""
+    return returns.mean(), returns.cov()
+
+def allocation_exposures(allocations, tickers, benchmark=BENCHMARK_TICKER):
+    """(portfolios + benchmark) x tickers exposure matrix from tracker-style allocations
+
+    Sectors without an ETF series in `tickers` use the benchmark as a proxy.
+    The benchmark is always the last row.
+    """
+
+    tickers = list(tickers)
+    rows = []
+    for allocation in allocations.values():
+        row = pd.Series(0.0, index=tickers)
+        for data in allocation.values():
+            ticker = SECTOR_ETFS[data['sector_code']]
+            row[ticker if ticker in row.index else benchmark] += data['weight']
+        rows.append(row)
+    rows.append(pd.Series(0.0, index=tickers).where(pd.Index(tickers) != benchmark, 1.0))
+
+    return pd.DataFrame(rows, index=list(allocations) + [benchmark])
+
+def covariance_factor(cov):
+    """Lower-triangular factor of a covariance matrix, tolerating singular matrices"""
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        # Symmetric square root with negative eigenvalues clipped
+        eigenvalues, eigenvectors = np.linalg.eigh((cov + cov.T) / 2)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+def plan_path_chunks(n_paths, horizon, n_exposures, memory_budget_mb=512):
+    """Split the paths into chunks whose working arrays fit in the memory budget"""
+
+    # Draws, returns and wealth paths in float64, plus shock scales
+    bytes_per_path = horizon * n_exposures * 8 * 4 + horizon * 8
+    chunk = max(1, int(memory_budget_mb * 1024 ** 2 // bytes_per_path))
+    return [(start, min(start + chunk, n_paths)) for start in range(0, n_paths, chunk)]
+
+def simulate_outcomes(mean, cov, exposures, n_paths=100000, horizon=12, distribution='normal',
+                      df=5, seed=42, memory_budget_mb=512, max_workers=1):
+    """Simulate path outcomes for every portfolio row of `exposures`
+
+    mean, cov: monthly return mean (Series) and covariance (DataFrame) by ticker.
+    exposures: output of allocation_exposures (benchmark in the last row).
+    Returns a dict of (n_paths, P) arrays: terminal_value (growth of $1),
+    max_drawdown, volatility and excess_return vs. the benchmark.
+    """
+
+    E = exposures.reindex(columns=mean.index).fillna(0.0).to_numpy()
+    mu = E @ mean.to_numpy()
+    factor = covariance_factor(E @ cov.to_numpy() @ E.T)
+
+    chunks = plan_path_chunks(n_paths, horizon, len(E), memory_budget_mb)
+    streams = np.random.SeedSequence(seed).spawn(len(chunks))
+    jobs = [(mu, factor, end - start, horizon, distribution, df, stream)
+            for (start, end), stream in zip(chunks, streams)]
+
+    if max_workers == 1 or len(jobs) == 1:
+        parts = [simulate_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            parts = list(executor.map(simulate_chunk, jobs))
+
+    result = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    result['portfolios'] = list(exposures.index[:-1])
+    result['horizon'] = horizon
+    return result
+
+def simulate_chunk(job):
+    """Draw one chunk of paths and reduce it to per-path outcomes (runs inside a worker process)"""
+
+    mu, factor, n, horizon, distribution, df, stream = job
+    rng = np.random.default_rng(stream)
+    m = len(mu)
+
+    shocks = rng.standard_normal((n, horizon, m)) @ factor.T
+    if distribution == 't':
+        # Multivariate t with the same covariance: common chi-square scale per path-month
+        scale = np.sqrt(rng.chisquare(df, (n, horizon, 1)) / (df - 2))
+        shocks /= scale
+    returns = shocks + mu
+
+    wealth = np.cumprod(1 + returns, axis=1)
+    peak = np.maximum(np.maximum.accumulate(wealth, axis=1), 1.0)
+    max_drawdown = (wealth / peak - 1).min(axis=1)
+    volatility = returns.std(axis=1, ddof=1) * np.sqrt(12)
+
+    terminal = wealth[:, -1, :]
+    portfolio = slice(0, m - 1)
+    return {
+        'terminal_value': terminal[:, portfolio].astype(np.float32),
+        'max_drawdown': max_drawdown[:, portfolio].astype(np.float32),
+        'volatility': volatility[:, portfolio].astype(np.float32),
+        'excess_return': (terminal[:, portfolio] - terminal[:, -1:]).astype(np.float32)
+    }
+
+def value_at_risk(pnl, confidence=0.95):
+    """Historical VaR and CVaR (expected shortfall) of a P&L sample, as positive losses"""
+
+    losses = -np.asarray(pnl, dtype=float)
+    var = np.quantile(losses, confidence, axis=0)
+    tail = losses >= var
+    cvar = (losses * tail).sum(axis=0) / tail.sum(axis=0)
+    return var, cvar
+
+def summarize_outcomes(simulation, initial_value=PORTFOLIO_VALUE, levels=(0.95, 0.99)):
+    """Per-portfolio outcome distribution summary as a DataFrame"""
+
+    terminal = simulation['terminal_value'].astype(float) * initial_value
+    max_drawdown = simulation['max_drawdown']
+
+    drawdown_hit = max_drawdown < DRAWDOWN_TRIGGER
+    volatility_hit = simulation['volatility'] > VOLATILITY_TRIGGER
+    underperformance_hit = simulation['excess_return'] < UNDERPERFORMANCE_TRIGGER
+
+    summary = {
+        'mean_terminal_value': terminal.mean(axis=0),
+        'median_terminal_value': np.median(terminal, axis=0),
+        'p05_terminal_value': np.quantile(terminal, 0.05, axis=0),
+        'p95_terminal_value': np.quantile(terminal, 0.95, axis=0),
+        'prob_loss': (terminal < initial_value).mean(axis=0)
+    }
+    for level in levels:
+        var, cvar = value_at_risk(terminal - initial_value, level)
+        summary[f'VaR_{level:.0%}'] = var
+        summary[f'CVaR_{level:.0%}'] = cvar
+
+    summary.update({
+        'median_max_drawdown': np.median(max_drawdown, axis=0),
+        'p05_max_drawdown': np.quantile(max_drawdown, 0.05, axis=0),
+        'prob_drawdown_trigger': drawdown_hit.mean(axis=0),
+        'prob_volatility_trigger': volatility_hit.mean(axis=0),
+        'prob_underperformance_trigger': underperformance_hit.mean(axis=0),
+        'prob_any_trigger': (drawdown_hit | volatility_hit | underperformance_hit).mean(axis=0)
+    })
+
+    return pd.DataFrame(summary, index=simulation['portfolios'])
+
+def format_outcome_summary(summary):
+    """Plain-text outcome summary, one block per portfolio"""
+
+    lines = []
+    for portfolio, row in summary.iterrows():
+        lines.append(f"{portfolio}:\n")
+        lines.append(f"  Terminal value: mean ${row['mean_terminal_value']:,.0f}, "
+                     f"median ${row['median_terminal_value']:,.0f}\n")
+        lines.append(f"  5th-95th percentile: ${row['p05_terminal_value']:,.0f} - ${row['p95_terminal_value']:,.0f}\n")
+        lines.append(f"  Probability of loss: {row['prob_loss']:.1%}\n")
+        for column in summary.columns:
+            if column.startswith('VaR_'):
+                level = column[len('VaR_'):]
+                lines.append(f"  {level} VaR: ${row[column]:,.0f} | CVaR: ${row['CVaR_' + level]:,.0f}\n")
+        lines.append(f"  Max drawdown: median {row['median_max_drawdown']:.1%}, "
+                     f"5th percentile {row['p05_max_drawdown']:.1%}\n")
+        lines.append(f"  P(drawdown > 15%): {row['prob_drawdown_trigger']:.1%}\n")
+        lines.append(f"  P(volatility > 20%): {row['prob_volatility_trigger']:.1%}\n")
+        lines.append(f"  P(lagging SPY by > 5%): {row['prob_underperformance_trigger']:.1%}\n")
+        lines.append(f"  P(any rebalancing trigger): {row['prob_any_trigger']:.1%}\n")
+    return ''.join(lines)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Local Price & Return Store - Phase 4: Investment Decisions
+===============================================================
+
+Offline time-series store for daily sector ETF and benchmark prices and total
+returns. CSV drops (one file per ticker) are converted once into memory-mapped
+NumPy arrays, so the tracker, backtests and scenario tools can slice years of
+daily data without network access or re-parsing CSVs.
+
+CSV drop format (price_data/<TICKER>.csv):
+- date: trading date
+- close: closing price
+- adj_close (optional): dividend/split adjusted close; total returns use it
+- dividend (optional): cash dividend paid on the date, used when adj_close is absent
+
+Store layout (price_store/):
+- manifest.json: tickers, date range and a version hash of the inputs
+  (price_drop_version; the tracker rebuilds the store when the drops change)
+- dates.npy: (T,) datetime64[D] trading calendar (union of all tickers)
+- close.npy, total_return.npy: (T, N) float64 arrays, NaN where a ticker has no data
+
+Usage:
+    python price_store.py            # build price_store/ from price_data/*.csv
+
+Author: Wassil
+Project: $2.5M Sector Allocation Strategy
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import glob
+import json
+import hashlib
+from datetime import datetime
+
+PRICE_DATA_DIR = "price_data"
+PRICE_STORE_DIR = "price_store"
+
+BENCHMARK_TICKER = 'SPY'
+
+# SPDR sector ETF for each GICS sector
+SECTOR_ETFS = {
+    10: 'XLE',   # Energy
+    15: 'XLB',   # Materials
+    20: 'XLI',   # Industrials
+    25: 'XLY',   # Consumer Discretionary
+    30: 'XLP',   # Consumer Staples
+    35: 'XLV',   # Health Care
+    40: 'XLF',   # Financials
+    45: 'XLK',   # Information Technology
+    50: 'XLC',   # Communication Services
+    55: 'XLU',   # Utilities
+    60: 'XLRE'   # Real Estate
+}
+
+STORE_FIELDS = ['close', 'total_return']
+
+def main():
+    """Build the local store from CSV drops"""
+
+    print("=== Building Local Price Store ===\n")
+
+    try:
+        manifest = build_price_store(PRICE_DATA_DIR, PRICE_STORE_DIR)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return
+
+    print(f"Tickers: {', '.join(manifest['tickers'])}")
+    print(f"Dates: {manifest['start']} to {manifest['end']} ({manifest['n_dates']:,} trading days)")
+    print(f"Store written to: {PRICE_STORE_DIR}/")
+
+def read_price_csv(path):
+    """Read one ticker's CSV drop and compute daily total returns"""
+
+    df = pd.read_csv(path)
+    df.columns = [c.strip().lower() for c in df.columns]
+    if 'date' not in df.columns or 'close' not in df.columns:
+        raise ValueError(f"{path}: price CSVs need 'date' and 'close' columns")
+
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.drop_duplicates('date', keep='last').sort_values('date').set_index('date')
+
+    if 'adj_close' in df.columns:
+        total_return = df['adj_close'].pct_change(fill_method=None)
+    else:
+        dividend = df['dividend'].fillna(0) if 'dividend' in df.columns else 0.0
+        total_return = (df['close'] + dividend) / df['close'].shift(1) - 1
+
+    return pd.DataFrame({'close': df['close'], 'total_return': total_return})
+
+def price_drop_version(csv_dir=PRICE_DATA_DIR):
+    """Version hash of the CSV drops, as recorded in manifest['version'] (None if there are none)"""
+
+    paths = sorted(glob.glob(os.path.join(csv_dir, '*.csv')))
+    if not paths:
+        return None
+
+    digest = hashlib.sha256()
+    for path in paths:
+        ticker = os.path.splitext(os.path.basename(path))[0].upper()
+        with open(path, 'rb') as f:
+            digest.update(ticker.encode())
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def build_price_store(csv_dir=PRICE_DATA_DIR, store_dir=PRICE_STORE_DIR):
+    """Convert <TICKER>.csv drops into memory-mappable arrays"""
+
+    paths = sorted(glob.glob(os.path.join(csv_dir, '*.csv')))
+    if not paths:
+        raise FileNotFoundError(f"No price CSVs found in {csv_dir}/")
+
+    frames = {os.path.splitext(os.path.basename(path))[0].upper(): read_price_csv(path) for path in paths}
+
+    tickers = sorted(frames)
+    combined = pd.concat({t: frames[t] for t in tickers}, axis=1).sort_index()
+    dates = combined.index.values.astype('datetime64[D]')
+
+    os.makedirs(store_dir, exist_ok=True)
+    np.save(os.path.join(store_dir, 'dates.npy'), dates)
+    for field in STORE_FIELDS:
+        matrix = combined.xs(field, axis=1, level=1)[tickers].to_numpy(dtype=float)
+        np.save(os.path.join(store_dir, f'{field}.npy'), matrix)
+
+    manifest = {
+        'tickers': tickers,
+        'start': str(dates[0]),
+        'end': str(dates[-1]),
+        'n_dates': int(len(dates)),
+        'version': price_drop_version(csv_dir),
+        'built': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(os.path.join(store_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+def price_store_version(store_dir=PRICE_STORE_DIR):
+    """manifest['version'] of a built store, None if there is no store"""
+
+    manifest_path = os.path.join(store_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f).get('version')
+
+def load_price_store(store_dir=PRICE_STORE_DIR):
+    """Open the store with memory-mapped arrays"""
+
+    with open(os.path.join(store_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+
+    store = {
+        'manifest': manifest,
+        'tickers': manifest['tickers'],
+        'ticker_index': {t: i for i, t in enumerate(manifest['tickers'])},
+        'dates': np.load(os.path.join(store_dir, 'dates.npy'))
+    }
+    for field in STORE_FIELDS:
+        store[field] = np.load(os.path.join(store_dir, f'{field}.npy'), mmap_mode='r')
+
+    return store
+
+def get_series(store, tickers=None, start=None, end=None, field='total_return'):
+    """(dates x tickers) frame for a date range; only the requested slice is read"""
+
+    if tickers is None:
+        tickers = store['tickers']
+    elif isinstance(tickers, str):
+        tickers = [tickers]
+
+    unknown = [t for t in tickers if t not in store['ticker_index']]
+    if unknown:
+        raise KeyError(f"Tickers not in price store: {unknown}")
+
+    # Binary search on the sorted calendar, inclusive on both ends
+    dates = store['dates']
+    lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'D'), side='left')
+    hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'D'), side='right')
+
+    columns = [store['ticker_index'][t] for t in tickers]
+    values = np.asarray(store[field][lo:hi][:, columns])
+
+    return pd.DataFrame(values, index=pd.DatetimeIndex(dates[lo:hi], name='date'), columns=list(tickers))
+
+def resample_returns(returns, freq='ME'):
+    """Compound periodic returns to a lower frequency (NaN if a period has no data)"""
+    growth = (1 + returns).resample(freq).prod(min_count=1)
+    return growth - 1
+
+def get_returns(store, tickers=None, start=None, end=None, freq='D'):
+    """Total returns by ticker, optionally compounded to month-end ('ME') or quarter-end ('QE')"""
+
+    returns = get_series(store, tickers, start, end, field='total_return')
+    if freq == 'D':
+        return returns
+    return resample_returns(returns, freq)
+
+def get_prices(store, tickers=None, start=None, end=None, freq='D'):
+    """Closing prices by ticker, optionally sampled at period end"""
+
+    prices = get_series(store, tickers, start, end, field='close')
+    if freq == 'D':
+        return prices
+    return prices.resample(freq).last()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Streaming Rebalancing Monitor - Phase 4: Investment Decisions
+===============================================================
+
+Event-driven version of the tracker's rebalancing triggers. Return
+observations are fed in one at a time (from the local price store, replayed
+history or, later, intraday marks) and every update costs constant time:
+
+- Running wealth, peak and drawdown
+- Exponentially weighted volatility (RiskMetrics, decay 0.94)
+- Rolling-window volatility from a ring buffer with running sums
+- Tracking difference: cumulative portfolio minus cumulative benchmark return
+
+Triggers are edge-triggered: an alert fires with its timestamp when a rule's
+condition becomes true and re-arms once the metric recovers past the rule's
+'rearm' level (hysteresis, so a metric hovering at the threshold does not
+fire on every tick). The default rules are the tracker's 15% drawdown, 20%
+volatility and 5% underperformance alerts; extra rules use the same dict
+layout.
+
+Usage:
+    python rebalancing_monitor.py    # replay daily price store history
+
+Author: Wassil
+Project: $2.5M Sector Allocation Strategy
+"""
+
+import math
+import os
+import numpy as np
+from datetime import datetime
+
+from price_store import PRICE_STORE_DIR, BENCHMARK_TICKER, SECTOR_ETFS, load_price_store, get_returns
+
+DEFAULT_TRIGGERS = [
+    {'name': 'DRAWDOWN', 'metric': 'drawdown', 'op': '<', 'threshold': -0.15, 'rearm': -0.10,
+     'message': "Portfolio drawdown exceeds 15% threshold",
+     'action': "Consider defensive rebalancing"},
+    {'name': 'VOLATILITY', 'metric': 'rolling_volatility', 'op': '>', 'threshold': 0.20, 'rearm': 0.18,
+     'message': "Portfolio volatility above 20%",
+     'action': "Reduce high-variance positions"},
+    {'name': 'UNDERPERFORMANCE', 'metric': 'tracking_difference', 'op': '<', 'threshold': -0.05, 'rearm': -0.03,
+     'message': "Lagging S&P 500 by >5%",
+     'action': "Review sector allocation thesis"}
+]
+
+def main():
+    """Replay daily price store history through the monitor"""
+
+    print("=== Streaming Rebalancing Monitor ===\n")
+
+    if not os.path.exists(os.path.join(PRICE_STORE_DIR, 'manifest.json')):
+        print(f"Error: no price store found in {PRICE_STORE_DIR}/ (run price_store.py first)")
+        return
+
+    from investment_performance_tracker import load_portfolio_allocation
+
+    store = load_price_store(PRICE_STORE_DIR)
+    allocation = load_portfolio_allocation()
+    daily = get_returns(store, [t for t in [BENCHMARK_TICKER] + list(SECTOR_ETFS.values())
+                                if t in store['ticker_index']])
+
+    # Daily-rebalanced Phase 3 weights; sectors without an ETF series use SPY
+    portfolio = 0.0
+    for data in allocation.values():
+        ticker = SECTOR_ETFS[data['sector_code']]
+        portfolio = portfolio + data['weight'] * daily[ticker if ticker in daily else BENCHMARK_TICKER].fillna(0)
+
+    monitor = RebalancingMonitor(periods_per_year=252, window=63)
+    start = datetime.now()
+    alerts = monitor.replay(daily.index, portfolio.to_numpy(), daily[BENCHMARK_TICKER].to_numpy())
+    elapsed = (datetime.now() - start).total_seconds()
+
+    print(f"Replayed {monitor.n:,} daily observations in {elapsed * 1000:.1f} ms")
+    print(f"Alerts fired: {len(alerts)}\n")
+    for alert in alerts:
+        print('\n'.join(format_alert(alert)))
+
+class RebalancingMonitor:
+    """Constant-time-per-update tracker of drawdown, volatility and benchmark lag"""
+
+    def __init__(self, triggers=None, periods_per_year=252, window=63, ewma_decay=0.94, min_periods=None):
+        self.triggers = [dict(rule) for rule in (DEFAULT_TRIGGERS if triggers is None else triggers)]
+        self.annualization = math.sqrt(periods_per_year)
+        self.window = window
+        self.decay = ewma_decay
+        self.min_periods = window if min_periods is None else min_periods
+
+        self.n = 0
+        self.timestamp = None
+        self.wealth = 1.0
+        self.peak = 1.0
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.benchmark_wealth = 1.0
+        self.ewma_variance = None
+
+        # Ring buffer of the last `window` returns with running sums
+        self.buffer = [0.0] * window
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+        self.active = [False] * len(self.triggers)
+        self.alerts = []
+
+    def add_trigger(self, name, metric, op, threshold, rearm=None, message='', action=''):
+        """Register an additional alert rule (re-arms at the threshold unless rearm is given)"""
+        self.triggers.append({'name': name, 'metric': metric, 'op': op, 'threshold': threshold,
+                              'rearm': threshold if rearm is None else rearm,
+                              'message': message, 'action': action})
+        self.active.append(False)
+
+    @property
+    def rolling_volatility(self):
+        count = min(self.n, self.window)
+        if count < max(self.min_periods, 2):
+            return math.nan
+        variance = (self.sum_sq - self.sum * self.sum / count) / (count - 1)
+        return math.sqrt(max(variance, 0.0)) * self.annualization
+
+    @property
+    def ewma_volatility(self):
+        if self.ewma_variance is None:
+            return math.nan
+        return math.sqrt(self.ewma_variance) * self.annualization
+
+    @property
+    def cumulative_return(self):
+        return self.wealth - 1
+
+    @property
+    def tracking_difference(self):
+        return self.wealth - self.benchmark_wealth
+
+    def update(self, timestamp, portfolio_return, benchmark_return=0.0):
+        """Process one observation; returns the alerts it fired"""
+
+        self.n += 1
+        self.timestamp = timestamp
+
+        self.wealth *= 1 + portfolio_return
+        self.benchmark_wealth *= 1 + benchmark_return
+        if self.wealth > self.peak:
+            self.peak = self.wealth
+        self.drawdown = self.wealth / self.peak - 1
+        if self.drawdown < self.max_drawdown:
+            self.max_drawdown = self.drawdown
+
+        squared = portfolio_return * portfolio_return
+        if self.ewma_variance is None:
+            self.ewma_variance = squared
+        else:
+            self.ewma_variance = self.decay * self.ewma_variance + (1 - self.decay) * squared
+
+        slot = (self.n - 1) % self.window
+        leaving = self.buffer[slot]
+        self.buffer[slot] = portfolio_return
+        self.sum += portfolio_return - leaving
+        self.sum_sq += squared - leaving * leaving
+
+        return self.check_triggers()
+
+    def check_triggers(self):
+        """Fire rules whose condition has just become true; re-arm recovered ones"""
+
+        fired = []
+        for i, rule in enumerate(self.triggers):
+            value = getattr(self, rule['metric'])
+            # While active, the rule stays latched until the metric passes its rearm level
+            level = rule.get('rearm', rule['threshold']) if self.active[i] else rule['threshold']
+            if rule['op'] == '<':
+                hit = value < level
+            else:
+                hit = value > level
+
+            if hit and not self.active[i]:
+                alert = {'timestamp': self.timestamp, 'trigger': rule['name'], 'metric': rule['metric'],
+                         'value': value, 'threshold': rule['threshold'],
+                         'message': rule.get('message', ''), 'action': rule.get('action', '')}
+                self.alerts.append(alert)
+                fired.append(alert)
+            self.active[i] = hit
+
+        return fired
+
+    def replay(self, timestamps, portfolio_returns, benchmark_returns=None):
+        """Feed a historical series through the monitor; returns all alerts fired"""
+
+        portfolio_returns = np.nan_to_num(np.asarray(portfolio_returns, dtype=float)).tolist()
+        if benchmark_returns is None:
+            benchmark_returns = [0.0] * len(portfolio_returns)
+        else:
+            benchmark_returns = np.nan_to_num(np.asarray(benchmark_returns, dtype=float)).tolist()
+
+        fired = []
+        for timestamp, r, b in zip(timestamps, portfolio_returns, benchmark_returns):
+            fired.extend(self.update(timestamp, r, b))
+        return fired
+
+    def state(self):
+        """Snapshot of the current monitor metrics"""
+        return {
+            'timestamp': self.timestamp,
+            'observations': self.n,
+            'cumulative_return': self.cumulative_return,
+            'drawdown': self.drawdown,
+            'max_drawdown': self.max_drawdown,
+            'ewma_volatility': self.ewma_volatility,
+            'rolling_volatility': self.rolling_volatility,
+            'tracking_difference': self.tracking_difference
+        }
+
+def format_alert(alert):
+    """Tracker-style alert lines with the firing timestamp"""
+
+    timestamp = alert['timestamp']
+    when = timestamp.strftime('%Y-%m-%d') if hasattr(timestamp, 'strftime') else str(timestamp)
+    lines = [f"⚠️  {alert['trigger']} ALERT ({when}): {alert['message']} "
+             f"[{alert['metric']} {alert['value']:.1%} vs {alert['threshold']:.0%}]"]
+    if alert['action']:
+        lines.append(f"   Recommended Action: {alert['action']}\n")
+    return lines
+
+if __name__ == "__main__":
+    main()
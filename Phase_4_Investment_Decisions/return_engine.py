@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Portfolio Return Engine - Phase 4: Investment Decisions
+===============================================================
+
+Matrix-based portfolio return calculation for the sector allocation strategy.
+Takes a (dates x sectors) return matrix and sector weights that may change
+over time, and produces portfolio, cumulative and per-sector contribution
+series for one or many candidate portfolios in a single call.
+
+Shapes:
+- returns: (T, S) periodic sector returns (daily, monthly, ...)
+- weights: (S,) static, (T, S) time-varying, or (P, T, S) / (P, 1, S) for P
+  candidate portfolios; weights on row t apply to the return of period t
+- outputs: portfolio and cumulative returns (T, P), contributions (P, T, S)
+
+Author: Wassil
+Project: $2.5M Sector Allocation Strategy
+"""
+
+import numpy as np
+
+def as_weight_tensor(weights, n_periods, n_sectors):
+    """Broadcast supported weight layouts to a (P, T or 1, S) array"""
+
+    weights = np.asarray(weights, dtype=float)
+
+    if weights.ndim == 1:
+        weights = weights[None, None, :]
+    elif weights.ndim == 2:
+        weights = weights[None, :, :]
+    elif weights.ndim != 3:
+        raise ValueError(f"weights must be 1-D, 2-D or 3-D, got shape {weights.shape}")
+
+    if weights.shape[-1] != n_sectors:
+        raise ValueError(f"weights have {weights.shape[-1]} sectors, returns have {n_sectors}")
+    if weights.shape[1] not in (1, n_periods):
+        raise ValueError(f"weights have {weights.shape[1]} periods, returns have {n_periods}")
+
+    return weights
+
+def compute_portfolio_returns(returns, weights, return_contributions=True):
+    """Portfolio, cumulative and per-sector contribution series for every portfolio"""
+
+    returns = np.asarray(returns, dtype=float)
+    n_periods, n_sectors = returns.shape
+    weights = as_weight_tensor(weights, n_periods, n_sectors)
+
+    # Missing sector returns only matter where the sector is actually held
+    nan_returns = np.isnan(returns)
+    safe_returns = np.where(nan_returns, 0.0, returns)
+    missing = (nan_returns[None, :, :] & (weights != 0)) if nan_returns.any() else None
+
+    if weights.shape[1] == 1:
+        # Static weights: one (T x S) @ (S x P) product
+        portfolio_returns = safe_returns @ weights[:, 0, :].T
+    else:
+        portfolio_returns = np.einsum('pts,ts->tp', weights, safe_returns)
+
+    if missing is not None:
+        portfolio_returns = np.where(missing.any(axis=2).T, np.nan, portfolio_returns)
+
+    cumulative_returns = np.cumprod(1 + portfolio_returns, axis=0) - 1
+
+    result = {
+        'portfolio_returns': portfolio_returns,
+        'cumulative_returns': cumulative_returns,
+    }
+
+    if return_contributions:
+        contributions = weights * safe_returns[None, :, :]
+        if missing is not None:
+            contributions = np.where(missing, np.nan, contributions)
+        result['contributions'] = contributions
+
+    return result
+
+def drift_weights(returns, target_weights, rebalance):
+    """Beginning-of-period weights that drift with returns between rebalance dates
+
+    target_weights: (S,), (P, S) constant or (P, T, S) time-varying targets;
+    rows at rebalance dates are the weights reset to. A (T, S) schedule must
+    be passed as (1, T, S). rebalance: boolean (T,) mask (the first period
+    always rebalances). Returns a (P, T, S) array.
+    """
+
+    returns = np.nan_to_num(np.asarray(returns, dtype=float))
+    n_periods, n_sectors = returns.shape
+
+    target_weights = np.asarray(target_weights, dtype=float)
+    if target_weights.ndim == 1:
+        target_weights = target_weights[None, :]
+    if target_weights.ndim == 2:
+        if len(target_weights) == n_periods:
+            raise ValueError(f"Ambiguous target weights of shape {target_weights.shape}: pass a (T, S) schedule "
+                             f"as (1, T, S) or constant candidate portfolios as (P, S) with P != T")
+        target_weights = np.broadcast_to(target_weights[:, None, :], (len(target_weights), n_periods, n_sectors))
+
+    rebalance = np.asarray(rebalance, dtype=bool).copy()
+    rebalance[0] = True
+
+    # growth[t] = prod_{u < t} (1 + r_u): value of $1 held from the start to period t
+    growth = np.vstack([np.ones((1, n_sectors)), np.cumprod(1 + returns, axis=0)[:-1]])
+
+    # Index of the most recent rebalance for every period
+    last_rebalance = np.maximum.accumulate(np.where(rebalance, np.arange(n_periods), 0))
+
+    anchor = target_weights[:, last_rebalance, :]
+    drifted = anchor * growth[None, :, :] / growth[last_rebalance][None, :, :]
+
+    # Any unallocated (cash) fraction keeps its value between rebalances
+    totals = drifted.sum(axis=2, keepdims=True) + (1 - anchor.sum(axis=2, keepdims=True))
+    return np.divide(drifted, totals, out=np.zeros_like(drifted), where=totals != 0)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Batched Risk Metrics - Phase 4: Investment Decisions
+===============================================================
+
+Risk and performance statistics evaluated for many portfolios at once.
+Every function takes a (T x P) array of periodic returns (one column per
+portfolio; a Series or 1-D array is treated as a single portfolio) and
+returns one value per portfolio, so ranking thousands of candidate
+allocations from a parameter sweep is a handful of array operations.
+
+Metrics:
+- Annualized return and volatility, Sharpe, Sortino and Calmar ratios
+- Maximum drawdown and its duration (periods from peak to recovery)
+- Historical and parametric (normal) VaR and CVaR, reported as positive losses
+- Beta, tracking error and information ratio against a benchmark series
+
+risk_report() computes all of them in one call; rolling_risk_report() gives
+the same metrics over a sliding window, with windows laid out as a strided
+view and evaluated by the same vectorized functions.
+
+Returns are assumed complete; drop or fill missing periods first.
+
+Author: Wassil
+Project: $2.5M Sector Allocation Strategy
+"""
+
+import pandas as pd
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import stats
+
+def as_return_matrix(returns):
+    """(T, P) float array from a Series, DataFrame or 1-/2-D array"""
+    matrix = np.asarray(returns, dtype=float)
+    return matrix[:, None] if matrix.ndim == 1 else matrix
+
+def as_benchmark_column(benchmark):
+    """(T, 1) benchmark column that broadcasts against a (T, P) matrix"""
+    return np.asarray(benchmark, dtype=float).reshape(-1, 1)
+
+def annualized_return(returns, periods_per_year=12):
+    """Geometric annualized return"""
+    R = as_return_matrix(returns)
+    growth = np.prod(1 + R, axis=0)
+    return growth ** (periods_per_year / len(R)) - 1
+
+def annualized_volatility(returns, periods_per_year=12):
+    """Annualized standard deviation of periodic returns"""
+    return as_return_matrix(returns).std(axis=0, ddof=1) * np.sqrt(periods_per_year)
+
+def sharpe_ratio(returns, risk_free_rate=0.02, periods_per_year=12):
+    """Annualized Sharpe ratio of excess returns"""
+    excess = as_return_matrix(returns) - risk_free_rate / periods_per_year
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return excess.mean(axis=0) / excess.std(axis=0, ddof=1) * np.sqrt(periods_per_year)
+
+def sortino_ratio(returns, risk_free_rate=0.02, periods_per_year=12):
+    """Annualized Sortino ratio (downside deviation below the risk-free rate)"""
+    excess = as_return_matrix(returns) - risk_free_rate / periods_per_year
+    downside = np.sqrt((np.minimum(excess, 0) ** 2).mean(axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return excess.mean(axis=0) / downside * np.sqrt(periods_per_year)
+
+def drawdown_statistics(returns):
+    """Maximum drawdown (negative fraction) and longest drawdown duration in periods"""
+
+    R = as_return_matrix(returns)
+    T = len(R)
+    wealth = np.vstack([np.ones((1, R.shape[1])), np.cumprod(1 + R, axis=0)])
+    peak = np.maximum.accumulate(wealth, axis=0)
+    drawdown = wealth / peak - 1
+
+    # Periods since the most recent peak, for every date and portfolio at once
+    at_peak = drawdown >= 0
+    last_peak = np.maximum.accumulate(np.where(at_peak, np.arange(T + 1)[:, None], 0), axis=0)
+    duration = np.arange(T + 1)[:, None] - last_peak
+
+    return drawdown.min(axis=0), duration.max(axis=0)
+
+def max_drawdown(returns):
+    """Maximum peak-to-trough decline (negative fraction)"""
+    return drawdown_statistics(returns)[0]
+
+def calmar_ratio(returns, periods_per_year=12):
+    """Annualized return over the absolute maximum drawdown"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return annualized_return(returns, periods_per_year) / np.abs(max_drawdown(returns))
+
+def historical_var(returns, confidence=0.95):
+    """Historical VaR and CVaR of periodic returns, as positive losses"""
+
+    losses = -as_return_matrix(returns)
+    var = np.quantile(losses, confidence, axis=0)
+    tail = losses >= var
+    cvar = (losses * tail).sum(axis=0) / tail.sum(axis=0)
+    return var, cvar
+
+def parametric_var(returns, confidence=0.95):
+    """Normal (variance-covariance) VaR and CVaR of periodic returns, as positive losses"""
+
+    R = as_return_matrix(returns)
+    mean, std = R.mean(axis=0), R.std(axis=0, ddof=1)
+    z = stats.norm.ppf(confidence)
+    var = -(mean - z * std)
+    cvar = -(mean - std * stats.norm.pdf(z) / (1 - confidence))
+    return var, cvar
+
+def beta(returns, benchmark):
+    """Regression beta of each portfolio on the benchmark"""
+    R = as_return_matrix(returns)
+    b = as_benchmark_column(benchmark)
+    b_centered = b - b.mean()
+    return ((R - R.mean(axis=0)) * b_centered).sum(axis=0) / (b_centered ** 2).sum()
+
+def tracking_error(returns, benchmark, periods_per_year=12):
+    """Annualized standard deviation of active returns"""
+    active = as_return_matrix(returns) - as_benchmark_column(benchmark)
+    return active.std(axis=0, ddof=1) * np.sqrt(periods_per_year)
+
+def information_ratio(returns, benchmark, periods_per_year=12):
+    """Annualized mean active return over tracking error"""
+    active = as_return_matrix(returns) - as_benchmark_column(benchmark)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return active.mean(axis=0) / active.std(axis=0, ddof=1) * np.sqrt(periods_per_year)
+
+def compute_risk_metrics(R, benchmark=None, risk_free_rate=0.02, periods_per_year=12, confidence=0.95):
+    """All metrics for a (T, P) array as a dict of (P,) arrays"""
+
+    max_dd, duration = drawdown_statistics(R)
+    ann_return = annualized_return(R, periods_per_year)
+    hist_var, hist_cvar = historical_var(R, confidence)
+    param_var, param_cvar = parametric_var(R, confidence)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        calmar = ann_return / np.abs(max_dd)
+
+    metrics = {
+        'annualized_return': ann_return,
+        'volatility': annualized_volatility(R, periods_per_year),
+        'sharpe_ratio': sharpe_ratio(R, risk_free_rate, periods_per_year),
+        'sortino_ratio': sortino_ratio(R, risk_free_rate, periods_per_year),
+        'calmar_ratio': calmar,
+        'max_drawdown': max_dd,
+        'max_drawdown_duration': duration,
+        'historical_var': hist_var,
+        'historical_cvar': hist_cvar,
+        'parametric_var': param_var,
+        'parametric_cvar': param_cvar
+    }
+
+    if benchmark is not None:
+        metrics['beta'] = beta(R, benchmark)
+        metrics['tracking_error'] = tracking_error(R, benchmark, periods_per_year)
+        metrics['information_ratio'] = information_ratio(R, benchmark, periods_per_year)
+
+    return metrics
+
+def risk_report(returns, benchmark=None, risk_free_rate=0.02, periods_per_year=12, confidence=0.95):
+    """One row of risk metrics per portfolio column"""
+
+    R = as_return_matrix(returns)
+    metrics = compute_risk_metrics(R, benchmark, risk_free_rate, periods_per_year, confidence)
+
+    index = returns.columns if isinstance(returns, pd.DataFrame) else None
+    return pd.DataFrame(metrics, index=index)
+
+def rolling_risk_report(returns, window, benchmark=None, risk_free_rate=0.02, periods_per_year=12, confidence=0.95):
+    """Metrics over a sliding window as a dict of (T, P) arrays (NaN for the first window - 1 rows)"""
+
+    R = as_return_matrix(returns)
+    T, P = R.shape
+    if window > T:
+        raise ValueError(f"window ({window}) is longer than the return series ({T})")
+    n_windows = T - window + 1
+
+    # (window, n_windows * P): every window of every portfolio becomes one column
+    windows = sliding_window_view(R, window, axis=0).transpose(2, 0, 1).reshape(window, n_windows * P)
+    benchmark_windows = None
+    if benchmark is not None:
+        b = sliding_window_view(np.asarray(benchmark, dtype=float), window)
+        benchmark_windows = np.repeat(b.T, P, axis=1)
+
+    metrics = compute_risk_metrics(windows, None, risk_free_rate, periods_per_year, confidence)
+    if benchmark_windows is not None:
+        metrics.update(rolling_benchmark_metrics(windows, benchmark_windows, periods_per_year))
+
+    padding = np.full((window - 1, P), np.nan)
+    return {name: np.vstack([padding, values.reshape(n_windows, P)]) for name, values in metrics.items()}
+
+def rolling_benchmark_metrics(windows, benchmark_windows, periods_per_year=12):
+    """Beta, tracking error and information ratio with one benchmark window per column"""
+
+    active = windows - benchmark_windows
+    b_centered = benchmark_windows - benchmark_windows.mean(axis=0)
+    r_centered = windows - windows.mean(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'beta': (r_centered * b_centered).sum(axis=0) / (b_centered ** 2).sum(axis=0),
+            'tracking_error': active.std(axis=0, ddof=1) * np.sqrt(periods_per_year),
+            'information_ratio': active.mean(axis=0) / active.std(axis=0, ddof=1) * np.sqrt(periods_per_year)
+        }
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Historical Stress Scenarios - Phase 4: Investment Decisions
+===============================================================
+
+Replays historical shock windows on sector allocations: how would the
+current weights (and any number of candidates) have fared in 2020Q1, the
+2022 rate shock, and other episodes?
+
+Scenario sources:
+- Market scenarios: daily sector ETF and SPY returns from the local price
+  store, from the start of the shock through a recovery horizon
+- Valuation scenarios: sector P/E median paths from the Phase 3 statistics
+  (price moves implied by multiple compression at constant earnings)
+
+Each scenario is stored as a (periods x sectors) cumulative growth matrix, so
+buy-and-hold portfolio value paths for P allocations are one matrix product
+(growth @ weights.T). Reported per scenario and allocation: shock-window
+loss, maximum drawdown, trough date, recovery time and which rebalancing
+triggers (15% drawdown, 20% volatility, 5% lag vs. SPY) would have fired.
+
+The scenario library is precomputed once and cached in stress_scenarios.npz,
+keyed by the price store version and the Phase 3 statistics file, so what-if
+runs on new weights only pay for the matrix products.
+
+Author: Wassil
+Project: $2.5M Sector Allocation Strategy
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import hashlib
+from datetime import datetime
+
+from price_store import PRICE_STORE_DIR, BENCHMARK_TICKER, SECTOR_ETFS, load_price_store, get_returns
+from rebalancing_monitor import DEFAULT_TRIGGERS
+
+SECTOR_STATS_PATH = "../Phase_3_Sector_Analysis/Compustat_Sector_Statistics.csv"
+SCENARIO_CACHE = "stress_scenarios.npz"
+
+# Shock windows: (start, end of shock) on the daily trading calendar
+MARKET_SCENARIOS = {
+    '2011 US downgrade': ('2011-07-07', '2011-10-03'),
+    '2015-16 oil collapse': ('2015-11-03', '2016-02-11'),
+    '2018 Q4 selloff': ('2018-09-20', '2018-12-24'),
+    '2020 COVID crash': ('2020-02-19', '2020-03-23'),
+    '2022 rate shock': ('2022-01-03', '2022-10-12')
+}
+RECOVERY_DAYS = 504  # ~2 years of trading days after the shock
+
+# Valuation shocks: (quarter before the shock, last shock quarter) on the Phase 3 calendar
+VALUATION_SCENARIOS = {
+    '2020 COVID multiple shock': ('2019Q4', '2020Q1'),
+    '2022 rate multiple shock': ('2021Q4', '2022Q3')
+}
+VALUATION_METRIC = 'PE_median'
+RECOVERY_QUARTERS = 8
+
+def main():
+    """Main stress test function"""
+
+    print("=== Historical Stress Scenario Replay ===\n")
+
+    from investment_performance_tracker import load_portfolio_allocation
+
+    try:
+        library = get_scenario_library(PRICE_STORE_DIR, SECTOR_STATS_PATH, SCENARIO_CACHE)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return
+
+    allocation = load_portfolio_allocation()
+    sectors = library['sectors']
+    weights = pd.DataFrame({
+        'Phase 3 allocation': allocation_weights(allocation, sectors),
+        'Equal-weight sectors': np.full(len(sectors), 1 / len(sectors))
+    }, index=sectors).T
+
+    start = datetime.now()
+    results = run_stress_tests(library, weights)
+    elapsed = (datetime.now() - start).total_seconds()
+    results.to_csv('stress_test_results.csv', index=False)
+
+    report = []
+    report.append("=== HISTORICAL STRESS SCENARIO REPLAY ===\n")
+    report.append(f"Report Date: {datetime.now().strftime('%Y-%m-%d')}\n")
+    report.append(f"Scenario library: {SCENARIO_CACHE} (version {library['version']})\n")
+    report.append(f"{len(library['scenarios'])} scenarios x {len(weights)} allocations in {elapsed * 1000:.1f} ms\n\n")
+    report.append(format_stress_results(results))
+
+    with open('stress_test_report.txt', 'w') as f:
+        f.writelines(report)
+
+    print("Stress tests complete. Results saved to stress_test_report.txt")
+
+def library_version(store, sector_stats_path):
+    """Cache key from the price store version and the Phase 3 statistics file"""
+
+    digest = hashlib.sha256(store['manifest']['version'].encode())
+    if os.path.exists(sector_stats_path):
+        with open(sector_stats_path, 'rb') as f:
+            digest.update(f.read())
+    digest.update(repr((MARKET_SCENARIOS, RECOVERY_DAYS, VALUATION_SCENARIOS, VALUATION_METRIC,
+                        RECOVERY_QUARTERS)).encode())
+    return digest.hexdigest()[:16]
+
+def get_scenario_library(store_dir=PRICE_STORE_DIR, sector_stats_path=SECTOR_STATS_PATH, cache_path=SCENARIO_CACHE):
+    """Load the cached scenario library, rebuilding it when its inputs changed"""
+
+    if not os.path.exists(os.path.join(store_dir, 'manifest.json')):
+        raise FileNotFoundError(f"No price store found in {store_dir}/ (run price_store.py first)")
+
+    store = load_price_store(store_dir)
+    version = library_version(store, sector_stats_path)
+
+    if os.path.exists(cache_path):
+        library = load_scenario_library(cache_path)
+        if library['version'] == version:
+            return library
+
+    sector_stats = pd.read_csv(sector_stats_path) if os.path.exists(sector_stats_path) else None
+    library = build_scenario_library(store, sector_stats)
+    library['version'] = version
+    save_scenario_library(cache_path, library)
+    return library
+
+def build_scenario_library(store, sector_stats=None):
+    """Cumulative growth paths for every named scenario"""
+
+    sectors = np.array(sorted(SECTOR_ETFS))
+    scenarios = []
+
+    daily = get_returns(store, [t for t in [BENCHMARK_TICKER] + list(SECTOR_ETFS.values())
+                                if t in store['ticker_index']])
+    for name, (start, end) in MARKET_SCENARIOS.items():
+        scenario = market_scenario(daily, name, start, end, sectors)
+        if scenario is not None:
+            scenarios.append(scenario)
+
+    if sector_stats is not None:
+        for name, (base, end) in VALUATION_SCENARIOS.items():
+            scenario = valuation_scenario(sector_stats, name, base, end, sectors)
+            if scenario is not None:
+                scenarios.append(scenario)
+
+    return {'sectors': sectors, 'scenarios': scenarios}
+
+def market_scenario(daily, name, start, end, sectors):
+    """Growth paths from daily returns: shock window plus recovery horizon"""
+
+    first = daily.index.searchsorted(pd.Timestamp(start))
+    shock_end = daily.index.searchsorted(pd.Timestamp(end), side='right')
+    if first >= len(daily) or shock_end <= first:
+        return None
+    window = daily.iloc[first:min(shock_end + RECOVERY_DAYS, len(daily))]
+
+    # Sectors whose ETF did not trade yet are proxied by the benchmark
+    benchmark = window[BENCHMARK_TICKER].fillna(0).to_numpy()
+    returns = np.column_stack([
+        window[SECTOR_ETFS[code]].fillna(window[BENCHMARK_TICKER]).fillna(0).to_numpy()
+        if SECTOR_ETFS[code] in window else benchmark
+        for code in sectors
+    ])
+
+    # Row 0 is the pre-shock value (1.0) on the previous trading day
+    previous = daily.index[first - 1] if first > 0 else window.index[0] - pd.Timedelta(days=1)
+    return {
+        'name': name,
+        'source': 'market',
+        'frequency': 'D',
+        'dates': window.index.insert(0, previous).values.astype('datetime64[D]'),
+        'growth': np.vstack([np.ones(len(sectors)), np.cumprod(1 + returns, axis=0)]),
+        'benchmark': np.r_[1.0, np.cumprod(1 + benchmark)],
+        'shock_end': shock_end - first
+    }
+
+def valuation_scenario(sector_stats, name, base, end, sectors):
+    """Growth paths implied by sector P/E changes relative to the pre-shock quarter"""
+
+    panel = sector_stats.pivot_table(index='quarter', columns='gsector', values=VALUATION_METRIC, aggfunc='first')
+    panel = panel.sort_index().reindex(columns=sectors)
+    quarters = list(panel.index)
+    if base not in quarters or end not in quarters:
+        return None
+
+    first, shock_end = quarters.index(base), quarters.index(end)
+    path = panel.iloc[first:min(shock_end + RECOVERY_QUARTERS + 1, len(panel))]
+
+    # Multiple compression at constant earnings; non-positive P/Es carry no signal
+    pe = path.where(path > 0)
+    growth = (pe / pe.iloc[0]).ffill().fillna(1.0).to_numpy()
+
+    return {
+        'name': name,
+        'source': 'valuation',
+        'frequency': 'Q',
+        'dates': pd.PeriodIndex(path.index, freq='Q').to_timestamp(how='end').values.astype('datetime64[D]'),
+        'growth': growth,
+        # No SPY multiple in the Phase 3 data: the equal-weight sector path is the benchmark
+        'benchmark': growth.mean(axis=1),
+        'shock_end': shock_end - first
+    }
+
+def save_scenario_library(path, library):
+    """Write the scenario library to a compressed .npz file"""
+
+    arrays = {'version': np.array(library['version']), 'sectors': library['sectors']}
+    for i, scenario in enumerate(library['scenarios']):
+        for key, value in scenario.items():
+            arrays[f's{i}_{key}'] = np.asarray(value)
+    np.savez_compressed(path, **arrays)
+
+def load_scenario_library(path):
+    """Load a scenario library written by save_scenario_library"""
+
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+
+    scenarios = []
+    i = 0
+    while f's{i}_name' in arrays:
+        scenario = {key[len(f's{i}_'):]: value for key, value in arrays.items() if key.startswith(f's{i}_')}
+        for key in ['name', 'source', 'frequency']:
+            scenario[key] = str(scenario[key])
+        scenario['shock_end'] = int(scenario['shock_end'])
+        scenarios.append(scenario)
+        i += 1
+
+    return {'version': str(arrays['version']), 'sectors': arrays['sectors'], 'scenarios': scenarios}
+
+def allocation_weights(allocation, sectors):
+    """Weight vector over the library's sector codes from a tracker-style allocation"""
+    weights = pd.Series(0.0, index=sectors)
+    for data in allocation.values():
+        weights[data['sector_code']] += data['weight']
+    return weights.to_numpy()
+
+def run_stress_tests(library, weights):
+    """Replay every scenario on every allocation (rows of a weights DataFrame over sector codes)"""
+
+    thresholds = {rule['metric']: rule['threshold'] for rule in DEFAULT_TRIGGERS}
+    W = weights.reindex(columns=library['sectors']).fillna(0).to_numpy()
+    labels = list(weights.index)
+
+    records = []
+    for scenario in library['scenarios']:
+        # Buy-and-hold value paths for all allocations: (periods x P); any cash stays at 1
+        values = scenario['growth'] @ W.T + (1 - W.sum(axis=1))
+        benchmark = scenario['benchmark'][:, None]
+        shock = slice(0, scenario['shock_end'] + 1)
+
+        peak = np.maximum.accumulate(values[shock], axis=0)
+        drawdown = values[shock] / peak - 1
+        trough = drawdown.argmin(axis=0)
+
+        # First period after the trough back at the pre-shock value
+        recovered = (values >= 1.0) & (np.arange(len(values))[:, None] > trough)
+        recovery = np.where(recovered.any(axis=0), recovered.argmax(axis=0) - trough, -1)
+
+        periodic = values[1:scenario['shock_end'] + 1] / values[:scenario['shock_end']] - 1
+        periods_per_year = 252 if scenario['frequency'] == 'D' else 4
+        volatility = periodic.std(axis=0, ddof=1) * np.sqrt(periods_per_year) if len(periodic) > 1 \
+            else np.full(len(labels), np.nan)
+        tracking = (values[shock] - benchmark[shock]).min(axis=0)
+
+        n = len(labels)
+        records.append(pd.DataFrame({
+            'scenario': scenario['name'],
+            'source': scenario['source'],
+            'allocation': labels,
+            'shock_loss': values[scenario['shock_end']] - 1,
+            'benchmark_loss': np.full(n, benchmark[scenario['shock_end'], 0] - 1),
+            'max_drawdown': drawdown.min(axis=0),
+            'trough_date': pd.DatetimeIndex(scenario['dates'][trough]).strftime('%Y-%m-%d'),
+            'recovery_periods': np.where(recovery >= 0, recovery, np.nan),
+            'frequency': scenario['frequency'],
+            'drawdown_trigger': drawdown.min(axis=0) < thresholds['drawdown'],
+            'volatility_trigger': volatility > thresholds['rolling_volatility'],
+            'underperformance_trigger': tracking < thresholds['tracking_difference']
+        }))
+
+    return pd.concat(records, ignore_index=True)
+
+def format_stress_results(results):
+    """Plain-text scenario blocks, one line per allocation"""
+
+    units = {'D': 'trading days', 'Q': 'quarters'}
+    lines = []
+    for scenario, group in results.groupby('scenario', sort=False):
+        lines.append(f"=== {scenario.upper()} ({group['source'].iloc[0]}) ===\n")
+        lines.append(f"Benchmark: {group['benchmark_loss'].iloc[0]:+.1%}\n")
+        for _, row in group.iterrows():
+            recovery = (f"{row['recovery_periods']:.0f} {units[row['frequency']]}"
+                        if pd.notna(row['recovery_periods']) else "not recovered in horizon")
+            triggers = [name for name, hit in [('drawdown', row['drawdown_trigger']),
+                                               ('volatility', row['volatility_trigger']),
+                                               ('underperformance', row['underperformance_trigger'])] if hit]
+            lines.append(f"  {row['allocation']}: shock {row['shock_loss']:+.1%}, max drawdown {row['max_drawdown']:.1%} "
+                         f"(trough {row['trough_date']}), recovery {recovery}, "
+                         f"triggers: {', '.join(triggers) if triggers else 'none'}\n")
+        lines.append("\n")
+    return ''.join(lines)
+
+if __name__ == "__main__":
+    main()
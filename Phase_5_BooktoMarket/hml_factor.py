@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Fama-French Style HML Value Factor - Phase 5
+=========================================================
+
+Tests whether the Phase 5 value screen earns a premium: firms are sorted on
+B/M every quarter from 2010 to 2025, held for the next quarter, and the
+portfolio and high-minus-low (HML) return series are reported.
+
+Construction:
+- B/M = book equity (the Phase 5 definitions in screening.py, default
+  seqq + txditcq - preferred stock) from `formation_lag` quarters before
+  formation, over market cap (prccq * cshoq) at formation; BE > 0 and ME > 0
+- Breakpoints each quarter: terciles at the Fama-French 30th/70th percentiles
+  or deciles, market-wide or within each GICS sector (sector-neutral: firms
+  are bucketed against their own sector, then pooled)
+- Holding-period returns from split-adjusted prices: (prccq + dvpsxq) /
+  ajexq over the previous quarter's prccq / ajexq (Compustat ex-date
+  adjustment factor, carried forward within a firm when missing)
+- Equal or market-cap (at formation) weights; HML = highest minus lowest B/M
+  portfolio
+
+Everything is a (firm x quarter) matrix: breakpoints for all quarters come
+from one grouped-rank pass and portfolio returns from one weighted bincount
+over (quarter, portfolio). Returns need prices in consecutive quarters, so
+firms without a next-quarter price drop out of that quarter's portfolio
+(no delisting returns in Compustat).
+
+Author: Wassil
+Project: UTDSOM Investment Corp. Quantitative Analysis
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from screening import INPUT_PATH, SECTOR_NAMES, BOOK_EQUITY_DEFINITIONS, load_quarterly_panel, quarter_labels
+from ranking import grouped_rank_stats
+
+OUTPUT_PATH = "hml_factor_returns.csv"
+SUMMARY_PATH = "hml_factor_summary.txt"
+
+BREAKPOINTS = {
+    'terciles': [0.3, 0.7],
+    'deciles': [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+}
+
+# (breakpoints, sector_neutral, weighting)
+FACTOR_SPECS = [
+    ('terciles', False, 'equal'), ('terciles', False, 'value'),
+    ('terciles', True, 'equal'), ('terciles', True, 'value'),
+    ('deciles', False, 'equal'), ('deciles', False, 'value'),
+    ('deciles', True, 'equal'), ('deciles', True, 'value')
+]
+FORMATION_LAG = 1
+
+def main():
+    """Build HML and B/M portfolio returns for every specification"""
+
+    print("=== Fama-French Style HML Value Factor ===\n")
+
+    print(f"Loading data from: {INPUT_PATH}")
+    try:
+        panel = load_quarterly_panel(INPUT_PATH, extra_columns=['ajexq'])
+    except FileNotFoundError:
+        print(f"Error: Could not find {INPUT_PATH}")
+        return
+
+    start = datetime.now()
+    matrices = firm_quarter_matrices(panel)
+    print(f"   {matrices['price'].shape[0]:,} firms x {matrices['price'].shape[1]} quarters")
+
+    log = []
+    log.append("=== FAMA-FRENCH STYLE HML VALUE FACTOR ===\n")
+    log.append(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    log.append(f"Input Data: {INPUT_PATH}\n")
+    log.append(f"Book equity: stockholders (seqq + txditcq - preferred), lagged {FORMATION_LAG} quarter(s)\n")
+    log.append("Returns: quarterly, split-adjusted (ajexq) price plus dividends\n\n")
+    log.append(f"{'Specification':<32}{'Quarters':>9}{'Mean':>9}{'Ann.':>9}{'Vol':>9}{'t-stat':>9}\n")
+
+    results = []
+    for breakpoints, sector_neutral, weighting in FACTOR_SPECS:
+        name = f"{'sector' if sector_neutral else 'market'}_{breakpoints}_{weighting}"
+        returns, counts = factor_returns(matrices, BREAKPOINTS[breakpoints], sector_neutral, weighting, FORMATION_LAG)
+        stats = summarize_returns(returns['HML'])
+        log.append(f"{name:<32}{stats['quarters']:>9}{stats['mean']:>9.2%}{stats['annualized']:>9.2%}"
+                   f"{stats['volatility']:>9.2%}{stats['t_stat']:>9.2f}\n")
+
+        # One row per (quarter, portfolio), NaN returns kept
+        n_quarters, n_columns = returns.shape
+        long = pd.DataFrame({
+            'specification': name,
+            'quarter': np.repeat(returns.index, n_columns),
+            'portfolio': np.tile(returns.columns, n_quarters),
+            'return': returns.to_numpy().ravel(),
+            'n_firms': counts.to_numpy().ravel()
+        })
+        results.append(long)
+
+    output = pd.concat(results, ignore_index=True)
+    output.to_csv(OUTPUT_PATH, index=False)
+
+    elapsed = (datetime.now() - start).total_seconds()
+    print(f"   Built {len(FACTOR_SPECS)} specifications in {elapsed:.2f}s")
+    print(''.join(log[-len(FACTOR_SPECS) - 1:]))
+
+    with open(SUMMARY_PATH, 'w') as f:
+        f.writelines(log)
+
+    print(f"Saved {len(output):,} rows to: {OUTPUT_PATH}")
+    print(f"Summary saved to: {SUMMARY_PATH}")
+
+def firm_quarter_matrices(panel, book_equity='stockholders'):
+    """(firm x quarter) matrices of adjusted price, dividends, market cap, book equity and sector"""
+
+    first = panel.drop_duplicates(['gvkey', 'qidx'])
+    firm, gvkeys = pd.factorize(first['gvkey'])
+    quarter = (first['qidx'] - first['qidx'].min()).to_numpy()
+    shape = (len(gvkeys), quarter.max() + 1 if len(quarter) else 0)
+
+    def matrix(values):
+        M = np.full(shape, np.nan)
+        M[firm, quarter] = np.asarray(values, dtype=float)
+        return M
+
+    # Cumulative adjustment factor, carried forward within a firm when missing
+    adjustment = first.groupby('gvkey', sort=False)['ajexq'].ffill().fillna(1.0)
+    adjustment = adjustment.where(adjustment > 0, 1.0)
+
+    return {
+        'gvkeys': gvkeys,
+        'qidx': first['qidx'].min() + np.arange(shape[1]),
+        'price': matrix(first['prccq'] / adjustment),
+        'dividend': matrix(first['dps_q'] / adjustment),
+        'market_cap': matrix(first['market_cap']),
+        'book_equity': matrix(first[BOOK_EQUITY_DEFINITIONS[book_equity]]),
+        'sector': matrix(first['gsector'])
+    }
+
+def holding_returns(price, dividend):
+    """Quarterly return matrix: column t is the return from quarter t-1 to t"""
+
+    returns = np.full(price.shape, np.nan)
+    previous = price[:, :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[:, 1:] = np.where(previous > 0, (price[:, 1:] + np.nan_to_num(dividend[:, 1:])) / previous - 1, np.nan)
+    return returns
+
+def assign_portfolios(sort_values, sector, breakpoints, sector_neutral=False):
+    """Portfolio number (0 = lowest) of every eligible (firm, quarter) cell, -1 elsewhere"""
+
+    n_firms, n_quarters = sort_values.shape
+    firm, quarter = np.nonzero(~np.isnan(sort_values))
+    keys = (quarter, sector[firm, quarter]) if sector_neutral else quarter
+
+    # Percentile rank within each quarter (and sector) for all quarters at once
+    pct = grouped_rank_stats(keys, sort_values[firm, quarter])['pct']
+
+    portfolios = np.full(sort_values.shape, -1, dtype=np.int64)
+    portfolios[firm, quarter] = np.searchsorted(np.asarray(breakpoints), pct, side='left')
+    return portfolios
+
+def factor_returns(matrices, breakpoints, sector_neutral=False, weighting='equal', formation_lag=FORMATION_LAG):
+    """Next-quarter returns of B/M-sorted portfolios and HML
+
+    Returns (returns, counts): DataFrames indexed by holding quarter with one
+    column per portfolio (P1 = lowest B/M) plus HML, and the firm counts
+    (HML counts both legs).
+    """
+
+    price, market_cap, sector = matrices['price'], matrices['market_cap'], matrices['sector']
+    n_firms, n_quarters = price.shape
+
+    # Book equity known `formation_lag` quarters before formation, over market cap at formation
+    book_equity = np.full(price.shape, np.nan)
+    book_equity[:, formation_lag:] = matrices['book_equity'][:, :n_quarters - formation_lag]
+    eligible = (book_equity > 0) & (market_cap > 0) & np.isin(sector, list(SECTOR_NAMES))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bm = np.where(eligible, book_equity / market_cap, np.nan)
+
+    portfolios = assign_portfolios(bm, sector, breakpoints, sector_neutral)
+    returns = holding_returns(price, matrices['dividend'])
+
+    # Formation in quarter t, held over t + 1
+    formed = portfolios[:, :-1]
+    held = returns[:, 1:]
+    if weighting == 'equal':
+        weights = np.ones(formed.shape)
+    elif weighting == 'value':
+        weights = market_cap[:, :-1]
+    else:
+        raise ValueError(f"Unknown weighting: {weighting}")
+
+    use = (formed >= 0) & ~np.isnan(held) & (weights > 0)
+    firm, quarter = np.nonzero(use)
+    n_portfolios = len(breakpoints) + 1
+    cell = quarter * n_portfolios + formed[firm, quarter]
+    size = (n_quarters - 1) * n_portfolios
+
+    w = weights[firm, quarter]
+    weighted = np.bincount(cell, weights=w * held[firm, quarter], minlength=size)
+    total = np.bincount(cell, weights=w, minlength=size)
+    count = np.bincount(cell, minlength=size)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        portfolio_returns = (weighted / total).reshape(n_quarters - 1, n_portfolios)
+
+    columns = [f"P{i + 1}" for i in range(n_portfolios)]
+    index = pd.Index(quarter_labels(matrices['qidx'][1:]), name='quarter')
+    returns = pd.DataFrame(portfolio_returns, index=index, columns=columns)
+    returns['HML'] = returns[columns[-1]] - returns[columns[0]]
+    counts = pd.DataFrame(count.reshape(n_quarters - 1, n_portfolios), index=index, columns=columns)
+    counts['HML'] = counts[columns[-1]] + counts[columns[0]]
+
+    # Quarters before the first formation have no portfolios
+    formed_quarters = counts.sum(axis=1) > 0
+    return returns[formed_quarters], counts[formed_quarters]
+
+def summarize_returns(returns):
+    """Mean, annualized mean, volatility and t-statistic of a quarterly return series"""
+
+    returns = returns.dropna()
+    n = len(returns)
+    mean = returns.mean()
+    std = returns.std(ddof=1)
+    return {
+        'quarters': n,
+        'mean': mean,
+        'annualized': (1 + returns).prod() ** (4 / n) - 1 if n else np.nan,
+        'volatility': std * np.sqrt(4),
+        't_stat': mean / std * np.sqrt(n) if n > 1 and std > 0 else np.nan
+    }
+
+if __name__ == "__main__":
+    main()
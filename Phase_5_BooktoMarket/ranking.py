@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Grouped Ranking Kernel - Phase 5
+=========================================================
+
+Ranks, percentile ranks and per-group quantile thresholds for several value
+columns within groups (e.g. sector, or quarter x sector) in one pass,
+replacing groupby('sector').apply(compute_sector_metrics), which copies every
+group into a new frame and calls rank twice and quantile once per group.
+
+All columns are sorted together with a single lexsort over
+(column, group, value); tie runs and group segments are then found on the
+sorted arrays, so every tie method is a few vectorized operations:
+- 'min', 'max', 'average', 'first', 'dense' (as pandas Series.rank)
+- percentile rank = rank / valid values in the group (distinct values for 'dense')
+- threshold = group quantile with linear interpolation (as Series.quantile)
+
+NaN values and rows with a missing group key get NaN ranks and are excluded
+from group counts and quantiles, like pandas rank(na_option='keep'); rows
+with a NaN value still receive their group's count and threshold.
+
+Author: Wassil
+Project: UTDSOM Investment Corp. Quantitative Analysis
+"""
+
+import pandas as pd
+import numpy as np
+
+RANK_METHODS = ['min', 'max', 'average', 'first', 'dense']
+
+def group_codes(*keys):
+    """Integer group code per row for one or more key arrays (-1 where any key is missing)"""
+
+    codes = None
+    for key in keys:
+        key_codes, uniques = pd.factorize(pd.Series(np.asarray(key)), sort=True)
+        key_codes = key_codes.astype(np.int64)
+        if codes is None:
+            codes = key_codes
+        else:
+            codes = np.where((codes < 0) | (key_codes < 0), -1, codes * len(uniques) + key_codes)
+    return codes
+
+def grouped_rank_stats(keys, values, ascending=True, methods=('average',), pct_method='average', quantile=None):
+    """Ranks, percentile ranks and quantile thresholds of every column within groups
+
+    keys is one key array or a tuple of key arrays; values is (n,) or (n, c);
+    ascending is a bool or one bool per column. Returns a dict with one entry
+    per rank method, 'pct' (percentile rank in (0, 1] from pct_method),
+    'count' (valid values in the row's group) and, if quantile is given,
+    'threshold' (the group's quantile of the unoriented values, one q or one
+    per column). Arrays have the shape of values; group statistics are set
+    on every row with a group key, ranks only where the value is present.
+    """
+
+    codes = group_codes(*keys) if isinstance(keys, tuple) else group_codes(keys)
+    V = np.asarray(values, dtype=float)
+    single = V.ndim == 1
+    V = V[:, None] if single else V
+    n, c = V.shape
+
+    asc = np.broadcast_to(np.asarray(ascending, dtype=bool), (c,))
+    oriented = np.where(asc, V, -V)
+    valid = (codes >= 0)[:, None] & ~np.isnan(V)
+
+    # One lexsort for all columns on (segment, oriented value), where a segment is a
+    # (column, group) pair; entries without a value or group sort after every segment
+    n_groups = codes.max() + 1 if n else 0
+    flat_segment = np.repeat(np.arange(c), n) * n_groups + np.tile(codes, c)
+    flat_valid = valid.T.ravel()
+    flat_key = np.where(flat_valid, flat_segment, c * n_groups)
+    flat_value = oriented.T.ravel()
+    order = np.lexsort((flat_value, flat_key))[:flat_valid.sum()]
+
+    sorted_key, sorted_value = flat_key[order], flat_value[order]
+    m = len(order)
+
+    # Group segments and tie runs on the sorted arrays
+    new_segment = np.ones(m, dtype=bool)
+    new_segment[1:] = sorted_key[1:] != sorted_key[:-1]
+    segment_id = np.cumsum(new_segment) - 1
+    segment_start = np.flatnonzero(new_segment)
+    segment_count = np.diff(np.r_[segment_start, m])
+    segment_column = sorted_key[segment_start] // max(n_groups, 1)
+
+    new_run = new_segment.copy()
+    new_run[1:] |= sorted_value[1:] != sorted_value[:-1]
+    run_id = np.cumsum(new_run) - 1
+    run_start = np.flatnonzero(new_run)
+    run_end = np.r_[run_start[1:], m] - 1
+    segment_runs = np.add.reduceat(new_run.astype(np.int64), segment_start) if m else np.array([], dtype=np.int64)
+
+    def scatter(sorted_values):
+        """Per-entry values back to row order (NaN where the value is missing)"""
+        out = np.full(n * c, np.nan)
+        out[order] = sorted_values
+        out = out.reshape(c, n).T
+        return out[:, 0] if single else out
+
+    # Segment of every entry with a group key, for group-level statistics
+    position = np.searchsorted(sorted_key[segment_start], flat_segment)
+    in_segment = (codes >= 0)[np.tile(np.arange(n), c)] & (position < len(segment_start))
+    in_segment[in_segment] = sorted_key[segment_start][position[in_segment]] == flat_segment[in_segment]
+
+    def broadcast(segment_values):
+        """Per-group values to every row of the group (NaN without a group key)"""
+        out = np.full(n * c, np.nan)
+        out[in_segment] = segment_values[position[in_segment]]
+        out = out.reshape(c, n).T
+        return out[:, 0] if single else out
+
+    offset = segment_start[segment_id]
+    ranks = {}
+    for method in set(methods) | {pct_method}:
+        if method == 'min':
+            ranks[method] = run_start[run_id] - offset + 1.0
+        elif method == 'max':
+            ranks[method] = run_end[run_id] - offset + 1.0
+        elif method == 'average':
+            ranks[method] = (run_start[run_id] + run_end[run_id]) / 2 - offset + 1.0
+        elif method == 'first':
+            ranks[method] = np.arange(m) - offset + 1.0
+        elif method == 'dense':
+            ranks[method] = run_id - run_id[offset] + 1.0
+        else:
+            raise ValueError(f"Unknown rank method: {method} (use one of {RANK_METHODS})")
+
+    denominator = segment_runs if pct_method == 'dense' else segment_count
+    result = {method: scatter(ranks[method]) for method in methods}
+    result['pct'] = scatter(ranks[pct_method] / denominator[segment_id])
+    result['count'] = broadcast(segment_count.astype(float))
+
+    if quantile is not None:
+        q = np.broadcast_to(np.asarray(quantile, dtype=float), (c,))[segment_column]
+        result['threshold'] = broadcast(segment_quantile(sorted_value, segment_start, segment_count,
+                                                         asc[segment_column], q))
+
+    return result
+
+def quantile_positions(count, q):
+    """Lower and upper order statistics and weight of the linear quantile (numpy's 'linear' method)"""
+    virtual = (count - 1) * q
+    previous = np.floor(virtual)
+    lower = np.clip(previous, 0, count - 1).astype(np.int64)
+    upper = np.clip(previous + 1, 0, count - 1).astype(np.int64)
+    return lower, upper, virtual - previous
+
+def interpolate(a, b, gamma):
+    """Linear interpolation between order statistics exactly as numpy.quantile computes it"""
+    diff = b - a
+    return np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+
+def segment_quantile(sorted_value, segment_start, segment_count, ascending, q):
+    """Linear-interpolation quantile of each sorted segment
+
+    Segments sorted on negated values (ascending False) are read back to front.
+    """
+
+    lower, upper, gamma = quantile_positions(segment_count, q)
+
+    def value_at(k):
+        index = np.where(ascending, segment_start + k, segment_start + segment_count - 1 - k)
+        return np.where(ascending, sorted_value[index], -sorted_value[index])
+
+    return interpolate(value_at(lower), value_at(upper), gamma)
+
+def grouped_rank(keys, values, method='average', ascending=True, pct=False):
+    """Series.rank within groups for one or more columns"""
+    stats = grouped_rank_stats(keys, values, ascending, methods=(method,), pct_method=method)
+    return stats['pct'] if pct else stats[method]
+
+def grouped_quantile(keys, values, q):
+    """Each row's group quantile (linear interpolation) of one or more columns"""
+    return grouped_rank_stats(keys, values, quantile=q)['threshold']
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Scalable Chart Rendering - Phase 5
+=========================================================
+
+Plot helpers that keep the Phase 5 figures fast and small when they show the
+full 2010-2025 panel instead of one quarter:
+- log_density_scatter: market cap vs book equity style log-log clouds; up to
+  SCATTER_POINT_LIMIT points are drawn as markers, larger clouds are pre-binned
+  into a 2-D histogram in log10 space and drawn as one rasterized mesh
+  (cost and file size depend on the grid, not on the number of firms)
+- histogram_counts / draw_histogram: bin a ratio distribution once (mask and
+  np.histogram) and draw the same counts in every figure that shows it,
+  with the same bars ax.hist would draw from the raw values
+
+Author: Wassil
+Project: UTDSOM Investment Corp. Quantitative Analysis
+"""
+
+import numpy as np
+from matplotlib.colors import LogNorm
+
+SCATTER_POINT_LIMIT = 5000
+DENSITY_GRIDSIZE = 150
+
+def histogram_counts(values, bins=50, lower=None, upper=None):
+    """Counts and edges of the finite values within [lower, upper] (edges span the kept values, as ax.hist)"""
+
+    values = np.asarray(values, dtype=float)
+    keep = np.isfinite(values)
+    if lower is not None:
+        keep &= values >= lower
+    if upper is not None:
+        keep &= values <= upper
+    return np.histogram(values[keep], bins=bins)
+
+def draw_histogram(ax, counts, edges, **style):
+    """Bars of precomputed histogram counts"""
+    return ax.hist(edges[:-1], bins=edges, weights=counts, **style)
+
+def log_density_scatter(ax, x, y, max_points=SCATTER_POINT_LIMIT, gridsize=DENSITY_GRIDSIZE,
+                        cmap='Blues', colorbar_label='Firms per bin', **scatter_style):
+    """Positive (x, y) pairs on log-log axes: markers for small clouds, a 2-D log histogram for large ones
+
+    Returns the (gridsize x gridsize) bin counts when the cloud was binned,
+    None when it was drawn as markers.
+    """
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = np.isfinite(x) & np.isfinite(y) & (x > 0) & (y > 0)
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+
+    if keep.sum() <= max_points:
+        ax.scatter(x[keep], y[keep], rasterized=True, **scatter_style)
+        return None
+
+    counts, x_edges, y_edges = np.histogram2d(np.log10(x[keep]), np.log10(y[keep]), bins=gridsize)
+    mesh = ax.pcolormesh(10 ** x_edges, 10 ** y_edges, np.ma.masked_equal(counts.T, 0),
+                         cmap=cmap, norm=LogNorm(), rasterized=True)
+    ax.figure.colorbar(mesh, ax=ax, label=colorbar_label)
+    return counts
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Historical Top-Decile Screen Panel - Phase 5
+=========================================================
+
+Runs the sector-relative top 10% value screen for every quarter of the
+Phase 1 cleaned Compustat file (2010-2025) instead of only 2025Q1/Q2, and
+writes the full history of decile membership for turnover and persistence
+analysis.
+
+Screens (same definitions as the Phase 5 scripts, see screening.py):
+- MB: lowest M/B = (prccq*cshoq + dlcq + dlttq - cheq) / atq, book equity
+  seqq + txditcq - preferred stock > 0, rolling two-quarter window
+- BM: highest B/M = (atq - ltq) / (prccq*cshoq), book equity atq - ltq > 0,
+  single quarter
+
+Every window is built at once: each firm-quarter is replicated into the
+windows it belongs to, collapsed with one sort and segment reductions, and
+members of every (quarter, sector) are picked by partial sort without ranking
+the rest. The CSV is parsed once for all screens.
+
+Output panel (one row per member firm and quarter): gvkey, quarter, sector,
+value, rank, percentile, threshold, decile, n_quarters, source_quarter.
+
+Author: Wassil
+Project: UTDSOM Investment Corp. Quantitative Analysis
+"""
+
+from datetime import datetime
+
+from screening import INPUT_PATH, load_quarterly_panel, run_screens
+
+# as_of=None ranks every quarter
+SCREENS = {
+    'MB': {'metrics': {'MB_ratio': 1.0}, 'direction': 'low', 'book_equity': 'stockholders',
+           'window': 2, 'as_of': None, 'top_percent': 10},
+    'BM': {'metrics': {'BM_ratio': 1.0}, 'direction': 'high', 'book_equity': 'assets_less_liabilities',
+           'window': 1, 'as_of': None, 'top_percent': 10}
+}
+PANEL_COLUMNS = ['gvkey', 'quarter', 'sector', 'value', 'rank', 'percentile', 'threshold',
+                 'decile', 'n_quarters', 'source_quarter']
+
+def main():
+    """Build the membership panel for every screen and quarter"""
+
+    print("=== Historical Top-Decile Screen Panel ===\n")
+
+    print(f"Loading data from: {INPUT_PATH}")
+    start = datetime.now()
+    try:
+        panel = load_quarterly_panel(INPUT_PATH)
+    except FileNotFoundError:
+        print(f"Error: Could not find {INPUT_PATH}")
+        return
+    print(f"   {len(panel):,} firm-quarters, {panel['gvkey'].nunique():,} firms "
+          f"({(datetime.now() - start).total_seconds():.1f}s)")
+
+    start = datetime.now()
+    results = build_screen_history(panel, members_only=True)
+    elapsed = (datetime.now() - start).total_seconds()
+    print(f"   Screened {len(SCREENS)} screens over every quarter in {elapsed:.1f}s")
+
+    for name, members in results.items():
+        screen = SCREENS[name]
+        members = members[PANEL_COLUMNS]
+        output_file = f"screen_history_{name}.csv"
+        members.to_csv(output_file, index=False)
+
+        direction = 'lowest' if screen['direction'] == 'low' else 'highest'
+        metric = next(iter(screen['metrics']))
+        print(f"\n{name}: top {screen['top_percent']}% ({direction} {metric}), "
+              f"{screen['window']}-quarter window")
+        print(f"   {members['quarter'].nunique()} quarters, {len(members):,} members")
+        print(f"   Saved to: {output_file}")
+
+def build_screen_history(panel, screens=SCREENS, members_only=False):
+    """Every ranked firm-quarter per screen (members have member == True), or only the members"""
+    return run_screens(panel, screens, carry=(), members_only=members_only)
+
+if __name__ == "__main__":
+    main()
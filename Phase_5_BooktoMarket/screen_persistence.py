@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Screen Turnover and Persistence Analytics - Phase 5
+=========================================================
+
+How stable are the sector top-decile lists? The trading cost of the value
+strategy depends on how many names change every quarter and how long a
+name stays in. This stage takes the multi-period screen panel
+(screen_history.py) and reports, per screen and sector:
+- turnover: members retained, entering and exiting between consecutive
+  quarters; turnover = exits / previous members
+- holding duration: length of each run of consecutive member quarters,
+  averaged over runs with an observed entry and exit (runs open in the
+  first or last quarter are reported as censored)
+- decile transition matrices: P(decile next quarter | decile this quarter),
+  with 0 = not ranked next quarter (no data, or filtered out)
+- survival of top-decile names: Kaplan-Meier probability that a name
+  entering the top decile is still a member k quarters later (runs still
+  open in the last quarter are censored, runs open in the first are skipped)
+
+Firm-quarters are integer keys built from factorized gvkeys, sector and
+quarter; retention is one intersection of sorted key arrays, next-quarter
+deciles one searchsorted, and runs are found on the sorted member keys, so
+every sector and quarter is handled in the same few array operations.
+"All" rows pool every sector.
+
+Author: Wassil
+Project: UTDSOM Investment Corp. Quantitative Analysis
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from screening import INPUT_PATH, SECTOR_NAMES, load_quarterly_panel, quarter_labels
+from screen_history import SCREENS, build_screen_history
+
+TURNOVER_PATH = "screen_turnover.csv"
+TRANSITIONS_PATH = "screen_transitions.csv"
+SURVIVAL_PATH = "screen_survival.csv"
+SUMMARY_PATH = "screen_persistence_summary.txt"
+
+SURVIVAL_HORIZON = 8
+ALL_SECTORS = 0
+
+def main():
+    """Turnover, duration, transition and survival analytics for every screen"""
+
+    print("=== Screen Turnover and Persistence Analytics ===\n")
+
+    print(f"Loading data from: {INPUT_PATH}")
+    try:
+        panel = load_quarterly_panel(INPUT_PATH)
+    except FileNotFoundError:
+        print(f"Error: Could not find {INPUT_PATH}")
+        return
+
+    start = datetime.now()
+    history = build_screen_history(panel)
+
+    log = []
+    log.append("=== SCREEN TURNOVER AND PERSISTENCE ANALYTICS ===\n")
+    log.append(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    log.append(f"Input Data: {INPUT_PATH}\n")
+    log.append("Turnover = exits / previous quarter's members; duration in quarters\n")
+
+    turnover, transitions, survival = [], [], []
+    for name, ranked in history.items():
+        analytics = screen_persistence(ranked, SURVIVAL_HORIZON)
+        for table, results in zip(analytics[:3], (turnover, transitions, survival)):
+            table.insert(0, 'screen', name)
+            results.append(table)
+
+        durations = analytics[3]
+        log.append(f"\n=== {name}: top {SCREENS[name]['top_percent']}% ===\n")
+        log.append(f"{'Sector':<26}{'Turnover':>9}{'Avg hold':>9}{'Runs':>7}{'Censored':>9}{'Stay 1Q':>9}{'Stay 4Q':>9}\n")
+        quarterly = analytics[0].groupby('sector_name', sort=False)['turnover'].mean()
+        stay = analytics[2].pivot(index='sector_name', columns='quarters', values='survival').reindex(durations.index)
+        for sector_name, row in durations.iterrows():
+            log.append(f"{sector_name:<26}{quarterly.get(sector_name, np.nan):>9.1%}{row['avg_duration']:>9.2f}"
+                       f"{int(row['runs']):>7}{int(row['censored']):>9}{stay.loc[sector_name, 1]:>9.1%}{stay.loc[sector_name, 4]:>9.1%}\n")
+
+    pd.concat(turnover, ignore_index=True).to_csv(TURNOVER_PATH, index=False)
+    pd.concat(transitions, ignore_index=True).to_csv(TRANSITIONS_PATH, index=False)
+    pd.concat(survival, ignore_index=True).to_csv(SURVIVAL_PATH, index=False)
+
+    elapsed = (datetime.now() - start).total_seconds()
+    print(f"   Analyzed {len(history)} screens in {elapsed:.1f}s")
+    print(''.join(log[4:]))
+
+    with open(SUMMARY_PATH, 'w') as f:
+        f.writelines(log)
+
+    print(f"Turnover saved to: {TURNOVER_PATH}")
+    print(f"Transitions saved to: {TRANSITIONS_PATH}")
+    print(f"Survival saved to: {SURVIVAL_PATH}")
+    print(f"Summary saved to: {SUMMARY_PATH}")
+
+def screen_persistence(ranked, horizon=SURVIVAL_HORIZON):
+    """Turnover, transition, survival and duration tables of one ranked screen panel
+
+    ranked has one row per ranked firm-quarter with gvkey, quarter, sector,
+    decile and member (build_screen_history(members_only=False)). A members-only
+    panel gives the same turnover, durations and survival; transitions then
+    only cover members.
+    """
+
+    periods = pd.PeriodIndex(ranked['quarter'], freq='Q')
+    qidx = np.asarray(periods.year * 4 + periods.quarter - 1, dtype=np.int64)
+    firm = pd.factorize(ranked['gvkey'])[0].astype(np.int64)
+    sector = ranked['sector'].to_numpy().astype(np.int64)
+    decile = ranked['decile'].to_numpy().astype(np.int64)
+    member = ranked['member'].to_numpy().astype(bool)
+
+    turnover, transitions, survival, durations = [], [], [], []
+    for sectors in (sector, np.full(len(sector), ALL_SECTORS)):
+        turnover.append(membership_turnover(firm[member], sectors[member], qidx[member]))
+        transitions.append(decile_transitions(firm, sectors, qidx, decile))
+        runs = membership_runs(firm[member], sectors[member], qidx[member], qidx.min(), qidx.max())
+        survival.append(top_decile_survival(runs, horizon))
+        durations.append(holding_durations(runs))
+
+    tables = [pd.concat(t, ignore_index=True) for t in (turnover, transitions, survival)]
+    durations = pd.concat(durations)
+    tables.append(durations.set_index(sector_names(durations.index)))
+    for table in tables[:3]:
+        table.insert(table.columns.get_loc('sector') + 1, 'sector_name', sector_names(table['sector']))
+    return tables
+
+def holding_durations(runs):
+    """Runs, average holding duration and censored runs per sector
+
+    Runs open in the first or last quarter are truncated, so the average
+    covers only runs with an observed entry and exit; the truncated runs are
+    counted in 'censored'.
+    """
+
+    truncated = runs['censored'] | runs['left_censored']
+    complete = runs['length'].where(~truncated)
+    return (runs.assign(complete=complete, truncated=truncated)
+                .groupby('sector')
+                .agg(runs=('length', 'size'), avg_duration=('complete', 'mean'), censored=('truncated', 'sum')))
+
+def sector_names(sectors):
+    """Sector names with 'All' for the pooled rows"""
+    return pd.Series(sectors).map({**SECTOR_NAMES, ALL_SECTORS: 'All'}).to_numpy()
+
+def membership_turnover(firm, sector, qidx):
+    """Members, retained, entries, exits and turnover per sector and quarter
+
+    Keys (sector, quarter, firm) are encoded in one int64; last quarter's
+    members shifted one quarter forward and intersected with this quarter's
+    give the retained names of every sector and quarter at once.
+    """
+
+    n_firms = int(firm.max()) + 1
+    q0, n_q = qidx.min(), qidx.max() - qidx.min() + 2
+    cell = sector * n_q + (qidx - q0)
+    keys = np.unique(cell * n_firms + firm)
+
+    shifted = keys + n_firms
+    retained_keys = np.intersect1d(shifted, keys, assume_unique=True)
+
+    cells = np.unique(keys // n_firms)
+    size = cells.max() + 2
+    previous = np.bincount(shifted // n_firms, minlength=size)
+    retained = np.bincount(retained_keys // n_firms, minlength=size)
+
+    # Quarters with members now or last quarter (a sector can empty out)
+    active = np.union1d(cells, cells + 1)
+    active = active[(active % n_q) <= qidx.max() - q0]
+    current = np.bincount(keys // n_firms, minlength=size)[active]
+    before, kept = previous[active], retained[active]
+
+    table = pd.DataFrame({
+        'sector': active // n_q,
+        'quarter': quarter_labels(active % n_q + q0),
+        'members': current,
+        'previous': before,
+        'retained': kept,
+        'entries': current - kept,
+        'exits': before - kept
+    })
+    # The first ranked quarter of a sector has no previous list to turn over
+    table['turnover'] = (table['exits'] / table['previous']).where(table['previous'] > 0)
+    first_quarter = (active % n_q) == 0
+    return table[~first_quarter].reset_index(drop=True)
+
+def decile_transitions(firm, sector, qidx, decile, n_deciles=10):
+    """Counts and probabilities of moving from each decile to each decile (0 = unranked) next quarter"""
+
+    n_q = qidx.max() - qidx.min() + 2
+    key = firm * n_q + (qidx - qidx.min())
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+
+    # Next quarter's decile of the same firm, 0 if it was not ranked
+    position = np.searchsorted(sorted_key, key + 1)
+    found = position < len(sorted_key)
+    found[found] = sorted_key[position[found]] == key[found] + 1
+    next_decile = np.zeros(len(key), dtype=np.int64)
+    next_decile[found] = decile[order[position[found]]]
+
+    # The last quarter has no next quarter to observe
+    observed = qidx < qidx.max()
+    sector_codes, sectors = pd.factorize(sector[observed], sort=True)
+    n_states = n_deciles + 1
+    cell = (sector_codes * n_states + decile[observed]) * n_states + next_decile[observed]
+    counts = np.bincount(cell, minlength=len(sectors) * n_states * n_states).reshape(len(sectors), n_states, n_states)
+
+    s, frm, to = np.meshgrid(np.arange(len(sectors)), np.arange(n_states), np.arange(n_states), indexing='ij')
+    table = pd.DataFrame({
+        'sector': np.asarray(sectors)[s.ravel()],
+        'from_decile': frm.ravel(),
+        'to_decile': to.ravel(),
+        'count': counts.ravel()
+    })
+    table = table[table['from_decile'] > 0]
+    table['probability'] = table['count'] / table.groupby(['sector', 'from_decile'])['count'].transform('sum')
+    return table.reset_index(drop=True)
+
+def membership_runs(firm, sector, qidx, first_quarter, last_quarter):
+    """Runs of consecutive member quarters per firm and sector
+
+    Returns one row per run with its sector, start quarter index, length and
+    whether it is still open in the last quarter (censored).
+    """
+
+    n_q = last_quarter - first_quarter + 2
+    n_firms = int(firm.max()) + 1
+    keys = np.unique((sector * n_firms + firm) * n_q + (qidx - first_quarter))
+
+    new_run = np.ones(len(keys), dtype=bool)
+    new_run[1:] = keys[1:] != keys[:-1] + 1
+    starts = np.flatnonzero(new_run)
+    lengths = np.diff(np.r_[starts, len(keys)])
+    start_q = keys[starts] % n_q
+
+    return pd.DataFrame({
+        'sector': keys[starts] // n_q // n_firms,
+        'start': start_q + first_quarter,
+        'length': lengths,
+        'censored': start_q + lengths - 1 == last_quarter - first_quarter,
+        'left_censored': start_q == 0
+    })
+
+def top_decile_survival(runs, horizon=SURVIVAL_HORIZON):
+    """Kaplan-Meier probability of still being a member k = 1..horizon quarters after entering
+
+    Runs already open in the first quarter have an unknown entry and are
+    skipped. A run still open in the last quarter with length L is only known
+    to last beyond L - 1 quarters after entry, so it is at risk at durations
+    1..L-1 and never exits. Horizons without any run at risk are NaN.
+
+    Hand-computed check: completed runs of length 1 and 3 and a run of
+    length 2 still open at the end. At k = 1 all three are at risk and one
+    exits (2/3); at k = 2 only the length-3 run is at risk (2/3); at k = 3 it
+    exits (0); at k = 4 nothing is at risk (NaN).
+
+    >>> runs = pd.DataFrame({'sector': [10, 10, 10], 'start': [1, 1, 2], 'length': [1, 3, 2],
+    ...                      'censored': [False, False, True], 'left_censored': [False] * 3})
+    >>> top_decile_survival(runs, horizon=4)['survival'].round(4).tolist()
+    [0.6667, 0.6667, 0.0, nan]
+    """
+
+    runs = runs[~runs['left_censored']]
+    sector_codes, sectors = pd.factorize(runs['sector'], sort=True)
+    n_s = len(sectors)
+    ended = ~runs['censored'].to_numpy()
+    observed = runs['length'].to_numpy() - (~ended)
+    length = np.minimum(observed, horizon + 1)
+
+    # Runs are at risk at durations 1..observed; completed runs exit at their length
+    at_risk = np.bincount(sector_codes * (horizon + 2) + length, minlength=n_s * (horizon + 2))
+    at_risk = at_risk.reshape(n_s, horizon + 2)[:, ::-1].cumsum(axis=1)[:, ::-1]
+    exits = np.bincount(sector_codes[ended] * (horizon + 2) + length[ended],
+                        minlength=n_s * (horizon + 2)).reshape(n_s, horizon + 2)
+
+    # Still a member k quarters after entry = run longer than k
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hazard = np.where(at_risk > 0, exits / at_risk, np.nan)
+    survival = np.cumprod(1 - hazard[:, 1:horizon + 1], axis=1)
+
+    return pd.DataFrame({
+        'sector': np.repeat(np.asarray(sectors), horizon),
+        'quarters': np.tile(np.arange(1, horizon + 1), n_s),
+        'at_risk': at_risk[:, 1:horizon + 1].ravel(),
+        'survival': survival.ravel()
+    })
+
+if __name__ == "__main__":
+    main()
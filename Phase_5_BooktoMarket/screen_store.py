@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Partitioned Screen Result Store - Phase 5
+=========================================================
+
+One columnar dataset per screen instead of 11 per-sector CSVs. Results of
+every sector and as-of quarter go into a Parquet dataset partitioned by
+sector_name and as_of (hive layout, e.g.
+screen_store/top_10_pct_by_MB/sector_name=Energy/as_of=2025Q2/part-0.parquet),
+so a reader gets one sector or one quarter with a single filtered read that
+opens only the matching partitions.
+
+The schema is fixed at write time from the script's EXPECTED_OUTPUT_SCHEMA
+({column: 'str' | 'float' | 'int'}): columns must match exactly, values are
+cast to the declared types, and the schema is stored in _common_metadata so
+every read returns the same dtypes whatever partitions it touches. Rewriting
+an as-of quarter replaces its partitions and keeps the others.
+
+pyarrow is optional (requirements.txt); without it has_store() is False and
+the scripts fall back to the per-sector CSV view (export_sector_csvs).
+
+Usage:
+    from screen_store import read_screen_store
+    energy = read_screen_store("screen_store/top_10_pct_by_MB", sector_name='Energy')
+    q2 = read_screen_store("screen_store/top_10_pct_by_MB", as_of='2025Q2')
+
+Author: Wassil
+Project: UTDSOM Investment Corp. Quantitative Analysis
+"""
+
+import pandas as pd
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+STORE_DIR = "screen_store"
+PARTITION_COLUMNS = ['sector_name', 'as_of']
+
+def has_store():
+    """True if pyarrow is installed"""
+    return pa is not None
+
+def arrow_schema(schema):
+    """Arrow schema of an {column: 'str' | 'float' | 'int'} output schema plus the as_of partition"""
+
+    types = {'str': pa.string(), 'float': pa.float64(), 'int': pa.int64()}
+    fields = [pa.field(column, types[kind]) for column, kind in schema.items()]
+    if 'as_of' not in schema:
+        fields.append(pa.field('as_of', pa.string()))
+    return pa.schema(fields)
+
+def conform_to_schema(df, schema):
+    """Columns of df in schema order, cast to the schema types (ValueError if the columns differ)"""
+
+    if set(df.columns) != set(schema):
+        raise ValueError(f"Output schema violation. Expected: {list(schema)}, Got: {list(df.columns)}")
+
+    out = df[list(schema)].copy()
+    for column, kind in schema.items():
+        if kind == 'str':
+            out[column] = out[column].astype('string')
+        elif kind == 'float':
+            out[column] = pd.to_numeric(out[column]).astype(float)
+        elif kind == 'int':
+            out[column] = pd.to_numeric(out[column]).astype('Int64')
+    return out
+
+def write_screen_store(df, path, schema, as_of):
+    """Write one as-of quarter of screen results, partitioned by sector_name and as_of
+
+    Replaces the partitions of that quarter (all sectors written now) and
+    returns the number of rows written.
+    """
+
+    if not has_store():
+        raise ImportError("pyarrow is required for the partitioned screen store")
+
+    frame = conform_to_schema(df, schema)
+    frame['as_of'] = as_of
+    full_schema = arrow_schema(schema)
+    table = pa.Table.from_pandas(frame, schema=full_schema, preserve_index=False)
+
+    os.makedirs(path, exist_ok=True)
+    pq.write_to_dataset(table, path, partition_cols=PARTITION_COLUMNS,
+                        existing_data_behavior='delete_matching', basename_template='part-{i}.parquet')
+    pq.write_metadata(full_schema, os.path.join(path, '_common_metadata'))
+    return table.num_rows
+
+def read_screen_store(path, sector_name=None, as_of=None, columns=None):
+    """Screen results for one or more sectors / as-of quarters (None = all) as a DataFrame"""
+
+    if not has_store():
+        raise ImportError("pyarrow is required for the partitioned screen store")
+
+    filters = []
+    for column, value in (('sector_name', sector_name), ('as_of', as_of)):
+        if value is not None:
+            values = [value] if isinstance(value, str) else list(value)
+            filters.append((column, 'in', values))
+
+    schema = pq.read_schema(os.path.join(path, '_common_metadata'))
+    table = pq.read_table(path, columns=columns, filters=filters or None, schema=schema, partitioning='hive')
+    return table.to_pandas()
+
+def export_sector_csvs(df, sector_dir, prefix, schema):
+    """Per-sector CSV view (<prefix>_<Sector>.csv); returns the file names written"""
+
+    os.makedirs(sector_dir, exist_ok=True)
+    frame = conform_to_schema(df, schema)
+
+    written = []
+    for sector_name, group in frame.groupby('sector_name', sort=False):
+        csv_name = f"{prefix}_{sector_name}.csv"
+        group.to_csv(os.path.join(sector_dir, csv_name), index=False)
+        written.append(csv_name)
+    return written
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Parameterized Value Screening Engine - Phase 5
+=========================================================
+
+One engine for the Phase 5 sector-relative screens. The MB and BM entries of
+SCREENS mirror the two top_10_analysis.py scripts (lowest M/B over Q1+Q2,
+highest B/M over Q1) and reproduce their ratios, ranks, percentiles,
+thresholds and audit fields; the scripts themselves still run their own
+pipelines and do not call run_screens. New variants (composites, other
+windows or cuts) are a new entry in SCREENS instead of another script.
+
+Screen parameters (one dict per screen):
+- metrics: {metric: weight}; a single metric is ranked on its raw value, several
+  are combined into a composite score (weighted mean of the firms' sector
+  percentile scores, each oriented by METRIC_DIRECTIONS so higher = better)
+- direction: 'low' or 'high' - which end of the value/score is kept
+- book_equity: 'stockholders' (seqq + txditcq - preferred stock) or
+  'assets_less_liabilities' (atq - ltq); sets the BE > 0 filter and B/M
+- window: quarters per window; as_of: last quarter (None = every quarter)
+- top_percent: percentile cut within each sector
+
+Window rule (the Phase 5 "Both (Averaged) > Q2 only > Q1 only" priority for
+any window length): a firm observed in every quarter of the window gets the
+average of its metric rows; otherwise the metrics of its first row in the
+latest quarter it has. Sector and audit fields come from that row.
+
+All screens run together on one loaded panel: screens sharing a book-equity
+definition and window share a single window aggregation (all metrics at
+once), and each screen is ranked for every quarter and sector in one pass of
+the grouped ranking kernel (ranking.py).
+
+Usage:
+    python screening.py    # run SCREENS, write screen_results.csv
+
+Author: Wassil
+Project: UTDSOM Investment Corp. Quantitative Analysis
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from ranking import grouped_rank_stats
+from selection import select_top
+
+INPUT_PATH = "../Phase_1_Data_Preparation/Compustat_Quarterl_2010_2025_cleaned.csv"
+OUTPUT_PATH = "screen_results.csv"
+
+INPUT_COLUMNS = [
+    'gvkey', 'conm', 'datadate', 'gsector',
+    'prccq', 'cshoq',
+    'dlcq', 'dlttq', 'cheq', 'atq', 'ltq',
+    'seqq', 'txditcq', 'pstkrq', 'pstkq', 'pstknq',
+    'dvpsxq', 'epspxq'
+]
+
+SECTOR_NAMES = {
+    10: 'Energy', 15: 'Materials', 20: 'Industrials',
+    25: 'Consumer_Discretionary', 30: 'Consumer_Staples',
+    35: 'Health_Care', 40: 'Financials', 45: 'Information_Technology',
+    50: 'Communication_Services', 55: 'Utilities', 60: 'Real_Estate'
+}
+
+BOOK_EQUITY_DEFINITIONS = {
+    'stockholders': 'book_equity_stockholders',
+    'assets_less_liabilities': 'book_equity_assets'
+}
+
+# Which end of each metric is cheap (used to orient composite components)
+METRIC_DIRECTIONS = {
+    'MB_ratio': 'low',
+    'BM_ratio': 'high',
+    'EP_ratio': 'high',
+    'dividend_yield_ttm': 'high'
+}
+
+# Fields carried from each firm's chosen row
+AUDIT_COLUMNS = ['conm', 'market_cap', 'prccq', 'epspxq', 'book_equity', 'dividend_yield_ttm',
+                 'dlcq', 'dlttq', 'cheq', 'atq', 'cshoq']
+
+SCREENS = {
+    'MB': {'metrics': {'MB_ratio': 1.0}, 'direction': 'low', 'book_equity': 'stockholders',
+           'window': 2, 'as_of': '2025Q2', 'top_percent': 10},
+    'BM': {'metrics': {'BM_ratio': 1.0}, 'direction': 'high', 'book_equity': 'assets_less_liabilities',
+           'window': 1, 'as_of': '2025Q1', 'top_percent': 10},
+    'Value_composite': {'metrics': {'BM_ratio': 0.5, 'EP_ratio': 0.25, 'dividend_yield_ttm': 0.25},
+                        'direction': 'high', 'book_equity': 'assets_less_liabilities',
+                        'window': 1, 'as_of': '2025Q1', 'top_percent': 10}
+}
+
+def main():
+    """Run every configured screen in one pass"""
+
+    print("=== Parameterized Value Screening Engine ===\n")
+
+    print(f"Loading data from: {INPUT_PATH}")
+    start = datetime.now()
+    try:
+        panel = load_quarterly_panel(INPUT_PATH)
+    except FileNotFoundError:
+        print(f"Error: Could not find {INPUT_PATH}")
+        return
+    print(f"   {len(panel):,} firm-quarters, {panel['gvkey'].nunique():,} firms "
+          f"({(datetime.now() - start).total_seconds():.1f}s)")
+
+    start = datetime.now()
+    results = run_screens(panel, SCREENS, members_only=True)
+    print(f"   Ran {len(SCREENS)} screens in {(datetime.now() - start).total_seconds():.2f}s\n")
+
+    members = pd.concat([ranked.assign(screen=name) for name, ranked in results.items()], ignore_index=True)
+    members.insert(0, 'screen', members.pop('screen'))
+    members.drop(columns='member').to_csv(OUTPUT_PATH, index=False)
+
+    for name, ranked in results.items():
+        screen = SCREENS[name]
+        metrics = ' + '.join(f"{weight:g}*{metric}" for metric, weight in screen['metrics'].items())
+        print(f"{name}: top {screen['top_percent']}% ({screen['direction']} {metrics}), "
+              f"{screen['window']}-quarter window as of {screen['as_of']}")
+        counts = ranked.groupby('sector_name').size()
+        for sector_name, count in counts.items():
+            print(f"   {sector_name}: {count:,} firms")
+
+    print(f"\nSaved {len(members):,} members to: {OUTPUT_PATH}")
+
+def load_quarterly_panel(path, extra_columns=()):
+    """Phase 1 cleaned quarterly file with quarter index, book equity definitions and value metrics"""
+
+    df = pd.read_csv(path, usecols=INPUT_COLUMNS + list(extra_columns), low_memory=False)
+    df['datadate'] = pd.to_datetime(df['datadate'], errors='coerce')
+    df = df.dropna(subset=['datadate'])
+    df = df.sort_values(['gvkey', 'datadate'], kind='mergesort').reset_index(drop=True)
+
+    # Integer quarter index (year * 4 + quarter - 1) so windows are plain arithmetic
+    df['qidx'] = df['datadate'].dt.year * 4 + df['datadate'].dt.quarter - 1
+
+    df['market_cap'] = df['prccq'] * df['cshoq']
+
+    mb_numerator = df['market_cap'] + df['dlcq'].fillna(0) + df['dlttq'].fillna(0) - df['cheq'].fillna(0)
+    df['MB_ratio'] = (mb_numerator / df['atq']).replace([np.inf, -np.inf], np.nan)
+    df['EP_ratio'] = (df['epspxq'] / df['prccq']).replace([np.inf, -np.inf], np.nan)
+
+    preferred_stock = df['pstkrq'].combine_first(df['pstkq']).combine_first(df['pstknq']).fillna(0)
+    df['book_equity_stockholders'] = df['seqq'] + df['txditcq'].fillna(0) - preferred_stock
+    df['book_equity_assets'] = df['atq'] - df['ltq']
+
+    # Dividend yield (TTM): rolling 4-row sum of non-negative dvpsxq per firm over price
+    df['dps_q'] = df['dvpsxq'].fillna(0).clip(lower=0)
+    df['dividend_yield_ttm'] = (
+        df.groupby('gvkey')['dps_q']
+          .rolling(window=4, min_periods=1)
+          .sum()
+          .reset_index(level=0, drop=True)
+    ) / df['prccq']
+
+    return df
+
+def quarter_index(label):
+    """Integer quarter index of a '2025Q2'-style label"""
+    period = pd.Period(label, freq='Q')
+    return period.year * 4 + period.quarter - 1
+
+def quarter_labels(qidx):
+    """'2025Q2'-style labels for integer quarter indices"""
+    qidx = np.asarray(qidx)
+    return pd.Series(qidx // 4).astype(str).str.cat(pd.Series(qidx % 4 + 1).astype(str), sep='Q').to_numpy()
+
+def screen_universe(panel, book_equity):
+    """Rows with positive book equity under one definition, with B/M on that definition"""
+
+    column = BOOK_EQUITY_DEFINITIONS[book_equity]
+    universe = panel[panel[column] > 0].copy()
+    universe['book_equity'] = universe[column]
+    universe['BM_ratio'] = (universe['book_equity'] / universe['market_cap']).where(universe['market_cap'] != 0)
+    return universe
+
+def window_values(panel, metrics, window=1, ends=None, carry=()):
+    """Metrics per firm and window end with the Phase 5 priority rule
+
+    panel must be sorted by gvkey, datadate. Returns a DataFrame with gvkey,
+    qidx (last quarter of the window), sector, the metrics, the `carry`
+    columns from the chosen row, n_quarters (quarters with data in the window)
+    and source_qidx (quarter of the chosen row). ends restricts the window
+    ends computed (default: every quarter with a full calendar window).
+    """
+
+    metrics = list(metrics)
+    if ends is not None:
+        ends = np.asarray(ends)
+        in_range = panel['qidx'].between(ends.min() - window + 1, ends.max())
+        panel = panel[in_range.to_numpy()]
+
+    # First row and metric row statistics per firm-quarter
+    first = panel.drop_duplicates(['gvkey', 'qidx'])
+    grouped = panel.groupby(['gvkey', 'qidx'], sort=False)[metrics]
+    gvkey = first['gvkey'].to_numpy()
+    qidx = first['qidx'].to_numpy()
+    total = grouped.sum().to_numpy(dtype=float)
+    count = grouped.count().to_numpy(dtype=float)
+
+    # Replicate every firm-quarter into the `window` windows that contain it
+    rows = np.repeat(np.arange(len(first)), window)
+    lag = np.tile(np.arange(window), len(first))
+    end = qidx[rows] + lag
+
+    if ends is None:
+        keep = (end >= qidx.min() + window - 1) & (end <= qidx.max()) if len(qidx) else end < 0
+    else:
+        keep = np.isin(end, ends)
+    rows, lag, end = rows[keep], lag[keep], end[keep]
+
+    # Sort by (firm, window end, lag): each window's first row is its latest quarter
+    order = np.lexsort((lag, end, gvkey[rows]))
+    rows, end = rows[order], end[order]
+    starts = np.flatnonzero(np.r_[True, (gvkey[rows][1:] != gvkey[rows][:-1]) | (end[1:] != end[:-1])])
+    if len(rows) == 0:
+        starts = starts[:0]
+    chosen = rows[starts]
+
+    n_quarters = np.diff(np.r_[starts, len(rows)])
+    values = first[metrics].to_numpy(dtype=float)[chosen]
+    if window > 1 and len(rows):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            average = np.add.reduceat(total[rows], starts) / np.add.reduceat(count[rows], starts)
+        values = np.where((n_quarters == window)[:, None], average, values)
+
+    result = pd.DataFrame({'gvkey': gvkey[chosen], 'qidx': end[starts],
+                           'sector': first['gsector'].to_numpy(dtype=float)[chosen]})
+    for i, metric in enumerate(metrics):
+        result[metric] = values[:, i]
+    for column in carry:
+        result[column] = first[column].to_numpy()[chosen]
+    result['n_quarters'] = n_quarters
+    result['source_qidx'] = qidx[chosen]
+
+    return result
+
+def screen_score(values, metrics):
+    """Raw metric for single-metric screens; oriented composite percentile score otherwise"""
+
+    if len(metrics) == 1:
+        return values[next(iter(metrics))]
+
+    # Sector percentile score in (0, 1] per component, higher = cheaper on that metric
+    columns = list(metrics)
+    components = grouped_rank_stats((values['qidx'], values['sector']), values[columns],
+                                    ascending=[METRIC_DIRECTIONS[m] == 'high' for m in columns])['pct']
+    weights = np.array([metrics[m] for m in columns], dtype=float)
+    present = ~np.isnan(components)
+
+    # Firms missing a component are scored on the components they have
+    weight = (present * weights).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.where(present, components * weights, 0.0).sum(axis=1) / weight
+    return pd.Series(np.where(weight > 0, score, np.nan), index=values.index)
+
+def rank_screen(values, direction='low', top_percent=10):
+    """Sector-relative rank, percentile, threshold, decile and membership of `value` per quarter"""
+
+    ascending = direction == 'low'
+    cut = top_percent / 100
+    stats = grouped_rank_stats((values['qidx'], values['sector']), values['value'], ascending,
+                               methods=('min',), quantile=cut if ascending else 1 - cut)
+    values['rank'] = stats['min']
+    values['percentile'] = stats['pct'] * 100
+    values['threshold'] = stats['threshold']
+    values['decile'] = np.ceil(values['percentile'] / 10).astype(int)
+    values['member'] = values['percentile'] <= top_percent
+    return values
+
+def select_screen(values, direction='low', top_percent=10):
+    """Members only, by per-group partial sort (the member rows of rank_screen)"""
+
+    ascending = direction == 'low'
+    cut = top_percent / 100
+    selected = select_top((values['qidx'], values['sector']), values['value'], top_percent=top_percent,
+                          ascending=ascending, quantile=cut if ascending else 1 - cut)
+
+    members = values.iloc[selected['row'].to_numpy()].reset_index(drop=True)
+    for column in ['rank', 'percentile', 'threshold']:
+        members[column] = selected[column].to_numpy()
+    members['decile'] = np.ceil(members['percentile'] / 10).astype(int)
+    members['member'] = True
+    return members
+
+def run_screens(panel, screens, carry=AUDIT_COLUMNS, members_only=False):
+    """Evaluate several screens on one loaded panel
+
+    Returns {name: ranked DataFrame} with every ranked firm-quarter (gvkey,
+    quarter, sector, sector_name, value, metrics, rank, percentile, threshold,
+    decile, member, n_quarters, source_quarter and the carried audit fields),
+    sorted by quarter, sector and rank. Percentiles count from the preferred
+    end, so members have percentile <= top_percent in either direction.
+    members_only=True returns just the member rows, found by partial sort
+    instead of ranking every firm.
+    """
+
+    # Screens sharing a book-equity definition and window share one aggregation
+    jobs = {}
+    for name, screen in screens.items():
+        jobs.setdefault((screen['book_equity'], screen.get('window', 1)), []).append(name)
+
+    results = {}
+    for (book_equity, window), names in jobs.items():
+        metrics = list(dict.fromkeys(m for name in names for m in screens[name]['metrics']))
+        as_of = [screens[name].get('as_of') for name in names]
+        ends = None if None in as_of else [quarter_index(q) for q in set(as_of)]
+
+        universe = screen_universe(panel, book_equity)
+        values = window_values(universe, metrics, window, ends, carry)
+        values = values[values['sector'].isin(list(SECTOR_NAMES))]
+
+        for name in names:
+            screen = screens[name]
+            ranked = values
+            if screen.get('as_of') is not None:
+                ranked = ranked[ranked['qidx'] == quarter_index(screen['as_of'])]
+            ranked = ranked.copy()
+            ranked['value'] = screen_score(ranked, screen['metrics'])
+            ranked = ranked[ranked['value'].notna()].reset_index(drop=True)
+            screen_step = select_screen if members_only else rank_screen
+            ranked = screen_step(ranked, screen['direction'], screen.get('top_percent', 10))
+            results[name] = format_screen(ranked, screen['metrics'], carry)
+
+    return {name: results[name] for name in screens}
+
+def format_screen(ranked, metrics, carry):
+    """Order rows and columns of a ranked screen"""
+
+    ranked = ranked.sort_values(['qidx', 'sector', 'rank'], kind='mergesort').reset_index(drop=True)
+    ranked.insert(1, 'quarter', quarter_labels(ranked['qidx']))
+    ranked['sector_name'] = ranked['sector'].map(SECTOR_NAMES)
+    ranked['source_quarter'] = quarter_labels(ranked['source_qidx'])
+
+    columns = ['gvkey', 'quarter', 'sector', 'sector_name', 'value', 'rank', 'percentile', 'threshold',
+               'decile', 'member', 'n_quarters', 'source_quarter']
+    extra = [m for m in metrics if len(metrics) > 1]
+    extra += [c for c in carry if c not in columns + extra]
+    return ranked[columns + extra]
+
+if __name__ == "__main__":
+    main()
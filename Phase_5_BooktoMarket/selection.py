@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Partial-Sort Top-k Selection - Phase 5
+=========================================================
+
+Keeps the best firms of every group (sector, or quarter x sector) without
+ranking the whole group. A percentile screen only needs the lowest 10% of
+M/B, so per group np.argpartition finds the k-th best value in linear time,
+and only the candidates at or better than it are sorted.
+
+Selections match the full-rank percentile filter exactly (same members, same
+ranks, percentiles and thresholds, same order): every value tied with the
+k-th best is kept as a candidate, so the tie run at the cutoff gets its true
+average rank and is included or excluded as a whole, just as
+percentile <= top_percent decides it.
+
+Two modes:
+- top_percent: members have average-rank percentile <= top_percent
+  (rank(pct=True) * 100, as the Phase 5 screens)
+- k: members have min rank <= k (all ties at the k-th value included)
+
+select_top() works on arrays in memory; StreamingTopSelector consumes chunks
+(e.g. pd.read_csv(chunksize=...)) and keeps only a bounded heap of
+candidates per group. Percentile mode needs the group sizes up front when
+streaming, since the cutoff depends on them.
+
+Author: Wassil
+Project: UTDSOM Investment Corp. Quantitative Analysis
+"""
+
+import heapq
+import pandas as pd
+import numpy as np
+
+from ranking import group_codes, quantile_positions, interpolate
+
+def select_top(keys, values, top_percent=None, k=None, ascending=True, quantile=None):
+    """Best rows of every group by partial sort
+
+    keys is one key array or a tuple of key arrays; rows with a missing key
+    or value are never selected. Returns a DataFrame of the members with
+    row (position in the input), rank (min), percentile (average rank, 0-100],
+    count (valid values in the group) and threshold (group quantile of the
+    raw values, if quantile is given), ordered by group, rank and input order.
+    """
+
+    if (top_percent is None) == (k is None):
+        raise ValueError("Specify exactly one of top_percent or k")
+
+    codes = group_codes(*keys) if isinstance(keys, tuple) else group_codes(keys)
+    values = np.asarray(values, dtype=float)
+    oriented = values if ascending else -values
+    valid = (codes >= 0) & ~np.isnan(values)
+
+    rows = np.flatnonzero(valid)
+    rows = rows[np.argsort(codes[rows], kind='stable')]
+    group, starts, counts = np.unique(codes[rows], return_index=True, return_counts=True)
+
+    capacity = candidate_capacity(counts, top_percent, k, ascending, quantile)
+
+    # Per group: partition at the capacity-th best value and keep everything at or better than it
+    candidates = []
+    for start, count, kth in zip(starts, counts, capacity):
+        group_rows = rows[start:start + count]
+        if kth >= count:
+            candidates.append(group_rows)
+        elif kth > 0:
+            group_values = oriented[group_rows]
+            cutoff = group_values[np.argpartition(group_values, kth - 1)[kth - 1]]
+            candidates.append(group_rows[group_values <= cutoff])
+    candidates = np.concatenate(candidates) if candidates else np.array([], dtype=np.int64)
+
+    group_size = pd.Series(counts, index=group)
+    return finalize_selection(candidates, codes[candidates], oriented[candidates],
+                              group_size.reindex(codes[candidates]).to_numpy(),
+                              top_percent, k, ascending, quantile)
+
+def candidate_capacity(counts, top_percent=None, k=None, ascending=True, quantile=None):
+    """Best values needed per group so that members and the quantile are all candidates"""
+
+    counts = np.asarray(counts)
+    if top_percent is not None:
+        # floor + 1 >= ceil, with a margin when n * p / 100 is integral
+        capacity = np.floor(counts * top_percent / 100).astype(np.int64) + 1
+    else:
+        capacity = np.full(len(counts), k, dtype=np.int64)
+
+    if quantile is not None:
+        lower, upper, _ = quantile_positions(counts, quantile)
+        deepest = upper if ascending else counts - 1 - lower
+        capacity = np.maximum(capacity, deepest + 1)
+
+    return np.minimum(capacity, counts)
+
+def finalize_selection(rows, codes, oriented, group_size, top_percent=None, k=None, ascending=True, quantile=None):
+    """Exact ranks and membership of candidate rows (all values at or better than each group's cutoff)"""
+
+    order = np.lexsort((rows, oriented, codes))
+    rows, codes, oriented, group_size = rows[order], codes[order], oriented[order], group_size[order]
+    m = len(rows)
+
+    new_segment = np.ones(m, dtype=bool)
+    new_segment[1:] = codes[1:] != codes[:-1]
+    segment_id = np.cumsum(new_segment) - 1
+    segment_start = np.flatnonzero(new_segment)
+    offset = segment_start[segment_id]
+
+    new_run = new_segment.copy()
+    new_run[1:] |= oriented[1:] != oriented[:-1]
+    run_id = np.cumsum(new_run) - 1
+    run_start = np.flatnonzero(new_run)
+    run_end = np.r_[run_start[1:], m] - 1
+
+    rank = run_start[run_id] - offset + 1.0
+    average = (run_start[run_id] + run_end[run_id]) / 2 - offset + 1.0
+    percentile = average / group_size * 100
+
+    selection = pd.DataFrame({'row': rows, 'rank': rank, 'percentile': percentile,
+                              'count': group_size.astype(float)})
+
+    if quantile is not None:
+        # Order statistics of the raw values, read from the sorted candidate prefix
+        count = group_size[segment_start]
+        lower, upper, gamma = quantile_positions(count, quantile)
+        if not ascending:
+            lower, upper = count - 1 - lower, count - 1 - upper
+        sign = 1.0 if ascending else -1.0
+        a = sign * oriented[segment_start + lower]
+        b = sign * oriented[segment_start + upper]
+        selection['threshold'] = interpolate(a, b, gamma)[segment_id]
+
+    member = percentile <= top_percent if top_percent is not None else rank <= k
+    return selection[member].reset_index(drop=True)
+
+class StreamingTopSelector:
+    """Top-k / top-percent selection over chunked input with a bounded heap per group
+
+    update() takes one chunk of keys and values (rows are numbered in arrival
+    order across chunks); result() returns the same DataFrame as select_top()
+    on the concatenated input. In top_percent mode group_sizes ({key: valid
+    rows}) must be given; keys are scalars or tuples matching a tuple of key
+    arrays.
+    """
+
+    def __init__(self, top_percent=None, k=None, group_sizes=None, ascending=True):
+        if (top_percent is None) == (k is None):
+            raise ValueError("Specify exactly one of top_percent or k")
+        if top_percent is not None and group_sizes is None:
+            raise ValueError("Streaming top_percent selection needs group_sizes")
+
+        self.top_percent = top_percent
+        self.k = k
+        self.group_sizes = group_sizes
+        self.ascending = ascending
+        self.rows_seen = 0
+
+        # Per group: max-heap of the best `capacity` (-value, -row) and the rows tied with its worst
+        self.heaps = {}
+        self.ties = {}
+        self.counts = {}
+
+    def capacity(self, key):
+        if self.top_percent is not None:
+            return int(candidate_capacity([self.group_sizes.get(key, 0)], self.top_percent)[0])
+        return self.k
+
+    def update(self, keys, values):
+        """Consume one chunk"""
+
+        values = np.asarray(values, dtype=float)
+        oriented = values if self.ascending else -values
+        key_arrays = [np.asarray(key) for key in keys] if isinstance(keys, tuple) else [np.asarray(keys)]
+        rows = self.rows_seen + np.arange(len(values))
+        self.rows_seen += len(values)
+
+        valid = ~np.isnan(values)
+        for key in key_arrays:
+            valid &= pd.notna(key)
+        if not valid.any():
+            # All-NaN chunks (common with read_csv chunksize) only advance the row numbering
+            return
+
+        if isinstance(keys, tuple):
+            chunk_keys = pd.MultiIndex.from_arrays([key[valid] for key in key_arrays])
+        else:
+            chunk_keys = pd.Index(key_arrays[0][valid])
+        codes, uniques = pd.factorize(chunk_keys)
+        oriented, rows = oriented[valid], rows[valid]
+
+        order = np.argsort(codes, kind='stable')
+        codes, oriented, rows = codes[order], oriented[order], rows[order]
+        group, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+
+        for code, start, count in zip(group, starts, counts):
+            key = uniques[code]
+            self.counts[key] = self.counts.get(key, 0) + count
+            capacity = self.capacity(key)
+            if capacity <= 0:
+                continue
+
+            group_values = oriented[start:start + count]
+            group_rows = rows[start:start + count]
+            heap = self.heaps.setdefault(key, [])
+            ties = self.ties.setdefault(key, [])
+
+            # Only values at or better than the current worst can still enter
+            if len(heap) == capacity:
+                keep = group_values <= -heap[0][0]
+                group_values, group_rows = group_values[keep], group_rows[keep]
+
+            if len(group_values) > len(heap) // 4:
+                self.heaps[key], self.ties[key] = self.rebuild(heap + ties, group_values, group_rows, capacity)
+            else:
+                for value, row in zip(group_values.tolist(), group_rows.tolist()):
+                    self.push(heap, ties, capacity, value, row)
+
+    @staticmethod
+    def rebuild(items, values, rows, capacity):
+        """Heap and ties of the best `capacity` among held items and a large batch (one partition)"""
+
+        values = np.r_[[-item[0] for item in items], values]
+        rows = np.r_[np.array([-item[1] for item in items], dtype=np.int64), rows]
+
+        heap_index = np.arange(len(values))
+        tie_index = heap_index[:0]
+        if len(values) > capacity:
+            cutoff = values[np.argpartition(values, capacity - 1)[capacity - 1]]
+            tied = np.flatnonzero(values == cutoff)
+            better = np.flatnonzero(values < cutoff)
+            fill = capacity - len(better)
+            heap_index, tie_index = np.r_[better, tied[:fill]], tied[fill:]
+
+        heap = list(zip((-values[heap_index]).tolist(), (-rows[heap_index]).tolist()))
+        heapq.heapify(heap)
+        ties = list(zip((-values[tie_index]).tolist(), (-rows[tie_index]).tolist()))
+        return heap, ties
+
+    @staticmethod
+    def push(heap, ties, capacity, value, row):
+        """Insert into a max-heap of the best `capacity`, keeping every row tied with its worst"""
+
+        if len(heap) < capacity:
+            heapq.heappush(heap, (-value, -row))
+            return
+
+        worst = -heap[0][0]
+        if value < worst:
+            evicted = heapq.heapreplace(heap, (-value, -row))
+            if -heap[0][0] == worst:
+                ties.append(evicted)
+            else:
+                ties.clear()
+        elif value == worst:
+            ties.append((-value, -row))
+
+    def result(self):
+        """Selection over everything consumed so far"""
+
+        keys = list(self.heaps)
+        items = [(i, item) for i, key in enumerate(keys) for item in self.heaps[key] + self.ties[key]]
+        codes = np.array([i for i, _ in items], dtype=np.int64)
+        oriented = np.array([-item[0] for _, item in items], dtype=float)
+        rows = np.array([-item[1] for _, item in items], dtype=np.int64)
+
+        if self.top_percent is not None:
+            sizes = np.array([self.group_sizes.get(key, 0) for key in keys], dtype=float)
+        else:
+            sizes = np.array([self.counts[key] for key in keys], dtype=float)
+
+        # Keys ordered as the batch path orders them (sorted)
+        key_order = np.argsort(pd.factorize(pd.Index(keys) if keys else pd.Index([]), sort=True)[0])
+        rank_of_key = np.empty(len(keys), dtype=np.int64)
+        rank_of_key[key_order] = np.arange(len(keys))
+
+        return finalize_selection(rows, rank_of_key[codes] if len(codes) else codes, oriented,
+                                  sizes[codes] if len(codes) else sizes[:0],
+                                  self.top_percent, self.k, self.ascending)
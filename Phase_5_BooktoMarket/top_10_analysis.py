@@ -12,7 +12,8 @@ KEY FEATURES:
 - Computes B/M = book_equity / market_cap
 - Enforces positive book equity constraint (book_equity > 0)
 - Includes dividend yield (TTM from quarterly dvpsxq) for Fama-French evidence
-- Outputs 11 sector-specific CSVs with audit fields for outlier detection
+- Writes one partitioned screen dataset (sector, as-of quarter) with audit fields
+  for outlier detection; per-sector CSVs are an optional export view
 - Generates market vs book scatter plots and distribution visuals
 
 DATA CONTRACT: Input requires quarterly Compustat fields from Phase 1 cleaned data.
@@ -41,6 +42,10 @@ from datetime import datetime
 import os
 from typing import Dict, List, Tuple, Optional
 
+from ranking import grouped_rank_stats
+from rendering import histogram_counts, draw_histogram, log_density_scatter
+from screen_store import STORE_DIR, has_store, write_screen_store, export_sector_csvs
+
 # Set plotting style
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (12, 8)
@@ -77,6 +82,10 @@ EXPECTED_OUTPUT_SCHEMA = {
     'data_source': 'str'
 }
 
+# As-of quarter of the screen (store partition) and whether to also write the per-sector CSV view
+AS_OF_QUARTER = '2025Q1'
+EXPORT_SECTOR_CSVS = False
+
 def validate_data_contract(df: pd.DataFrame, required_columns: List[str]) -> bool:
     """
     DATA CONTRACT VALIDATION: Ensure input data meets specifications.
@@ -104,9 +113,9 @@ def main():
     input_path = "/Users/wm/Desktop/UTDSOM                         Investment Corp./Phase_1_Data_Preparation/Compustat_Quarterl_2010_2025_cleaned.csv"
     output_dir = os.path.dirname(__file__)
 
-    # Create sector_outputs subfolder
+    # Partitioned screen store; sector_outputs/ holds the optional per-sector CSV view
+    store_path = os.path.join(output_dir, STORE_DIR, 'top_10_pct_by_BM')
     sector_dir = os.path.join(output_dir, 'sector_outputs')
-    os.makedirs(sector_dir, exist_ok=True)
 
     # Initialize analysis log
     log = []
@@ -184,32 +193,17 @@ def main():
     # STEP 4: Calculate B/M ratios (Feynman Logic: Simple rules)
     print("\n🧮 STEP 4: Calculating B/M ratios...")
 
-    firm_ratios = []
-
-    for gvkey in df_2025['gvkey'].unique():
-        chosen = df_2025[df_2025['gvkey'] == gvkey].iloc[0]
-        bm_ratio = chosen['book_equity'] / chosen['market_cap'] if chosen['market_cap'] != 0 else np.nan
-
-        firm_ratios.append({
-            'gvkey': gvkey,
-            'company_name': chosen['conm'],
-            'sector': chosen['gsector'],
-            'BM_ratio': bm_ratio,
-            'market_cap': chosen['market_cap'],
-            'price': chosen['prccq'],
-            'eps': chosen['epspxq'],
-            'book_equity': chosen['book_equity'],
-            'dividend_yield_ttm': chosen['dividend_yield_ttm'],
-            # Audit fields (keep for transparency, even if not used in B/M)
-            'dlcq': chosen['dlcq'],
-            'dlttq': chosen['dlttq'],
-            'cheq': chosen['cheq'],
-            'atq': chosen['atq'],
-            'cshoq': chosen['cshoq'],
-            'data_source': 'Q1 Only'
-        })
-
-    firm_ratios_df = pd.DataFrame(firm_ratios)
+    # Select every firm's first Q1 row at once (data is sorted by gvkey, datadate)
+    chosen = df_2025.drop_duplicates('gvkey', keep='first')
+
+    firm_ratios_df = chosen.rename(columns={'conm': 'company_name', 'gsector': 'sector',
+                                            'prccq': 'price', 'epspxq': 'eps'}).reset_index(drop=True)
+    firm_ratios_df['BM_ratio'] = (chosen['book_equity'] / chosen['market_cap']).where(chosen['market_cap'] != 0).to_numpy()
+    firm_ratios_df['data_source'] = 'Q1 Only'
+    firm_ratios_df = firm_ratios_df[['gvkey', 'company_name', 'sector', 'BM_ratio', 'market_cap', 'price', 'eps',
+                                     'book_equity', 'dividend_yield_ttm',
+                                     # Audit fields (keep for transparency, even if not used in B/M)
+                                     'dlcq', 'dlttq', 'cheq', 'atq', 'cshoq', 'data_source']]
 
     log.append("\n=== RATIO CALCULATION ===\n")
     log.append(f"Firms with ratios calculated: {len(firm_ratios_df):,}\n")
@@ -226,13 +220,15 @@ def main():
     log.append(f"Firms after BVE > 0 filter (only constraint): {len(firm_ratios_clean):,}\n")
     log.append(f"No further removals applied\n")
 
-    def compute_sector_metrics(group):
-        group['BM_sector_rank'] = group['BM_ratio'].rank(method='min', ascending=False)
-        group['BM_sector_percentile'] = group['BM_ratio'].rank(pct=True, ascending=False) * 100
-        group['sector_threshold_bm'] = group['BM_ratio'].quantile(0.90)
-        return group
-
-    firm_ratios_clean = firm_ratios_clean.groupby('sector').apply(compute_sector_metrics).reset_index(drop=True)
+    # Rank (highest first), percentile and 90th percentile threshold within each sector
+    # in one pass (rows ordered by sector; NaN B/M keeps NaN ranks)
+    firm_ratios_clean = firm_ratios_clean[firm_ratios_clean['sector'].notna()]
+    firm_ratios_clean = firm_ratios_clean.sort_values('sector', kind='mergesort').reset_index(drop=True)
+    sector_ranks = grouped_rank_stats(firm_ratios_clean['sector'], firm_ratios_clean['BM_ratio'],
+                                      ascending=False, methods=('min',), quantile=0.90)
+    firm_ratios_clean['BM_sector_rank'] = sector_ranks['min']
+    firm_ratios_clean['BM_sector_percentile'] = sector_ranks['pct'] * 100
+    firm_ratios_clean['sector_threshold_bm'] = sector_ranks['threshold']
 
     # Set sector_name after apply
     sector_names = {
@@ -278,45 +274,46 @@ def main():
 
     print("   ✅ Found sector-specific top firms")
 
-    # STEP 7: Generate CSV outputs
-    print("\n💾 STEP 7: Generating sector-specific CSV outputs...")
+    # STEP 7: Write screen results (Data Contract: Guarantee expected schema)
+    print("\n💾 STEP 7: Writing screen results...")
 
     output_cols = ['gvkey', 'company_name', 'sector', 'sector_name', 'BM_ratio',
                    'BM_sector_rank', 'BM_sector_percentile', 'sector_threshold_bm',
                    'market_cap', 'price', 'eps', 'book_equity', 'dividend_yield_ttm',
                    'dlcq', 'dlttq', 'cheq', 'atq', 'cshoq', 'data_source']
 
-    # Data Contract: Validate output schema before writing
-    def validate_output_schema(df: pd.DataFrame, expected_cols: List[str]) -> bool:
-        """DATA CONTRACT: Ensure output meets expected schema"""
-        actual_cols = list(df.columns)
-        if set(actual_cols) != set(expected_cols):
-            raise ValueError(f"Output schema violation. Expected: {expected_cols}, Got: {actual_cols}")
-        print(f"   ✅ Output schema validated for {len(df)} rows")
-        return True
-
     log.append("\n=== OUTPUT FILES GENERATED ===\n")
 
-    for sector_name, top_sector in sector_tops.items():
-        if not top_sector.empty:
-            csv_name = f"top_10_pct_by_BM_{sector_name}.csv"  # Updated filename
-            print(f"   → Writing {csv_name} ({len(top_sector)} firms)...")
-            validate_output_schema(top_sector[output_cols], output_cols)
-            top_sector[output_cols].to_csv(f"{sector_dir}/{csv_name}", index=False)
+    # Data Contract: the store fixes EXPECTED_OUTPUT_SCHEMA at write time (columns and types)
+    non_empty = [top[output_cols] for top in sector_tops.values() if not top.empty]
+    results = pd.concat(non_empty) if non_empty else pd.DataFrame(columns=output_cols)
+
+    if results.empty:
+        print(f"   → No firms selected for {AS_OF_QUARTER}, nothing written")
+        log.append(f"No firms selected for {AS_OF_QUARTER} (0 members), nothing written\n")
+    elif has_store():
+        rows = write_screen_store(results, store_path, EXPECTED_OUTPUT_SCHEMA, AS_OF_QUARTER)
+        print(f"   → Wrote {rows:,} firms to {STORE_DIR}/top_10_pct_by_BM/ (as_of={AS_OF_QUARTER})")
+        log.append(f"{STORE_DIR}/top_10_pct_by_BM/ (partitioned by sector_name, as_of={AS_OF_QUARTER})\n")
+    else:
+        print("   → pyarrow not installed, writing the per-sector CSV view instead of the store")
+
+    if not results.empty and (EXPORT_SECTOR_CSVS or not has_store()):
+        for csv_name in export_sector_csvs(results, sector_dir, 'top_10_pct_by_BM', EXPECTED_OUTPUT_SCHEMA):
             log.append(f"sector_outputs/{csv_name}\n")
-
-    print("   CSV files created successfully")
+        print("   CSV files created successfully")
     
     # Step 7: Create visualizations
     print("\nStep 7: Creating visualizations...")
     
     # Distribution histograms (adapt for BM)
-    fig, ax = plt.subplots(1, 1, figsize=(12, 6))
+    # B/M distribution binned once (mask and np.histogram) and drawn from the counts;
+    # this is the only figure that shows it (the dashboard keeps just the scatter)
+    bm_counts, bm_edges = histogram_counts(firm_ratios_clean['BM_ratio'], bins=50, lower=0, upper=10)
 
-    bm_values = firm_ratios_clean['BM_ratio']
-    bm_filtered = bm_values[(bm_values >= 0) & (bm_values <= 10)]  # Adjusted for positive BM
+    fig, ax = plt.subplots(1, 1, figsize=(12, 6))
 
-    ax.hist(bm_filtered, bins=50, color='lightcoral', edgecolor='black', alpha=0.7)
+    draw_histogram(ax, bm_counts, bm_edges, color='lightcoral', edgecolor='black', alpha=0.7)
     # Average of sector 90th-percentile thresholds (for highest BM)
     avg_threshold = np.mean(list(sector_thresholds.values()))
     ax.axvline(avg_threshold, color='red', linestyle='--', linewidth=2.5,
@@ -400,12 +397,11 @@ def main():
     # Top 5 by M/B (global, or pick a sector? Use global for simplicity, but since sector-specific, perhaps omit or show example)
     # For brevity, omit top5 and elite, as plan focuses on sector-specific
 
-    # Scatter plot inside dashboard: Market Cap vs Book Equity (log-log, chosen quarter)
+    # Scatter plot inside dashboard: Market Cap vs Book Equity (log-log, chosen quarter);
+    # large clouds (e.g. the full panel) are drawn as a rasterized 2-D log histogram
     ax_scatter = fig.add_subplot(gs[1:, :])
-    ax_scatter.scatter(firm_ratios_clean['market_cap'], firm_ratios_clean['book_equity'],
-                       c='steelblue', alpha=0.5, s=30)
-    ax_scatter.set_xscale('log')
-    ax_scatter.set_yscale('log')
+    log_density_scatter(ax_scatter, firm_ratios_clean['market_cap'], firm_ratios_clean['book_equity'],
+                        c='steelblue', alpha=0.5, s=30)
     ax_scatter.set_xlabel('Market Cap (log)', fontsize=11, fontweight='bold')
     ax_scatter.set_ylabel('Book Equity (log)', fontsize=11, fontweight='bold')
     ax_scatter.set_title('Market Cap vs Book Equity (Q1 2025)', fontsize=12, fontweight='bold')
@@ -433,9 +429,12 @@ def main():
     print("="*70)
     print("💡 KEY LESSON: Valuation by sector using highest B/M (top decile)")
     print(f"\n📁 Output files generated in: {os.path.abspath(output_dir)}/")
-    print("\n📊 CSV Files (Per Sector, in sector_outputs/):")
-    for sector_name in sector_tops:
-        print(f"  • top_10_pct_by_BM_{sector_name}.csv")
+    print("\n📊 Screen Results:")
+    if has_store():
+        print(f"  • {STORE_DIR}/top_10_pct_by_BM/ (partitioned by sector_name and as_of)")
+    if EXPORT_SECTOR_CSVS or not has_store():
+        for sector_name in sector_tops:
+            print(f"  • sector_outputs/top_10_pct_by_BM_{sector_name}.csv")
     print("\n📈 Visualizations:")
     print("  • distribution_histograms.png")
     print("  • sector_breakdown.png")
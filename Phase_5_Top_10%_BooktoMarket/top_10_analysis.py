@@ -12,7 +12,8 @@ KEY FEATURES:
 - Computes M/B = (prccq*cshoq + dlcq + dlttq - cheq) / atq
 - Enforces positive book equity constraint (seqq + txditcq - preferred_stock > 0)
 - Includes dividend yield (TTM from quarterly dvpsxq) for Fama-French evidence
-- Outputs 11 sector-specific CSVs with audit fields for outlier detection
+- Writes one partitioned screen dataset (sector, as-of quarter) with audit fields
+  for outlier detection; per-sector CSVs are an optional export view
 - Generates market vs book scatter plots and distribution visuals
 
 DATA CONTRACT: Input requires quarterly Compustat fields from Phase 1 cleaned data.
@@ -39,8 +40,15 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 import os
+import sys
 from typing import Dict, List, Tuple, Optional
 
+# Shared Phase 5 modules live in Phase_5_BooktoMarket
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Phase_5_BooktoMarket'))
+from ranking import grouped_rank_stats
+from rendering import histogram_counts, draw_histogram, log_density_scatter
+from screen_store import STORE_DIR, has_store, write_screen_store, export_sector_csvs
+
 # Set plotting style
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (12, 8)
@@ -66,9 +74,20 @@ EXPECTED_OUTPUT_SCHEMA = {
     'market_cap': 'float',
     'price': 'float',
     'eps': 'float',
+    'book_equity': 'float',
+    'dividend_yield_ttm': 'float',
+    'dlcq': 'float',
+    'dlttq': 'float',
+    'cheq': 'float',
+    'atq': 'float',
+    'cshoq': 'float',
     'data_source': 'str'
 }
 
+# As-of quarter of the screen (store partition) and whether to also write the per-sector CSV view
+AS_OF_QUARTER = '2025Q2'
+EXPORT_SECTOR_CSVS = False
+
 def validate_data_contract(df: pd.DataFrame, required_columns: List[str]) -> bool:
     """
     DATA CONTRACT VALIDATION: Ensure input data meets specifications.
@@ -96,9 +115,9 @@ def main():
     input_path = "/Users/wm/Desktop/UTDSOM                         Investment Corp./Phase_1_Data_Preparation/Compustat_Quarterl_2010_2025_cleaned.csv"
     output_dir = os.path.dirname(__file__)
 
-    # Create sector_outputs subfolder
+    # Partitioned screen store; sector_outputs/ holds the optional per-sector CSV view
+    store_path = os.path.join(output_dir, STORE_DIR, 'top_10_pct_by_MB')
     sector_dir = os.path.join(output_dir, 'sector_outputs')
-    os.makedirs(sector_dir, exist_ok=True)
 
     # Initialize analysis log
     log = []
@@ -178,53 +197,29 @@ def main():
     print("\n🧮 STEP 4: Calculating M/B ratios with priority logic...")
     print("   Feynman Rule: Both quarters (average) > Q2 only (recent) > Q1 only (older)")
     
-    # Process each firm based on available quarters
-    firm_ratios = []
-    
-    for gvkey in df_2025['gvkey'].unique():
-        firm_data = df_2025[df_2025['gvkey'] == gvkey]
-        
-        # Check which quarters are available
-        has_q1 = '2025Q1' in firm_data['quarter'].values
-        has_q2 = '2025Q2' in firm_data['quarter'].values
-        
-        if has_q1 and has_q2:
-            # Both quarters: calculate average over available quarters
-            mb_ratio = firm_data['MB_ratio'].mean()
-            # Use Q2 values for audit fields
-            chosen = firm_data[firm_data['quarter'] == '2025Q2'].iloc[0]
-            data_source = 'Both (Averaged)'
-        elif has_q2:
-            # Q2 only: use Q2 data (prioritized)
-            chosen = firm_data[firm_data['quarter'] == '2025Q2'].iloc[0]
-            mb_ratio = chosen['MB_ratio']
-            data_source = 'Q2 Only'
-        else:
-            # Q1 only: use Q1 data
-            chosen = firm_data[firm_data['quarter'] == '2025Q1'].iloc[0]
-            mb_ratio = chosen['MB_ratio']
-            data_source = 'Q1 Only'
-
-        firm_ratios.append({
-            'gvkey': gvkey,
-            'company_name': chosen['conm'],
-            'sector': chosen['gsector'],
-            'avg_MB': mb_ratio,
-            'market_cap': chosen['market_cap'],
-            'price': chosen['prccq'],
-            'eps': chosen['epspxq'],
-            'book_equity': chosen['book_equity'],
-            'dividend_yield_ttm': chosen['dividend_yield_ttm'],
-            # Audit fields used in MB construction
-            'dlcq': chosen['dlcq'],
-            'dlttq': chosen['dlttq'],
-            'cheq': chosen['cheq'],
-            'atq': chosen['atq'],
-            'cshoq': chosen['cshoq'],
-            'data_source': data_source
-        })
-    
-    avg_ratios = pd.DataFrame(firm_ratios)
+    # Select every firm's row at once (data is sorted by gvkey, datadate):
+    # audit fields come from the firm's first Q2 row, else its first Q1 row
+    firms = pd.Index(df_2025['gvkey'].unique(), name='gvkey')
+    in_q2 = df_2025['quarter'] == '2025Q2'
+    first_q2 = df_2025[in_q2].drop_duplicates('gvkey').set_index('gvkey')
+    first_q1 = df_2025[~in_q2].drop_duplicates('gvkey').set_index('gvkey')
+    chosen = pd.concat([first_q2, first_q1[~first_q1.index.isin(first_q2.index)]]).reindex(firms)
+
+    has_q1 = firms.isin(first_q1.index)
+    has_q2 = firms.isin(first_q2.index)
+    both = has_q1 & has_q2
+
+    # Both quarters: average over all of the firm's rows in the window
+    mean_mb = df_2025.groupby('gvkey', sort=False)['MB_ratio'].mean().reindex(firms)
+
+    avg_ratios = chosen.reset_index().rename(columns={'conm': 'company_name', 'gsector': 'sector',
+                                                      'prccq': 'price', 'epspxq': 'eps'})
+    avg_ratios['avg_MB'] = np.where(both, mean_mb.to_numpy(), chosen['MB_ratio'].to_numpy())
+    avg_ratios['data_source'] = np.select([both, has_q2], ['Both (Averaged)', 'Q2 Only'], default='Q1 Only')
+    avg_ratios = avg_ratios[['gvkey', 'company_name', 'sector', 'avg_MB', 'market_cap', 'price', 'eps',
+                             'book_equity', 'dividend_yield_ttm',
+                             # Audit fields used in MB construction
+                             'dlcq', 'dlttq', 'cheq', 'atq', 'cshoq', 'data_source']]
     
     log.append("\n=== RATIO CALCULATION WITH PRIORITY LOGIC ===\n")
     log.append("Priority: Both quarters (average) > Q2 only > Q1 only\n\n")
@@ -248,13 +243,15 @@ def main():
     print("\n📈 STEP 5: Ranking firms by M/B within each sector...")
     print("   Feynman Logic: Lower M/B = More undervalued → Top 10% = Lowest M/B per sector")
 
-    def compute_sector_metrics(group):
-        group['MB_sector_rank'] = group['avg_MB'].rank(method='min')
-        group['MB_sector_percentile'] = group['avg_MB'].rank(pct=True) * 100
-        group['sector_threshold_mb'] = group['avg_MB'].quantile(0.10)
-        return group
-
-    avg_ratios_clean = avg_ratios_clean.groupby('sector').apply(compute_sector_metrics).reset_index(drop=True)
+    # Rank, percentile and 10th percentile threshold within each sector in one pass
+    # (rows ordered by sector, firms without a sector dropped)
+    avg_ratios_clean = avg_ratios_clean[avg_ratios_clean['sector'].notna()]
+    avg_ratios_clean = avg_ratios_clean.sort_values('sector', kind='mergesort').reset_index(drop=True)
+    sector_ranks = grouped_rank_stats(avg_ratios_clean['sector'], avg_ratios_clean['avg_MB'],
+                                      methods=('min',), quantile=0.10)
+    avg_ratios_clean['MB_sector_rank'] = sector_ranks['min']
+    avg_ratios_clean['MB_sector_percentile'] = sector_ranks['pct'] * 100
+    avg_ratios_clean['sector_threshold_mb'] = sector_ranks['threshold']
 
     # Set sector_name after apply
     sector_names = {
@@ -309,45 +306,46 @@ def main():
                                                                       35: 'Health_Care', 40: 'Financials', 45: 'Information_Technology',
                                                                       50: 'Communication_Services', 55: 'Utilities', 60: 'Real_Estate'})
 
-    # STEP 7: Generate CSV outputs (Data Contract: Guarantee expected schema)
-    print("\n💾 STEP 7: Generating sector-specific CSV outputs...")
+    # STEP 7: Write screen results (Data Contract: Guarantee expected schema)
+    print("\n💾 STEP 7: Writing screen results...")
 
     output_cols = ['gvkey', 'company_name', 'sector', 'sector_name', 'avg_MB',
                    'MB_sector_rank', 'MB_sector_percentile', 'sector_threshold_mb',
                    'market_cap', 'price', 'eps', 'book_equity', 'dividend_yield_ttm',
                    'dlcq', 'dlttq', 'cheq', 'atq', 'cshoq', 'data_source']
 
-    # Data Contract: Validate output schema before writing
-    def validate_output_schema(df: pd.DataFrame, expected_cols: List[str]) -> bool:
-        """DATA CONTRACT: Ensure output meets expected schema"""
-        actual_cols = list(df.columns)
-        if set(actual_cols) != set(expected_cols):
-            raise ValueError(f"Output schema violation. Expected: {expected_cols}, Got: {actual_cols}")
-        print(f"   ✅ Output schema validated for {len(df)} rows")
-        return True
-
     log.append("\n=== OUTPUT FILES GENERATED ===\n")
 
-    for sector_name, top_sector in sector_tops.items():
-        if not top_sector.empty:
-            csv_name = f"top_10_pct_by_MB_{sector_name}.csv"
-            print(f"   → Writing {csv_name} ({len(top_sector)} firms)...")
-            validate_output_schema(top_sector[output_cols], output_cols)
-            top_sector[output_cols].to_csv(f"{sector_dir}/{csv_name}", index=False)
+    # Data Contract: the store fixes EXPECTED_OUTPUT_SCHEMA at write time (columns and types)
+    non_empty = [top[output_cols] for top in sector_tops.values() if not top.empty]
+    results = pd.concat(non_empty) if non_empty else pd.DataFrame(columns=output_cols)
+
+    if results.empty:
+        print(f"   → No firms selected for {AS_OF_QUARTER}, nothing written")
+        log.append(f"No firms selected for {AS_OF_QUARTER} (0 members), nothing written\n")
+    elif has_store():
+        rows = write_screen_store(results, store_path, EXPECTED_OUTPUT_SCHEMA, AS_OF_QUARTER)
+        print(f"   → Wrote {rows:,} firms to {STORE_DIR}/top_10_pct_by_MB/ (as_of={AS_OF_QUARTER})")
+        log.append(f"{STORE_DIR}/top_10_pct_by_MB/ (partitioned by sector_name, as_of={AS_OF_QUARTER})\n")
+    else:
+        print("   → pyarrow not installed, writing the per-sector CSV view instead of the store")
+
+    if not results.empty and (EXPORT_SECTOR_CSVS or not has_store()):
+        for csv_name in export_sector_csvs(results, sector_dir, 'top_10_pct_by_MB', EXPECTED_OUTPUT_SCHEMA):
             log.append(f"sector_outputs/{csv_name}\n")
-
-    print("   CSV files created successfully")
+        print("   CSV files created successfully")
     
     # Step 7: Create visualizations
     print("\nStep 7: Creating visualizations...")
     
     # Distribution histograms (adapt for MB only, perhaps global for simplicity)
-    fig, ax = plt.subplots(1, 1, figsize=(12, 6))
+    # M/B distribution binned once (mask and np.histogram) and drawn from the counts;
+    # this is the only figure that shows it (the dashboard keeps just the scatter)
+    mb_counts, mb_edges = histogram_counts(avg_ratios_clean['avg_MB'], bins=50, lower=-5, upper=15)
 
-    mb_values = avg_ratios_clean['avg_MB']
-    mb_filtered = mb_values[(mb_values >= -5) & (mb_values <= 15)]
+    fig, ax = plt.subplots(1, 1, figsize=(12, 6))
 
-    ax.hist(mb_filtered, bins=50, color='lightcoral', edgecolor='black', alpha=0.7)
+    draw_histogram(ax, mb_counts, mb_edges, color='lightcoral', edgecolor='black', alpha=0.7)
     # Average of sector 10th-percentile thresholds
     avg_threshold = np.mean(list(sector_thresholds.values()))
     ax.axvline(avg_threshold, color='red', linestyle='--', linewidth=2.5,
@@ -431,12 +429,11 @@ def main():
     # Top 5 by M/B (global, or pick a sector? Use global for simplicity, but since sector-specific, perhaps omit or show example)
     # For brevity, omit top5 and elite, as plan focuses on sector-specific
 
-    # Scatter plot inside dashboard: Market Cap vs Book Equity (log-log, chosen quarter)
+    # Scatter plot inside dashboard: Market Cap vs Book Equity (log-log, chosen quarter);
+    # large clouds (e.g. the full panel) are drawn as a rasterized 2-D log histogram
     ax_scatter = fig.add_subplot(gs[1:, :])
-    ax_scatter.scatter(avg_ratios_clean['market_cap'], avg_ratios_clean['book_equity'],
-                       c='steelblue', alpha=0.5, s=30)
-    ax_scatter.set_xscale('log')
-    ax_scatter.set_yscale('log')
+    log_density_scatter(ax_scatter, avg_ratios_clean['market_cap'], avg_ratios_clean['book_equity'],
+                        c='steelblue', alpha=0.5, s=30)
     ax_scatter.set_xlabel('Market Cap (log)', fontsize=11, fontweight='bold')
     ax_scatter.set_ylabel('Book Equity (log)', fontsize=11, fontweight='bold')
     ax_scatter.set_title('Market Cap vs Book Equity (Chosen Quarter)', fontsize=12, fontweight='bold')
@@ -464,9 +461,12 @@ def main():
     print("="*70)
     print("💡 KEY LESSON: Valuation by sector using lowest M/B (highest B/M)")
     print(f"\n📁 Output files generated in: {os.path.abspath(output_dir)}/")
-    print("\n📊 CSV Files (Per Sector, in sector_outputs/):")
-    for sector_name in sector_tops:
-        print(f"  • top_10_pct_by_MB_{sector_name}.csv")
+    print("\n📊 Screen Results:")
+    if has_store():
+        print(f"  • {STORE_DIR}/top_10_pct_by_MB/ (partitioned by sector_name and as_of)")
+    if EXPORT_SECTOR_CSVS or not has_store():
+        for sector_name in sector_tops:
+            print(f"  • sector_outputs/top_10_pct_by_MB_{sector_name}.csv")
     print("\n📈 Visualizations:")
     print("  • distribution_histograms.png")
     print("  • sector_breakdown.png")